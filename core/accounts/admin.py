@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import User
 
 # Register your models here.
@@ -26,7 +28,10 @@ class UserAdmin(BaseUserAdmin):
     form = CustomUserChangeForm
     
     # Campos mostrados en la lista
-    list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active', 'date_joined')
+    list_display = (
+        'email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active', 'date_joined',
+        'workouts_link',
+    )
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined')
     
     # Campos de búsqueda
@@ -35,6 +40,9 @@ class UserAdmin(BaseUserAdmin):
     # Ordenamiento
     ordering = ('email',)
     
+    # Sin el COUNT(*) de la tabla completa en cada búsqueda o filtro
+    show_full_result_count = False
+    
     # Campos en el formulario de detalle
     fieldsets = (
         (None, {
@@ -75,11 +83,12 @@ class UserAdmin(BaseUserAdmin):
     # Configuración de filtros
     filter_horizontal = ('groups', 'user_permissions')
     
-    def get_queryset(self, request):
-        """Optimizar queries con select_related"""
-        qs = super().get_queryset(request)
-        return qs.select_related().prefetch_related('groups')
-    
     def save_model(self, request, obj, form, change):
         """Personalizar guardado si es necesario"""
         super().save_model(request, obj, form, change)
+    
+    @admin.display(description='Workouts')
+    def workouts_link(self, obj):
+        """Workouts del usuario en el admin (filtrados por id, en su shard)"""
+        url = reverse('admin:fitness_workout_changelist')
+        return format_html('<a href="{}?user={}">Workouts</a>', url, obj.pk)
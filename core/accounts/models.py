@@ -10,3 +10,20 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.email
+
+
+class CoachAthlete(models.Model):
+    """
+    Relación entre un entrenador y un atleta.
+    
+    La crea el atleta al agregar a su entrenador; mientras exista, el
+    entrenador puede ver los workouts y estadísticas del atleta.
+    """
+    coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name="athlete_links")
+    athlete = models.ForeignKey(User, on_delete=models.CASCADE, related_name="coach_links")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["coach", "athlete"], name="coachathlete_unique"),
+        ]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from .models import CoachAthlete
 
 User = get_user_model()
 
@@ -24,3 +25,31 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "username", "email")
+
+
+class CoachLinkSerializer(serializers.ModelSerializer):
+    """Entrenador del usuario autenticado; se agrega por email"""
+    coach = UserSerializer(read_only=True)
+    coach_email = serializers.EmailField(write_only=True)
+
+    class Meta:
+        model = CoachAthlete
+        fields = ("id", "coach", "coach_email", "created_at")
+        read_only_fields = ("id", "created_at")
+
+    def validate_coach_email(self, value):
+        athlete = self.context["request"].user
+        coach = User.objects.filter(email__iexact=value).first()
+        if coach is None:
+            raise serializers.ValidationError("No user with this email")
+        if coach.pk == athlete.pk:
+            raise serializers.ValidationError("You cannot be your own coach")
+        if CoachAthlete.objects.filter(coach=coach, athlete=athlete).exists():
+            raise serializers.ValidationError("Coach already added")
+        return coach
+
+    def create(self, validated_data):
+        return CoachAthlete.objects.create(
+            coach=validated_data["coach_email"],
+            athlete=self.context["request"].user,
+        )
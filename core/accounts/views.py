@@ -4,7 +4,8 @@ from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
-from .serializers import RegisterSerializer, UserSerializer
+from .models import CoachAthlete
+from .serializers import CoachLinkSerializer, RegisterSerializer, UserSerializer
 
 User = get_user_model()
 
@@ -21,3 +22,19 @@ class MeView(APIView):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
 
+
+class CoachListView(generics.ListCreateAPIView):
+    """Entrenadores del usuario autenticado (los que pueden ver sus datos)"""
+    serializer_class = CoachLinkSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return CoachAthlete.objects.filter(athlete=self.request.user).select_related("coach")
+
+
+class CoachDetailView(generics.DestroyAPIView):
+    """Quitar a un entrenador"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return CoachAthlete.objects.filter(athlete=self.request.user)
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "fitness.middleware.APIGZipMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,6 +56,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "fitness.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -80,9 +86,40 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
 }
 
+# Bases (alias de DATABASES) con tablas de workouts, cada una con su bloque
+# de ids: la base con bloque N numera sus workouts, ejercicios y sets desde
+# N * 10^12 (ver fitness/sharding.py). El bloque de una base no cambia nunca,
+# aunque se agreguen o se retiren otras. Para probar localmente:
+# FITNESS_SHARD_ID_BLOCKS=default:0,shard1:1 (cada alias nuevo es un SQLite
+# db.<alias>.sqlite3) y migrate --database shard1.
+FITNESS_SHARD_ID_BLOCKS = {
+    alias: int(block)
+    for alias, _, block in (
+        item.partition(":")
+        for item in os.environ.get("FITNESS_SHARD_ID_BLOCKS", "default:0").split(",")
+    )
+}
+if len(set(FITNESS_SHARD_ID_BLOCKS.values())) < len(FITNESS_SHARD_ID_BLOCKS):
+    raise ImproperlyConfigured("FITNESS_SHARD_ID_BLOCKS repeats an id block")
+
+# Shards entre los que se reparten los workouts por usuario (con bloque de
+# ids); una base se puede retirar de la lista y vaciar con rebalance_shards.
+# Con un solo shard no hay consultas extra.
+FITNESS_SHARDS = os.environ.get("FITNESS_SHARDS", "default").split(",")
+if not set(FITNESS_SHARDS) <= set(FITNESS_SHARD_ID_BLOCKS):
+    raise ImproperlyConfigured("Every alias in FITNESS_SHARDS needs an id block")
+
+for alias in FITNESS_SHARD_ID_BLOCKS:
+    DATABASES.setdefault(alias, {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db.{alias}.sqlite3",
+    })
+
+DATABASE_ROUTERS = ["fitness.routers.ShardRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +175,17 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "fitness.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "fitness.renderers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],  
@@ -148,4 +196,24 @@ REST_FRAMEWORK = {
     },
 }
 
-
+# Contadores de throttling compartidos entre workers (archivo mapeado en memoria,
+# fuera del repositorio; se puede cambiar con la variable de entorno).
+# Con None se usan contadores en memoria por proceso, como en los tests
+# (ver core/settings_test.py).
+FITNESS_THROTTLE_STORE = Path(
+    os.environ.get(
+        "FITNESS_THROTTLE_STORE", Path(tempfile.gettempdir()) / "fitness-throttle.counters"
+    )
+)
+
+# Peso de los músculos secundarios en el volumen por grupo muscular (el
+# primario cuenta 1.0).
+FITNESS_SECONDARY_MUSCLE_WEIGHT = 0.5
+
+# Tiempo (en segundos) durante el cual se repite la respuesta guardada de una
+# escritura enviada con Idempotency-Key.
+FITNESS_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Antigüedad (en días) a partir de la cual `archive_workouts` mueve los
+# workouts a los segmentos comprimidos.
+FITNESS_ARCHIVE_AFTER_DAYS = 3 * 365
@@ -0,0 +1,25 @@
+"""
+Settings de los tests:
+
+    python manage.py test --settings=core.settings_test
+
+Agregan el shard "shard1" (una base en memoria durante los tests, con su
+bloque de ids) para los tests del sharding, que lo activan con
+override_settings(FITNESS_SHARDS=...), y usan contadores de throttling en
+memoria, sin archivos de estado compartido.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, FITNESS_SHARD_ID_BLOCKS
+
+FITNESS_SHARD_ID_BLOCKS = {**FITNESS_SHARD_ID_BLOCKS, "shard1": 1}
+
+DATABASES = {
+    **DATABASES,
+    "shard1": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.shard1.sqlite3",
+    },
+}
+
+FITNESS_THROTTLE_STORE = None
@@ -0,0 +1,179 @@
+"""
+Actividad diaria compacta por usuario y año (calendario de actividad).
+
+Cada ActivityYear guarda, para los 366 días posibles de un año, la cantidad
+de workouts (un byte por día) y el volumen en kg (un uint32 little-endian por
+día). Un año completo ocupa menos de 2 KB y se lee con una consulta por
+clave, sin tocar Workout ni WorkoutSet.
+
+record_workout_change llama a refresh_activity con los totales de las semanas
+escritas (leídos una vez para todos los hooks) y solo se recalculan esos
+días. Un año que todavía no tiene fila (historial previo) se construye
+completo la primera vez que se lee o se escribe, y se guarda solo si tiene
+actividad. Los workouts archivados cuentan a partir de su resumen (ver
+fitness/archive.py).
+"""
+
+import sys
+from array import array
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Q, Sum
+
+from .buckets import VOLUME_EXPRESSION
+from .models import ActivityYear, ArchivedWorkout, Workout, WorkoutSet
+
+DAYS = 366
+MAX_COUNT = 255
+MAX_VOLUME = 2 ** 32 - 1
+
+
+def day_index(day):
+    """Posición del día dentro del año (0 = 1 de enero)"""
+    return day.timetuple().tm_yday - 1
+
+
+class YearActivity:
+    """Arrays decodificados de un ActivityYear"""
+    __slots__ = ('year', 'counts', 'volumes')
+
+    def __init__(self, year, counts=None, volumes=None):
+        self.year = year
+        self.counts = bytearray(counts) if counts else bytearray(DAYS)
+        self.volumes = array('I')
+        if volumes:
+            self.volumes.frombytes(bytes(volumes))
+            if sys.byteorder == 'big':
+                self.volumes.byteswap()
+        else:
+            self.volumes.extend([0] * DAYS)
+
+    def set_day(self, day, count, volume):
+        i = day_index(day)
+        self.counts[i] = min(count, MAX_COUNT)
+        self.volumes[i] = min(int(round(volume)), MAX_VOLUME)
+
+    def is_empty(self):
+        return not any(self.counts) and not any(self.volumes)
+
+    def count_on(self, day):
+        return self.counts[day_index(day)]
+
+    def days(self):
+        """(fecha, workouts, volumen) de cada día con actividad"""
+        start = date(self.year, 1, 1)
+        for i, count in enumerate(self.counts):
+            if count or self.volumes[i]:
+                yield start + timedelta(days=i), count, self.volumes[i]
+
+    def encoded_volumes(self):
+        volumes = array('I', self.volumes)
+        if sys.byteorder == 'big':
+            volumes.byteswap()
+        return volumes.tobytes()
+
+    def to_model(self, user_id, instance=None):
+        instance = instance or ActivityYear(user_id=user_id, year=self.year)
+        instance.counts = bytes(self.counts)
+        instance.volumes = self.encoded_volumes()
+        return instance
+
+
+def _aggregate(user_id, years):
+    """{fecha: (workouts, volumen)} de los años completos indicados"""
+
+    def in_days(field):
+        return reduce(or_, (Q(**{f'{field}__year': year}) for year in years))
+
+    days = {
+        day: [count, 0]
+        for day, count in Workout.objects.filter(in_days('date'), user_id=user_id)
+        .values_list('date')
+        .annotate(count=Count('id'))
+        .order_by()
+    }
+    for day, volume in (
+        WorkoutSet.objects.filter(
+            in_days('workout_exercise__workout__date'),
+            workout_exercise__workout__user_id=user_id,
+        )
+        .values_list('workout_exercise__workout__date')
+        .annotate(volume=Sum(VOLUME_EXPRESSION))
+        .order_by()
+    ):
+        days.setdefault(day, [0, 0])[1] = volume or 0
+    for day, count, volume in (
+        ArchivedWorkout.objects.filter(in_days('date'), user_id=user_id)
+        .values_list('date')
+        .annotate(count=Count('id'), volume=Sum('volume'))
+        .order_by()
+    ):
+        totals = days.setdefault(day, [0, 0])
+        totals[0] += count
+        totals[1] += volume
+    return days
+
+
+def _build(year, days):
+    activity = YearActivity(year)
+    for day, (count, volume) in days.items():
+        if day.year == year:
+            activity.set_day(day, count, volume)
+    return activity
+
+
+def get_activity(user_id, years):
+    """{año: YearActivity} de los años indicados, construyendo los que falten"""
+    years = set(years)
+    activity = {
+        row.year: YearActivity(row.year, row.counts, row.volumes)
+        for row in ActivityYear.objects.filter(user_id=user_id, year__in=years)
+    }
+    missing = years - activity.keys()
+    if missing:
+        days = _aggregate(user_id, missing)
+        built = {year: _build(year, days) for year in missing}
+        # Los años sin actividad no se guardan: leer cualquier año no crea filas
+        ActivityYear.objects.bulk_create(
+            [item.to_model(user_id) for item in built.values() if not item.is_empty()],
+            ignore_conflicts=True,
+        )
+        activity.update(built)
+    return activity
+
+
+def refresh_activity(user_id, written):
+    """
+    Recalcular los días escritos en los años guardados del usuario, desde los
+    totales de sus semanas (WrittenWeeks, ver fitness/changes.py)
+    """
+    dates = written.dates
+    if not dates:
+        return
+    years = {day.year for day in dates}
+    rows = {
+        row.year: row
+        for row in ActivityYear.objects.select_for_update().filter(
+            user_id=user_id, year__in=years
+        )
+    }
+    
+    updated = []
+    for year, row in rows.items():
+        activity = YearActivity(year, row.counts, row.volumes)
+        for day in dates:
+            if day.year == year:
+                count, volume = written.days.get(day, (0, 0))
+                activity.set_day(day, count, volume)
+        updated.append(activity.to_model(user_id, row))
+    if updated:
+        ActivityYear.objects.bulk_update(updated, ['counts', 'volumes'])
+    missing = years - rows.keys()
+    if missing:
+        days = _aggregate(user_id, missing)
+        created = [_build(year, days) for year in missing]
+        created = [activity.to_model(user_id) for activity in created if not activity.is_empty()]
+        if created:
+            ActivityYear.objects.bulk_create(created, ignore_conflicts=True)
@@ -1,5 +1,16 @@
+import json
+
 from django.contrib import admin
-from .models import Exercise
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .catalog import get_catalog
+from .changes import record_workout_change, workout_tree
+from .models import Exercise, ProfileReport, Workout, WorkoutExercise, WorkoutSet
+from .routers import get_shards, is_sharded, use_shard
+from .sharding import shard_atomic, shard_for_user
 
 # Register your models here.
 
@@ -18,3 +29,387 @@ class ExerciseAdmin(admin.ModelAdmin):
             'fields': ('equipment', 'difficulty', 'is_bodyweight', 'video_url')
         }),
     )
+
+
+# Workouts, ejercicios y sets
+#
+# Estas tablas tienen millones de filas, así que el admin:
+# - Pagina con un conteo estimado cuando el listado no tiene filtros.
+# - Filtra por ids (usuario, workout) con parámetros en la URL en lugar de
+#   listar todas las opciones, y por fecha con el índice (date, id).
+# - Muestra usuarios y ejercicios sin joins: los usuarios se traen con
+#   prefetch_related (pueden estar en otra base que el shard) y los
+#   ejercicios desde la foto del catálogo. Los formularios usan raw_id_fields.
+# - Elimina en lotes, registrando los cambios con record_workout_change para
+#   mantener la sincronización y los agregados.
+
+EXACT_COUNT_LIMIT = 10000
+BATCH_SIZE = 500
+
+
+def estimated_count(alias, table):
+    """Cantidad aproximada de filas de la tabla, sin recorrerla (o None)"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor != 'sqlite':
+            return None
+        # Estadísticas de ANALYZE: el primer número de cada fila es la cantidad
+        # de filas de la tabla. Sin ANALYZE la tabla sqlite_stat1 no existe.
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+        counts = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat]
+        return max(counts) if counts else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator que estima el total de un listado sin filtros sobre tablas grandes"""
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.db, queryset.model._meta.db_table)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class IdListFilter(admin.SimpleListFilter):
+    """
+    Filtro por id (`?<parameter_name>=<id>`) que no lista las opciones: solo
+    muestra la elegida. Se llega con un link (p. ej. desde el usuario) o
+    escribiendo el id en la URL.
+    """
+    field = None
+    
+    def lookups(self, request, model_admin):
+        value = self.value()
+        return [(value, f'#{value}')] if value and value.isdigit() else []
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None:
+            return queryset
+        if not value.isdigit():
+            return queryset.none()
+        return queryset.filter(**{self.field: int(value)})
+
+
+class UserIdFilter(IdListFilter):
+    title = 'user id'
+    parameter_name = 'user'
+    field = 'user_id'
+
+
+class WorkoutIdFilter(IdListFilter):
+    title = 'workout id'
+    parameter_name = 'workout'
+    field = 'workout_id'
+
+
+class SetWorkoutIdFilter(WorkoutIdFilter):
+    field = 'workout_exercise__workout_id'
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Shard del listado; el filtrado lo hace ShardedModelAdmin"""
+    title = 'shard'
+    parameter_name = 'shard'
+    
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in get_shards()]
+    
+    def queryset(self, request, queryset):
+        return queryset
+
+
+class ShardedModelAdmin(admin.ModelAdmin):
+    """
+    Admin de un modelo con shard (ver fitness/routers.py).
+    
+    Cada vista corre con un shard activo: el del objeto pedido, el del
+    parámetro `shard`, el del usuario o workout filtrado o, si no, el primero.
+    Con un solo shard esto no agrega consultas.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return (ShardFilter, *list_filter) if is_sharded() else list_filter
+    
+    def shard_for_request(self, request, object_id=None):
+        shards = get_shards()
+        if len(shards) == 1:
+            return shards[0]
+        if object_id is not None:
+            return self._find(self.model, object_id) or shards[0]
+        if request.GET.get('shard') in shards:
+            return request.GET['shard']
+        # Al agregar, el usuario elegido en el formulario
+        user = request.POST.get('user', '') or request.GET.get('user', '')
+        if user.isdigit():
+            return shard_for_user(int(user))
+        workout = request.GET.get('workout', '')
+        if workout.isdigit():
+            return self._find(Workout, workout) or shards[0]
+        return shards[0]
+    
+    def _find(self, model, pk):
+        for alias in get_shards():
+            try:
+                if model._default_manager.using(alias).filter(pk=pk).exists():
+                    return alias
+            except (ValueError, ValidationError):
+                return None
+        return None
+    
+    def _in_shard(self, alias, view, *args, **kwargs):
+        with use_shard(alias):
+            response = view(*args, **kwargs)
+            # Los querysets de la plantilla se evalúan al renderizar
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+    
+    def changelist_view(self, request, extra_context=None):
+        return self._in_shard(
+            self.shard_for_request(request), super().changelist_view, request, extra_context
+        )
+    
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        return self._in_shard(
+            self.shard_for_request(request, object_id),
+            super().changeform_view, request, object_id, form_url, extra_context,
+        )
+    
+    def delete_view(self, request, object_id, extra_context=None):
+        return self._in_shard(
+            self.shard_for_request(request, object_id),
+            super().delete_view, request, object_id, extra_context,
+        )
+    
+    def history_view(self, request, object_id, extra_context=None):
+        return self._in_shard(
+            self.shard_for_request(request, object_id),
+            super().history_view, request, object_id, extra_context,
+        )
+
+
+def workout_state(workout_id):
+    """((usuario, fecha) o None, árbol, ejercicios) de un workout"""
+    workout = Workout.objects.filter(pk=workout_id).values_list('user_id', 'date').first()
+    if workout is None:
+        return None, set(), set()
+    exercise_ids = set(
+        WorkoutExercise.objects.filter(workout_id=workout_id).values_list('exercise_id', flat=True)
+    )
+    return workout, set(workout_tree([workout_id])), exercise_ids
+
+
+class WorkoutChangeAdmin(ShardedModelAdmin):
+    """
+    Registra las ediciones hechas desde el admin con record_workout_change,
+    comparando el árbol del workout antes y después de guardar.
+    """
+    
+    def workout_id_of(self, obj):
+        raise NotImplementedError
+    
+    def get_actions(self, request):
+        # delete_selected carga todas las filas y sus relaciones
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+    
+    def save_model(self, request, obj, form, change):
+        request._workout_before = workout_state(self.workout_id_of(obj)) if change else None
+        super().save_model(request, obj, form, change)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        self._record(self.workout_id_of(form.instance), request._workout_before)
+    
+    def delete_model(self, request, obj):
+        workout_id = self.workout_id_of(obj)
+        before = workout_state(workout_id)
+        super().delete_model(request, obj)
+        self._record(workout_id, before)
+    
+    def _record(self, workout_id, before):
+        workout_before, tree_before, exercises_before = before or (None, set(), set())
+        workout, tree, exercise_ids = workout_state(workout_id)
+        rows = [row for row in (workout_before, workout) if row]
+        record_workout_change(
+            rows[0][0],
+            upserted=sorted(tree),
+            deleted=sorted(tree_before - tree),
+            dates={day for _, day in rows},
+            exercise_ids=exercises_before | exercise_ids,
+        )
+
+
+class WorkoutExerciseInline(admin.TabularInline):
+    model = WorkoutExercise
+    fields = ('order', 'exercise', 'target_sets', 'target_reps')
+    raw_id_fields = ('exercise',)
+    extra = 0
+    show_change_link = True
+
+
+@admin.register(Workout)
+class WorkoutAdmin(WorkoutChangeAdmin):
+    list_display = ('id', 'date', 'user_email', 'duration_min', 'updated_at')
+    list_filter = (UserIdFilter, ('date', admin.DateFieldListFilter))
+    ordering = ('-date',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('updated_at',)
+    inlines = [WorkoutExerciseInline]
+    actions = ['delete_in_batches']
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Cambiar de usuario movería el workout entre historiales (y shards)
+        return ('user', 'updated_at') if obj else ('updated_at',)
+    
+    def get_queryset(self, request):
+        # Sin join: el usuario puede estar en otra base que el shard
+        return super().get_queryset(request).prefetch_related('user')
+    
+    def workout_id_of(self, obj):
+        return obj.pk
+    
+    @admin.display(description='user')
+    def user_email(self, obj):
+        return obj.user.email
+    
+    @admin.action(description='Delete selected workouts (in batches)', permissions=['delete'])
+    def delete_in_batches(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(ids), BATCH_SIZE):
+            with shard_atomic():
+                self._delete_batch(ids[start:start + BATCH_SIZE])
+        self.message_user(request, f'{len(ids)} workouts deleted.')
+    
+    def _delete_batch(self, ids):
+        by_user = {}
+        for pk, user_id, day in Workout.objects.filter(pk__in=ids).values_list('pk', 'user_id', 'date'):
+            workouts, dates = by_user.setdefault(user_id, ([], set()))
+            workouts.append(pk)
+            dates.add(day)
+        exercises = {}
+        for workout_id, exercise_id in WorkoutExercise.objects.filter(
+            workout_id__in=ids
+        ).values_list('workout_id', 'exercise_id'):
+            exercises.setdefault(workout_id, set()).add(exercise_id)
+        trees = {user_id: workout_tree(workouts) for user_id, (workouts, _) in by_user.items()}
+    
+        WorkoutSet.objects.filter(workout_exercise__workout_id__in=ids).delete()
+        WorkoutExercise.objects.filter(workout_id__in=ids).delete()
+        Workout.objects.filter(pk__in=ids).delete()
+        for user_id, (workouts, dates) in by_user.items():
+            record_workout_change(
+                user_id,
+                deleted=trees[user_id],
+                dates=dates,
+                exercise_ids=set().union(*(exercises.get(pk, ()) for pk in workouts)),
+            )
+
+
+class WorkoutSetInline(admin.TabularInline):
+    model = WorkoutSet
+    fields = ('set_number', 'reps_completed', 'weight_kg', 'rpe', 'rest_sec')
+    extra = 0
+
+
+@admin.register(WorkoutExercise)
+class WorkoutExerciseAdmin(WorkoutChangeAdmin):
+    """Se crean desde el workout; aquí se editan con sus sets"""
+    list_display = ('id', 'workout_id', 'exercise_name', 'order', 'target_sets', 'target_reps')
+    list_filter = (WorkoutIdFilter,)
+    ordering = ('-id',)
+    fields = ('workout', 'exercise', 'order', 'target_sets', 'target_reps')
+    raw_id_fields = ('exercise',)
+    readonly_fields = ('workout',)
+    inlines = [WorkoutSetInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def workout_id_of(self, obj):
+        return obj.workout_id
+    
+    @admin.display(description='exercise')
+    def exercise_name(self, obj):
+        return get_catalog().name_of(obj.exercise_id)
+
+
+@admin.register(WorkoutSet)
+class WorkoutSetAdmin(WorkoutChangeAdmin):
+    """Se crean desde el workout; aquí se corrigen"""
+    list_display = (
+        'id', 'workout_exercise_id', 'set_number', 'reps_completed', 'weight_kg', 'rpe',
+        'rest_sec',
+    )
+    list_filter = (SetWorkoutIdFilter,)
+    ordering = ('-id',)
+    fields = ('workout_exercise', 'set_number', 'reps_completed', 'weight_kg', 'rpe', 'rest_sec')
+    readonly_fields = ('workout_exercise',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def workout_id_of(self, obj):
+        return WorkoutExercise.objects.filter(
+            pk=obj.workout_exercise_id
+        ).values_list('workout_id', flat=True).first()
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    """Reportes de perfil de requests (solo lectura, ver fitness/profiling.py)"""
+    list_display = (
+        'created_at', 'method', 'path', 'status_code', 'duration_ms', 'sql_count',
+        'sql_ms', 'serializer_ms', 'user',
+    )
+    list_filter = ('method', 'status_code')
+    search_fields = ('path',)
+    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+    ordering = ('-created_at',)
+    
+    fieldsets = (
+        ('Request', {
+            'fields': ('created_at', 'user', 'method', 'path', 'query_string', 'status_code')
+        }),
+        ('Tiempos', {
+            'fields': ('duration_ms', 'sql_count', 'sql_ms', 'serializer_ms')
+        }),
+        ('Detalle', {
+            'fields': ('slowest_queries', 'top_functions')
+        }),
+    )
+    readonly_fields = (
+        'created_at', 'user', 'method', 'path', 'query_string', 'status_code',
+        'duration_ms', 'sql_count', 'sql_ms', 'serializer_ms', 'slowest_queries',
+        'top_functions',
+    )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    @admin.display(description='Consultas más lentas')
+    def slowest_queries(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.queries, indent=2, ensure_ascii=False))
+    
+    @admin.display(description='Funciones (tiempo acumulado)')
+    def top_functions(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.functions, indent=2, ensure_ascii=False))
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FitnessConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "fitness"
+
+    def ready(self):
+        # Registrar las señales que invalidan la foto del catálogo y ubican
+        # a los usuarios nuevos en un shard
+        from . import catalog  # noqa: F401
+        from . import sharding
+
+        post_migrate.connect(sharding.reserve_id_ranges, sender=self)
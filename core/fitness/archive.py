@@ -0,0 +1,347 @@
+"""
+Archivo de workouts antiguos en segmentos comprimidos por usuario y año.
+
+El comando `archive_workouts` mueve los workouts con más de
+FITNESS_ARCHIVE_AFTER_DAYS días (con sus ejercicios y sets) a un
+ArchiveSegment por usuario y año y los borra de las tablas, que quedan con
+el historial reciente que leen los listados y las estadísticas.
+
+Formato del segmento: por cada tabla, un dict campo → lista de valores
+(columnar), con fechas como ordinales y pesos/RPE como enteros escalados,
+serializado con MessagePack y comprimido con zlib.
+
+Cada workout archivado deja un ArchivedWorkout con su id original y sus
+totales (sets, volumen, duración, mejor 1RM por ejercicio), y un
+ArchivedExercise por ejercicio (sets, volumen, set de mayor volumen y de
+mayor 1RM). Con ellos:
+
+- Las estadísticas por período (fitness/buckets.py), el calendario de
+  actividad (fitness/activity.py) y los rankings semanales
+  (fitness/leaderboards.py) siguen incluyendo el historial archivado.
+- Las estadísticas por ejercicio (volumen, top sets, 1RM, músculos) suman
+  los resúmenes por ejercicio; de cada workout archivado, los top sets
+  incluyen solo el mejor set de cada ejercicio.
+- El historial por ejercicio (fitness/history.py) sigue en los segmentos
+  cuando las sesiones en las tablas no alcanzan (archived_sessions).
+- El listado de workouts los incluye sin notas ni ejercicios, y la
+  sincronización informa sus ids (operación archive en WorkoutChange).
+- Pedir un workout archivado por id (detalle, clonar) lo restaura: vuelve a
+  las tablas con los mismos ids y sale del segmento (restore).
+"""
+
+import zlib
+from datetime import date
+from decimal import Decimal
+
+import msgpack
+from django.db.models import Case, F, Value, When, Window
+from django.db.models.functions import Rank
+
+from .changes import record_archive_change
+from .models import (
+    ArchiveSegment, ArchivedExercise, ArchivedWorkout, Workout, WorkoutChange, WorkoutExercise,
+    WorkoutSet,
+)
+from .sharding import shard_atomic
+
+WORKOUT_COLUMNS = ('id', 'date', 'notes', 'duration_min')
+EXERCISE_COLUMNS = ('id', 'workout_id', 'exercise_id', 'order', 'target_sets', 'target_reps')
+SET_COLUMNS = (
+    'id', 'workout_exercise_id', 'set_number', 'reps_completed', 'weight_kg', 'rpe', 'rest_sec',
+)
+# (tabla en el segmento, modelo, columnas, tipo en el registro de cambios)
+TABLES = (
+    ('workouts', Workout, WORKOUT_COLUMNS, WorkoutChange.WORKOUT),
+    ('exercises', WorkoutExercise, EXERCISE_COLUMNS, WorkoutChange.WORKOUT_EXERCISE),
+    ('sets', WorkoutSet, SET_COLUMNS, WorkoutChange.WORKOUT_SET),
+)
+
+
+def _fixed(places):
+    return (
+        lambda value: int(value.scaleb(places)),
+        lambda value: Decimal(value).scaleb(-places),
+    )
+
+
+# Campos que se guardan como enteros: (empaquetar, desempaquetar)
+CONVERTERS = {
+    'date': (date.toordinal, date.fromordinal),
+    'weight_kg': _fixed(2),
+    'rpe': _fixed(1),
+}
+
+
+def _convert(name, value, direction):
+    if value is None or name not in CONVERTERS:
+        return value
+    return CONVERTERS[name][direction](value)
+
+
+def encode_segment(tables):
+    """{tabla: [filas empaquetadas]} → bytes comprimidos"""
+    columns = {
+        table: {
+            name: [row[i] for row in tables[table]] for i, name in enumerate(names)
+        }
+        for table, _, names, _ in TABLES
+    }
+    return zlib.compress(msgpack.packb(columns, use_bin_type=True), 9)
+
+
+def decode_segment(data):
+    """bytes comprimidos → {tabla: [filas empaquetadas]}"""
+    columns = msgpack.unpackb(zlib.decompress(bytes(data)), raw=False)
+    return {
+        table: list(zip(*(columns[table][name] for name in names)))
+        for table, _, names, _ in TABLES
+    }
+
+
+def archive_user(user_id, before):
+    """Archivar los workouts del usuario anteriores a `before`; devuelve cuántos"""
+    years = Workout.objects.filter(user_id=user_id, date__lt=before).dates('date', 'year')
+    return sum(archive_year(user_id, year.year, before) for year in years)
+
+
+def archive_year(user_id, year, before):
+    """Archivar los workouts de un año (anteriores a `before`) en su segmento"""
+    end = min(before, date(year + 1, 1, 1))
+    with shard_atomic():
+        workouts = Workout.objects.filter(
+            user_id=user_id, date__gte=date(year, 1, 1), date__lt=end
+        )
+        querysets = {
+            'workouts': workouts,
+            'exercises': WorkoutExercise.objects.filter(workout__in=workouts),
+            'sets': WorkoutSet.objects.filter(workout_exercise__workout__in=workouts),
+        }
+        rows = {
+            table: [
+                tuple(_convert(name, value, 0) for name, value in zip(names, row))
+                for row in querysets[table].order_by('id').values_list(*names)
+            ]
+            for table, _, names, _ in TABLES
+        }
+        if not rows['workouts']:
+            return 0
+
+        segment = (
+            ArchiveSegment.objects.select_for_update().filter(user_id=user_id, year=year).first()
+            or ArchiveSegment(user_id=user_id, year=year)
+        )
+        tables = decode_segment(segment.data) if segment.pk else {t[0]: [] for t in TABLES}
+        for table in tables:
+            tables[table] += rows[table]
+        _save_segment(segment, tables)
+        ArchivedWorkout.objects.bulk_create(_summaries(user_id, segment, rows), batch_size=500)
+        ArchivedExercise.objects.bulk_create(exercise_summaries(user_id, rows), batch_size=500)
+
+        for table, _, _, _ in reversed(TABLES):
+            querysets[table].delete()
+        record_archive_change(user_id, archived=[row[0] for row in rows['workouts']])
+    return len(rows['workouts'])
+
+
+def restore(user_id, workout_ids):
+    """
+    Devolver a las tablas los workouts archivados indicados, con sus ids
+    originales. Devuelve los ids restaurados (vacío si ninguno estaba
+    archivado).
+    """
+    with shard_atomic():
+        by_segment = {}
+        for pk, segment_id in ArchivedWorkout.objects.filter(
+            user_id=user_id, pk__in=workout_ids
+        ).values_list('pk', 'segment_id'):
+            by_segment.setdefault(segment_id, set()).add(pk)
+        if not by_segment:
+            return []
+
+        restored = []
+        for segment in ArchiveSegment.objects.select_for_update().filter(pk__in=by_segment):
+            tables = decode_segment(segment.data)
+            workout_ids = by_segment[segment.pk]
+            exercise_ids = {row[0] for row in tables['exercises'] if row[1] in workout_ids}
+            selected = {
+                'workouts': lambda row: row[0] in workout_ids,
+                'exercises': lambda row: row[0] in exercise_ids,
+                'sets': lambda row: row[1] in exercise_ids,
+            }
+            kept = {}
+            for table, model, names, kind in TABLES:
+                rows = [row for row in tables[table] if selected[table](row)]
+                kept[table] = [row for row in tables[table] if not selected[table](row)]
+                extra = {'user_id': user_id} if model is Workout else {}
+                model.objects.bulk_create(
+                    [
+                        model(**extra, **{
+                            name: _convert(name, value, 1) for name, value in zip(names, row)
+                        })
+                        for row in rows
+                    ],
+                    batch_size=500,
+                )
+                restored += [(kind, row[0]) for row in rows]
+
+            ArchivedWorkout.objects.filter(pk__in=workout_ids).delete()
+            if kept['workouts']:
+                _save_segment(segment, kept)
+            else:
+                segment.delete()
+
+        record_archive_change(user_id, restored=restored)
+    return [pk for kind, pk in restored if kind == WorkoutChange.WORKOUT]
+
+
+def _save_segment(segment, tables):
+    segment.data = encode_segment(tables)
+    segment.workout_count = len(tables['workouts'])
+    segment.set_count = len(tables['sets'])
+    segment.save()
+
+
+def best_e1rm(rows):
+    """
+    {workout: {id de ejercicio: mejor 1RM estimado}} de las filas empaquetadas,
+    con la fórmula de fitness/leaderboards.py (Epley)
+    """
+    exercise_of = {row[0]: (row[1], str(row[2])) for row in rows['exercises']}
+    best = {row[0]: {} for row in rows['workouts']}
+    for _, workout_exercise_id, _, reps, weight, _, _ in rows['sets']:
+        if weight is None:
+            continue
+        workout_id, exercise_id = exercise_of[workout_exercise_id]
+        value = round(weight * (reps + 30) / 3000.0, 2)  # weight en centésimas de kg
+        if value > best[workout_id].get(exercise_id, 0):
+            best[workout_id][exercise_id] = value
+    return best
+
+
+def exercise_summaries(user_id, rows):
+    """
+    ArchivedExercise de las filas empaquetadas: por workout y ejercicio, sets,
+    volumen de los sets con peso, el set de mayor volumen y el de mayor 1RM
+    estimado
+    """
+    day_of = {row[0]: row[1] for row in rows['workouts']}
+    exercise_of = {row[0]: (row[1], row[2]) for row in rows['exercises']}
+    # (workout, ejercicio) → [sets, volumen, top (peso, reps), best (peso, reps)]
+    totals = {key: [0, 0, None, None] for key in exercise_of.values()}
+    for _, workout_exercise_id, _, reps, weight, _, _ in rows['sets']:
+        total = totals[exercise_of[workout_exercise_id]]
+        total[0] += 1
+        if weight is None:
+            continue
+        total[1] += reps * weight  # centésimas de kg
+        if total[2] is None or reps * weight > total[2][1] * total[2][0]:
+            total[2] = (weight, reps)
+        # Epley: el orden por peso × (reps + 30) es el del 1RM estimado
+        if total[3] is None or weight * (reps + 30) > total[3][0] * (total[3][1] + 30):
+            total[3] = (weight, reps)
+    return [
+        ArchivedExercise(
+            user_id=user_id,
+            workout_id=workout_id,
+            exercise_id=exercise_id,
+            date=date.fromordinal(day_of[workout_id]),
+            set_count=sets,
+            volume=Decimal(volume).scaleb(-2),
+            top_weight=_convert('weight_kg', top and top[0], 1),
+            top_reps=top and top[1],
+            best_weight=_convert('weight_kg', best and best[0], 1),
+            best_reps=best and best[1],
+        )
+        for (workout_id, exercise_id), (sets, volume, top, best) in totals.items()
+    ]
+
+
+def _summaries(user_id, segment, rows):
+    """ArchivedWorkout de las filas empaquetadas, con sets, volumen y 1RM por workout"""
+    workout_of = {row[0]: row[1] for row in rows['exercises']}
+    totals = {row[0]: [0, 0] for row in rows['workouts']}
+    for _, workout_exercise_id, _, reps, weight, _, _ in rows['sets']:
+        total = totals[workout_of[workout_exercise_id]]
+        total[0] += 1
+        if weight is not None:
+            total[1] += reps * weight  # centésimas de kg
+    e1rm = best_e1rm(rows)
+    return [
+        ArchivedWorkout(
+            id=pk,
+            user_id=user_id,
+            segment=segment,
+            date=date.fromordinal(day),
+            duration_min=duration,
+            set_count=totals[pk][0],
+            volume=Decimal(totals[pk][1]).scaleb(-2),
+            e1rm=e1rm[pk],
+        )
+        for pk, day, _, duration in rows['workouts']
+    ]
+
+
+def archived_sessions(user_id, exercise_ids, sessions, before=None):
+    """
+    {ejercicio: [sesión, ...]} de los workouts archivados, con el formato de
+    fitness/history.py, de la más reciente a la más antigua: al menos las
+    `sessions` más recientes de cada ejercicio anteriores al cursor `before`.
+
+    Los resúmenes por ejercicio eligen los workouts (un RANK por fecha y
+    ejercicio) y solo se descomprimen los segmentos que los contienen.
+    """
+    summaries = ArchivedExercise.objects.filter(
+        user_id=user_id, exercise_id__in=exercise_ids, set_count__gt=0
+    )
+    partition = [F('exercise_id')]
+    if before is not None:
+        summaries = summaries.filter(date__lte=before[0])
+        # Las del día del cursor se filtran por id al descomprimir: van en su
+        # propia partición para no ocupar lugares de las anteriores
+        partition.append(
+            Case(When(date=before[0], then=Value(True)), default=Value(False))
+        )
+    rows = (
+        summaries.annotate(
+            rank=Window(Rank(), partition_by=partition, order_by=F('date').desc())
+        )
+        .filter(rank__lte=sessions)
+        .values_list('workout__segment_id', 'workout_id', 'exercise_id')
+    )
+    selected = {}
+    for segment_id, workout_id, exercise_id in rows:
+        selected.setdefault(segment_id, {}).setdefault(workout_id, set()).add(exercise_id)
+
+    history = {exercise_id: [] for exercise_id in exercise_ids}
+    for segment_id, data in ArchiveSegment.objects.filter(pk__in=selected).values_list('pk', 'data'):
+        tables = decode_segment(data)
+        workouts = selected[segment_id]
+        day_of = {
+            row[0]: date.fromordinal(row[1]) for row in tables['workouts'] if row[0] in workouts
+        }
+        exercise_of = {
+            row[0]: (row[1], row[2])
+            for row in tables['exercises']
+            if row[1] in workouts and row[2] in workouts[row[1]]
+        }
+        sets = {}
+        for _, workout_exercise_id, set_number, reps, weight, rpe, _ in tables['sets']:
+            if workout_exercise_id in exercise_of:
+                sets.setdefault(workout_exercise_id, []).append([
+                    set_number, reps, _convert('weight_kg', weight, 1), _convert('rpe', rpe, 1),
+                ])
+        for workout_exercise_id, items in sets.items():
+            workout_id, exercise_id = exercise_of[workout_exercise_id]
+            day = day_of[workout_id]
+            if before is not None and (day, workout_exercise_id) >= before:
+                continue
+            history[exercise_id].append({
+                'date': day,
+                'workout_id': workout_id,
+                'workout_exercise_id': workout_exercise_id,
+                'sets': sorted(items),
+            })
+
+    for items in history.values():
+        items.sort(key=lambda session: (session['date'], session['workout_exercise_id']), reverse=True)
+    return history
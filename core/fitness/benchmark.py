@@ -0,0 +1,230 @@
+"""
+Suite de benchmarks de la API de fitness.
+
+Ejecuta cada escenario contra la base de datos configurada usando el cliente de
+pruebas de DRF (sin servidor HTTP) y reporta latencia p50/p95, consultas SQL
+por request y throughput. Los escenarios de escritura se ejecutan dentro de una
+transacción que se revierte, de modo que el dataset no cambia entre corridas.
+"""
+
+import json
+import platform
+import time
+from pathlib import Path
+
+from django.conf import settings
+from contextlib import ExitStack
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Exercise, Workout
+from .routers import current_shard, get_shards, use_shard
+from .sharding import shard_atomic, shard_for_user
+
+DEFAULT_BASELINE_PATH = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+class Scenario:
+    """Un request a medir: método, URL y payload opcional"""
+
+    def __init__(self, name, method, path, payload=None, writes=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.payload = payload
+        self.writes = writes
+
+
+def build_scenarios(user):
+    """Construir los escenarios para un usuario con historial"""
+    workout = Workout.objects.filter(user=user).order_by("-date", "-id").first()
+    if workout is None:
+        raise ValueError(f"El usuario {user} no tiene workouts para el benchmark")
+    exercise_ids = list(Exercise.objects.values_list("id", flat=True)[:4])
+
+    create_payload = {
+        "date": timezone.now().date().isoformat(),
+        "notes": "Benchmark",
+        "duration_min": 60,
+        "workout_exercises": [
+            {
+                "exercise": exercise_id,
+                "order": order,
+                "target_sets": 4,
+                "target_reps": 8,
+                "sets": [
+                    {
+                        "set_number": number,
+                        "reps_completed": 8,
+                        "weight_kg": "60.00",
+                        "rpe": "8.0",
+                        "rest_sec": 90,
+                    }
+                    for number in range(1, 5)
+                ],
+            }
+            for order, exercise_id in enumerate(exercise_ids, start=1)
+        ],
+    }
+
+    update_payload = {
+        "notes": "Benchmark",
+        "workout_exercises": create_payload["workout_exercises"],
+    }
+
+    return [
+        Scenario("workout-list", "GET", "/api/workouts/"),
+        Scenario("workout-create", "POST", "/api/workouts/", create_payload, True),
+        Scenario("workout-detail", "GET", f"/api/workouts/{workout.pk}/"),
+        Scenario(
+            "workout-update",
+            "PATCH",
+            f"/api/workouts/{workout.pk}/",
+            update_payload,
+            True,
+        ),
+        Scenario("exercise-list", "GET", "/api/exercises/"),
+        Scenario("exercise-detail", "GET", f"/api/exercises/{exercise_ids[0]}/"),
+        Scenario("stats-volume", "GET", "/api/stats/volume/"),
+        Scenario("stats-top-sets", "GET", "/api/stats/top-sets/"),
+        Scenario("stats-1rm", "GET", f"/api/stats/1rm/?exercise_id={exercise_ids[0]}"),
+        Scenario("stats-consistency", "GET", "/api/stats/consistency/?days=365"),
+    ]
+
+
+def _percentile(samples, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    index = min(len(samples) - 1, max(0, round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def _request(client, scenario):
+    data = json.dumps(scenario.payload) if scenario.payload is not None else None
+    return client.generic(
+        scenario.method, scenario.path, data, content_type="application/json"
+    )
+
+
+def _run_once(client, scenario):
+    """Ejecutar un request; las escrituras se revierten al terminar"""
+    if not scenario.writes:
+        return _request(client, scenario)
+    with shard_atomic():
+        response = _request(client, scenario)
+        for alias in {DEFAULT_DB_ALIAS, current_shard()}:
+            transaction.set_rollback(True, using=alias)
+    return response
+
+
+def run_scenario(client, scenario, iterations, warmup):
+    # Contar consultas en una pasada separada para no medir el overhead
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in {DEFAULT_DB_ALIAS, current_shard()}
+        ]
+        response = _run_once(client, scenario)
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f"{scenario.name}: {scenario.method} {scenario.path} devolvió "
+            f"{response.status_code}: {response.content[:200]!r}"
+        )
+    queries = sum(len(ctx.captured_queries) for ctx in contexts)
+
+    for _ in range(warmup):
+        _run_once(client, scenario)
+
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        _run_once(client, scenario)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    total = sum(durations)
+
+    return {
+        "p50_ms": round(_percentile(durations, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(durations, 0.95) * 1000, 3),
+        "mean_ms": round(total / len(durations) * 1000, 3),
+        "queries": queries,
+        "throughput_rps": round(len(durations) / total, 1) if total else None,
+        "response_bytes": len(response.content),
+    }
+
+
+def run_benchmarks(user, iterations=50, warmup=5, only=None, host="localhost"):
+    """Ejecutar todos los escenarios y devolver {nombre: métricas}"""
+    client = APIClient(HTTP_HOST=host)
+    client.force_authenticate(user=user)
+
+    # Tasas de throttling altas: se mide el costo del throttle sin recibir 429
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rest_framework["DEFAULT_THROTTLE_RATES"] = {
+        scope: "1000000/min"
+        for scope in rest_framework.get("DEFAULT_THROTTLE_RATES", {})
+    }
+
+    results = {}
+    # El shard del usuario, para las consultas propias y las transacciones
+    # que revierten las escrituras
+    with override_settings(REST_FRAMEWORK=rest_framework), use_shard(shard_for_user(user.pk)):
+        for scenario in build_scenarios(user):
+            if only and scenario.name not in only:
+                continue
+            results[scenario.name] = run_scenario(
+                client, scenario, iterations, warmup
+            )
+    return results
+
+
+def build_report(results, user, iterations):
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "debug": settings.DEBUG,
+            "iterations": iterations,
+            "workouts": Workout.objects.using(shard_for_user(user.pk)).filter(user=user).count(),
+            "total_workouts": sum(Workout.objects.using(alias).count() for alias in get_shards()),
+        },
+        "results": results,
+    }
+
+
+def load_baseline(path=DEFAULT_BASELINE_PATH):
+    path = Path(path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_baseline(report, path=DEFAULT_BASELINE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+def compare(results, baseline):
+    """Diferencia porcentual de p50/p95 y diferencia absoluta de consultas"""
+    rows = {}
+    base_results = baseline.get("results", {}) if baseline else {}
+    for name, metrics in results.items():
+        base = base_results.get(name)
+        if not base:
+            continue
+        rows[name] = {
+            "p50_change_pct": _change(metrics["p50_ms"], base["p50_ms"]),
+            "p95_change_pct": _change(metrics["p95_ms"], base["p95_ms"]),
+            "queries_delta": metrics["queries"] - base["queries"],
+        }
+    return rows
+
+
+def _change(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) / previous * 100, 1)
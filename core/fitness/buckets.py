@@ -0,0 +1,207 @@
+"""
+Estadísticas agregadas por período (día, semana, mes o año).
+
+Un período que ya terminó no cambia salvo que se escriba un workout con fecha
+dentro de él, así que sus agregados se guardan en StatsBucket la primera vez
+que se piden y se reutilizan en adelante. Solo el período en curso (y los
+que falten) se calculan en cada request.
+
+record_workout_change recibe las fechas de los workouts escritos y elimina los
+períodos guardados que las contienen (invalidate_buckets). Los agregados
+incluyen los workouts archivados, a partir de su resumen (ver
+fitness/archive.py).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, ExpressionWrapper, F, Q, Sum
+
+from .fields import FixedPointField
+from .models import ArchivedWorkout, StatsBucket, Workout, WorkoutSet
+
+GRANULARITIES = tuple(value for value, _ in StatsBucket.GRANULARITY_CHOICES)
+
+# weight_kg se guarda en centésimas de kg: el producto conserva esa escala
+VOLUME_EXPRESSION = ExpressionWrapper(
+    F('reps_completed') * F('weight_kg'),
+    output_field=FixedPointField(max_digits=12, decimal_places=2),
+)
+
+
+def bucket_start(day, granularity):
+    """Primer día del período que contiene `day` (las semanas empiezan el lunes)"""
+    if granularity == StatsBucket.DAY:
+        return day
+    if granularity == StatsBucket.WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == StatsBucket.MONTH:
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def next_start(start, granularity):
+    """Primer día del período siguiente"""
+    if granularity == StatsBucket.DAY:
+        return start + timedelta(days=1)
+    if granularity == StatsBucket.WEEK:
+        return start + timedelta(days=7)
+    if granularity == StatsBucket.MONTH:
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start.replace(year=start.year + 1)
+
+
+def bucket_count(date_from, date_to, granularity):
+    """Cantidad de períodos que intersecan [date_from, date_to], sin recorrerlos"""
+    if granularity == StatsBucket.DAY:
+        return (date_to - date_from).days + 1
+    if granularity == StatsBucket.WEEK:
+        return (bucket_start(date_to, granularity) - bucket_start(date_from, granularity)).days // 7 + 1
+    if granularity == StatsBucket.MONTH:
+        return (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+    return date_to.year - date_from.year + 1
+
+
+def bucket_starts(date_from, date_to, granularity):
+    """Inicios de los períodos que intersecan [date_from, date_to]"""
+    starts = []
+    start = bucket_start(date_from, granularity)
+    while start <= date_to:
+        starts.append(start)
+        start = next_start(start, granularity)
+    return starts
+
+
+def invalidate_buckets(user_id, dates):
+    """Eliminar los períodos guardados del usuario que contienen alguna fecha"""
+    keys = {
+        (granularity, bucket_start(day, granularity))
+        for day in dates
+        for granularity in GRANULARITIES
+    }
+    if keys:
+        StatsBucket.objects.filter(user_id=user_id).filter(
+            reduce(or_, (Q(granularity=g, start=start) for g, start in keys))
+        ).delete()
+
+
+def get_buckets(user_id, granularity, date_from, date_to, today):
+    """
+    Agregados de los períodos que intersecan [date_from, date_to], en orden.
+
+    Cada período se devuelve completo (start, end, volume, set_count,
+    workout_count, duration_min). Los períodos cerrados que no estaban
+    guardados se guardan.
+    """
+    from .changes import get_workout_version
+
+    starts = bucket_starts(date_from, date_to, granularity)
+    stored = {
+        row[0]: row[1:]
+        for row in StatsBucket.objects.filter(
+            user_id=user_id, granularity=granularity, start__range=(starts[0], starts[-1])
+        ).values_list('start', 'volume', 'set_count', 'workout_count', 'duration_min')
+    }
+    missing = [start for start in starts if start not in stored]
+
+    if missing:
+        closed = [start for start in missing if next_start(start, granularity) <= today]
+        version = get_workout_version(user_id)[0] if closed else None
+        computed = _aggregate(user_id, granularity, missing)
+        stored.update(computed)
+
+        # Si hubo una escritura mientras se calculaba, no guardar
+        if closed and get_workout_version(user_id)[0] == version:
+            StatsBucket.objects.bulk_create(
+                [
+                    StatsBucket(
+                        user_id=user_id,
+                        granularity=granularity,
+                        start=start,
+                        volume=computed[start][0],
+                        set_count=computed[start][1],
+                        workout_count=computed[start][2],
+                        duration_min=computed[start][3],
+                    )
+                    for start in closed
+                ],
+                ignore_conflicts=True,
+            )
+
+    return [
+        {
+            'start': start,
+            'end': next_start(start, granularity) - timedelta(days=1),
+            'volume': stored[start][0],
+            'set_count': stored[start][1],
+            'workout_count': stored[start][2],
+            'duration_min': stored[start][3],
+        }
+        for start in starts
+    ]
+
+
+def _aggregate(user_id, granularity, starts):
+    """Agregados de los períodos indicados, calculados desde los workouts"""
+    # Un rango de fechas por cada tramo de períodos consecutivos
+    ranges = []
+    for start in starts:
+        end = next_start(start, granularity)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    def in_ranges(field):
+        return reduce(
+            or_,
+            (Q(**{f'{field}__gte': start, f'{field}__lt': end}) for start, end in ranges),
+        )
+
+    result = {start: [Decimal('0'), 0, 0, 0] for start in starts}
+    sets = (
+        WorkoutSet.objects.filter(workout_exercise__workout__user_id=user_id)
+        .filter(in_ranges('workout_exercise__workout__date'))
+        .values_list('workout_exercise__workout__date')
+        .annotate(volume=Sum(VOLUME_EXPRESSION), count=Count('id'))
+        .order_by()
+    )
+    for day, volume, count in sets:
+        bucket = result[bucket_start(day, granularity)]
+        bucket[0] += Decimal(str(volume or 0))
+        bucket[1] += count
+
+    workouts = (
+        Workout.objects.filter(user_id=user_id)
+        .filter(in_ranges('date'))
+        .values_list('date')
+        .annotate(count=Count('id'), duration=Sum('duration_min'))
+        .order_by()
+    )
+    for day, count, duration in workouts:
+        bucket = result[bucket_start(day, granularity)]
+        bucket[2] += count
+        bucket[3] += duration or 0
+
+    archived = (
+        ArchivedWorkout.objects.filter(user_id=user_id)
+        .filter(in_ranges('date'))
+        .values_list('date')
+        .annotate(
+            volume=Sum('volume'), sets=Sum('set_count'), count=Count('id'),
+            duration=Sum('duration_min'),
+        )
+        .order_by()
+    )
+    for day, volume, sets, count, duration in archived:
+        bucket = result[bucket_start(day, granularity)]
+        bucket[0] += volume
+        bucket[1] += sets
+        bucket[2] += count
+        bucket[3] += duration
+
+    return {start: tuple(values) for start, values in result.items()}
@@ -0,0 +1,172 @@
+"""
+Foto en memoria, de solo lectura, del catálogo de ejercicios.
+
+El catálogo cambia muy poco y se lee en casi todas las operaciones (nombres
+de ejercicios en los workouts, validación de payloads, estadísticas). Cada
+proceso carga una vez todas las filas de Exercise en registros compactos con
+__slots__ e índices id → posición y nombre → posición, y la reutiliza.
+
+Consistencia: CatalogVersion guarda un número de versión que se incrementa al
+guardar o borrar un Exercise. La versión se compara una vez por request (una
+consulta por clave primaria) y la foto se recarga solo si cambió. Dentro del
+mismo proceso las señales invalidan la foto inmediatamente.
+
+Las escrituras masivas (bulk_create, update) no emiten señales y deben llamar
+a bump_catalog_version.
+"""
+
+import threading
+
+from django.core.signals import request_started
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CatalogVersion, Exercise
+
+MUSCLES = tuple(value for value, _ in Exercise.PRIMARY_MUSCLE_CHOICES)
+
+FIELDS = (
+    'id', 'name', 'primary_muscle', 'secondary_muscles', 'equipment',
+    'difficulty', 'is_bodyweight', 'video_url',
+)
+
+
+class ExerciseRecord:
+    """Fila de Exercise inmutable y compacta"""
+    __slots__ = FIELDS + ('_data',)
+
+    def __init__(self, *values):
+        for name, value in zip(FIELDS, values):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_data', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ExerciseRecord es de solo lectura')
+
+    def as_model(self):
+        """Instancia de Exercise equivalente, sin consultar la base de datos"""
+        exercise = Exercise(**{name: getattr(self, name) for name in FIELDS})
+        exercise._state.adding = False
+        exercise._state.db = 'default'
+        return exercise
+
+    def serialized(self):
+        """Representación de ExerciseSerializer, calculada una sola vez"""
+        if self._data is None:
+            from .serializers import ExerciseSerializer
+
+            object.__setattr__(self, '_data', ExerciseSerializer(self.as_model()).data)
+        return self._data
+
+
+class CatalogSnapshot:
+    """Registros del catálogo con índices por id y por nombre"""
+    __slots__ = ('version', 'records', 'index', 'name_index', '_matrices')
+
+    def __init__(self, version, records):
+        self.version = version
+        self.records = tuple(records)
+        self.index = {record.id: i for i, record in enumerate(self.records)}
+        self.name_index = {record.name: i for i, record in enumerate(self.records)}
+        self._matrices = {}
+
+    def get(self, pk):
+        i = self.index.get(pk)
+        return None if i is None else self.records[i]
+
+    def get_by_name(self, name):
+        i = self.name_index.get(name)
+        return None if i is None else self.records[i]
+
+    def name_of(self, pk):
+        record = self.get(pk)
+        return None if record is None else record.name
+
+    def muscle_matrix(self, secondary_weight):
+        """
+        Matriz ejercicio × músculo (columnas en el orden de MUSCLES).
+
+        Cada fila reparte el volumen del ejercicio: 1.0 al músculo primario y
+        `secondary_weight` a cada secundario. Se calcula una vez por foto y
+        peso, así las estadísticas no decodifican secondary_muscles por set.
+        """
+        matrix = self._matrices.get(secondary_weight)
+        if matrix is None:
+            columns = {muscle: i for i, muscle in enumerate(MUSCLES)}
+            matrix = {}
+            for record in self.records:
+                row = [0.0] * len(MUSCLES)
+                for muscle in record.secondary_muscles or ():
+                    if muscle in columns:
+                        row[columns[muscle]] = secondary_weight
+                if record.primary_muscle in columns:
+                    row[columns[record.primary_muscle]] = 1.0
+                matrix[record.id] = tuple(row)
+            self._matrices[secondary_weight] = matrix
+        return matrix
+
+    def __len__(self):
+        return len(self.records)
+
+
+_snapshot = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def current_version():
+    return (
+        CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+        or 0
+    )
+
+
+def get_catalog():
+    """
+    Foto vigente del catálogo.
+
+    La primera llamada de cada request verifica la versión en la base de datos;
+    las siguientes usan la foto sin consultas.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and getattr(_local, 'checked', False):
+        return snapshot
+
+    version = current_version()
+    _local.checked = True
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            rows = Exercise.objects.order_by('id').values_list(*FIELDS)
+            snapshot = CatalogSnapshot(version, (ExerciseRecord(*row) for row in rows))
+            _snapshot = snapshot
+    return snapshot
+
+
+def invalidate_catalog():
+    """Descartar la foto local; la próxima lectura la recarga"""
+    global _snapshot
+    _snapshot = None
+
+
+def bump_catalog_version():
+    """Registrar un cambio en el catálogo (también para escrituras masivas)"""
+    updated = CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    if not updated:
+        _, created = CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+        if not created:
+            # Otra transacción creó la fila entre ambas consultas
+            CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    invalidate_catalog()
+
+
+@receiver(request_started)
+def _reset_version_check(**kwargs):
+    _local.checked = False
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def _exercise_changed(**kwargs):
+    bump_catalog_version()
@@ -0,0 +1,167 @@
+"""
+Carga masiva del catálogo de ejercicios desde CSV o JSON (comando
+`load_exercises`).
+
+Cada fila se valida con las reglas de ExerciseSerializer (músculos
+secundarios, dominios de video, bodyweight según el equipo) y se hace upsert
+por nombre: si ya existe un Exercise con ese nombre se actualizan los campos
+presentes en la fila (una columna ausente o una celda vacía conservan el
+valor guardado), si no se crea con los valores por defecto para lo que
+falte. Las filas repetidas en el archivo se quedan con la última.
+
+Las escrituras van en lotes de `chunk_size`, cada uno en su propia
+transacción corta (bulk_create y bulk_update), así los lectores no quedan
+bloqueados durante toda la carga. Las filas que no cambiaron no se escriben.
+Como las operaciones masivas no emiten señales, al final se llama una sola
+vez a bump_catalog_version (ver fitness/catalog.py), también si un lote
+falla después de confirmar otros.
+"""
+
+import csv
+import json
+import re
+from pathlib import Path
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .catalog import bump_catalog_version
+from .models import Exercise
+from .serializers import ExerciseSerializer
+
+FIELDS = (
+    'primary_muscle', 'secondary_muscles', 'equipment', 'difficulty',
+    'is_bodyweight', 'video_url',
+)
+DEFAULTS = {'secondary_muscles': [], 'is_bodyweight': False, 'video_url': None}
+CHUNK_SIZE = 500
+
+# Separadores de músculos secundarios dentro de una celda CSV
+MUSCLE_SEPARATOR = re.compile(r'[;|]')
+
+
+class LoadResult:
+    """Cantidades de la carga y filas rechazadas (número de fila, errores)"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = []
+
+
+def read_csv(path):
+    """(número de línea, fila) de un CSV con encabezado"""
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.DictReader(handle)
+        for row in reader:
+            # Las celdas vacías cuentan como columnas ausentes
+            row = {key: value.strip() for key, value in row.items() if key and value and value.strip()}
+            if 'secondary_muscles' in row:
+                row['secondary_muscles'] = [
+                    muscle.strip()
+                    for muscle in MUSCLE_SEPARATOR.split(row['secondary_muscles'])
+                    if muscle.strip()
+                ]
+            yield reader.line_num, row
+
+
+def read_json(path):
+    """
+    (posición, fila) de una lista JSON de objetos. También acepta el formato
+    de fixtures de Django (objetos con "fields").
+    """
+    with open(path, encoding='utf-8') as handle:
+        items = json.load(handle)
+    if not isinstance(items, list):
+        raise ValueError('JSON catalog must be a list of objects')
+    for position, item in enumerate(items, start=1):
+        if isinstance(item, dict) and isinstance(item.get('fields'), dict):
+            item = item['fields']
+        yield position, item
+
+
+def read_rows(path, format=None):
+    """Filas del archivo; el formato sale de la extensión si no se indica"""
+    format = format or Path(path).suffix.lstrip('.').lower()
+    if format == 'csv':
+        return read_csv(path)
+    if format == 'json':
+        return read_json(path)
+    raise ValueError(f'Unsupported catalog format: {format}')
+
+
+def validate_rows(rows, result):
+    """
+    {nombre: campos presentes} de las filas válidas; las inválidas van a
+    result.rejected
+    """
+    # Un solo serializer para todas las filas: los campos se construyen una vez
+    serializer = ExerciseSerializer()
+    valid = {}
+    for number, row in rows:
+        if not isinstance(row, dict):
+            result.rejected.append((number, {'non_field_errors': ['Expected an object']}))
+            continue
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as exc:
+            result.rejected.append((number, exc.detail))
+            continue
+        valid[data['name']] = {field: data[field] for field in FIELDS if field in data}
+    return valid
+
+
+def upsert_chunk(chunk, result, dry_run=False):
+    """
+    Crear o actualizar por nombre los ejercicios de un lote. Devuelve True si
+    escribió algo.
+    """
+    with transaction.atomic():
+        existing = {}
+        for pk, name, *values in (
+            Exercise.objects.filter(name__in=list(chunk)).order_by('pk').values_list('pk', 'name', *FIELDS)
+        ):
+            existing.setdefault(name, []).append((pk, dict(zip(FIELDS, values))))
+
+        to_create = []
+        to_update = []
+        for name, values in chunk.items():
+            rows = existing.get(name)
+            if rows is None:
+                to_create.append(Exercise(name=name, **{**DEFAULTS, **values}))
+                continue
+            # Los nombres no son únicos en la tabla: se actualizan todas las filas
+            changed = [
+                Exercise(pk=pk, name=name, **{**current, **values})
+                for pk, current in rows
+                if any(current[field] != value for field, value in values.items())
+            ]
+            if changed:
+                to_update.extend(changed)
+                result.updated += 1
+            else:
+                result.unchanged += 1
+        result.created += len(to_create)
+
+        if dry_run or not (to_create or to_update):
+            return False
+        Exercise.objects.bulk_create(to_create)
+        Exercise.objects.bulk_update(to_update, FIELDS)
+        return True
+
+
+def load_exercises(rows, chunk_size=CHUNK_SIZE, dry_run=False):
+    """Validar y cargar las filas (número, dict); devuelve un LoadResult"""
+    result = LoadResult()
+    valid = list(validate_rows(rows, result).items())
+    written = False
+    try:
+        for start in range(0, len(valid), chunk_size):
+            if upsert_chunk(dict(valid[start:start + chunk_size]), result, dry_run=dry_run):
+                written = True
+    finally:
+        # Los lotes confirmados quedan aunque falle uno posterior
+        if written:
+            bump_catalog_version()
+    return result
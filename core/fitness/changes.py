@@ -0,0 +1,233 @@
+"""
+Registro de escrituras sobre los workouts de un usuario.
+
+Todas las rutas que crean, modifican o eliminan workouts (o sus ejercicios y
+sets) llaman a record_workout_change dentro de su transacción, con las filas
+afectadas. Así se mantienen consistentes con los datos que describen:
+
+- La versión por usuario (WorkoutVersion), usada por los GETs condicionales.
+- El registro de cambios (WorkoutChange), usado por la sincronización delta.
+- Los agregados por período guardados (StatsBucket), que se invalidan para
+  las fechas de los workouts escritos.
+- El resumen por ejercicio (ExerciseProgress) de los ejercicios afectados.
+- Los puntajes del usuario en los rankings (LeaderboardEntry) de las semanas
+  de esas fechas, a partir de WrittenWeeks.
+- El calendario de actividad (ActivityYear) de esos días.
+- El índice de búsqueda de notas de los workouts escritos o eliminados.
+
+Los totales de las semanas escritas se leen una sola vez por escritura
+(WrittenWeeks) y los hooks se actualizan desde ellos, en lugar de agregar
+cada uno los sets por su cuenta.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .activity import refresh_activity
+from .buckets import invalidate_buckets
+from .leaderboards import e1rm, refresh_leaderboards, week_start
+from .models import (
+    ArchivedWorkout, Workout, WorkoutChange, WorkoutExercise, WorkoutSet, WorkoutVersion,
+)
+from .progress import update_progress
+from .search import sync_notes
+
+
+def workout_tree(workout_ids, include_workouts=True):
+    """
+    Pares (tipo, id) de los workouts indicados y de todos sus ejercicios y sets.
+
+    Se usa para registrar tombstones antes de borrar un árbol (o solo sus
+    hijos, con include_workouts=False).
+    """
+    workout_ids = list(workout_ids)
+    exercise_ids = WorkoutExercise.objects.filter(
+        workout_id__in=workout_ids
+    ).values_list('id', flat=True)
+    set_ids = WorkoutSet.objects.filter(
+        workout_exercise__workout_id__in=workout_ids
+    ).values_list('id', flat=True)
+
+    tree = [(WorkoutChange.WORKOUT, pk) for pk in workout_ids] if include_workouts else []
+    tree += [(WorkoutChange.WORKOUT_EXERCISE, pk) for pk in exercise_ids]
+    tree += [(WorkoutChange.WORKOUT_SET, pk) for pk in set_ids]
+    return tree
+
+
+class WrittenWeeks:
+    """
+    Totales del usuario en las semanas (de lunes a domingo) que contienen las
+    fechas escritas: una consulta al shard (workouts con sus ejercicios y
+    sets) y otra al archivo.
+    
+    - days: {fecha: [workouts, volumen]}, incluidos los archivados.
+    - best: {(fecha, id de ejercicio): mejor 1RM estimado}, incluidos los
+      archivados.
+    - sessions: {id de ejercicio: última sesión dentro de las semanas}, con
+      date, workout_id, target_sets, target_reps y sets [(reps, peso, rpe)].
+    """
+    
+    def __init__(self, user_id, dates):
+        self.dates = set(dates)
+        self.weeks = {week_start(day) for day in self.dates}
+        self.days = {}
+        self.best = {}
+        self.sessions = {}
+        if not self.weeks:
+            return
+        in_weeks = reduce(
+            or_,
+            (Q(date__gte=week, date__lt=week + timedelta(days=7)) for week in self.weeks),
+        )
+        
+        # Una fila por set (o por workout o ejercicio sin sets)
+        counted = set()
+        for workout_id, day, exercise_id, target_sets, target_reps, reps, weight, rpe in (
+            Workout.objects.filter(in_weeks, user_id=user_id).values_list(
+                'id', 'date', 'workout_exercises__exercise_id',
+                'workout_exercises__target_sets', 'workout_exercises__target_reps',
+                'workout_exercises__sets__reps_completed', 'workout_exercises__sets__weight_kg',
+                'workout_exercises__sets__rpe',
+            )
+        ):
+            totals = self.days.setdefault(day, [0, Decimal('0')])
+            if workout_id not in counted:
+                counted.add(workout_id)
+                totals[0] += 1
+            if reps is None:
+                continue
+            if weight is not None:
+                totals[1] += reps * weight
+                self._add_best(day, exercise_id, e1rm(reps, weight))
+            # Si hubo varios workouts el mismo día, vale el último
+            session = self.sessions.get(exercise_id)
+            if session is None or (day, workout_id) > (session['date'], session['workout_id']):
+                session = self.sessions[exercise_id] = {
+                    'date': day,
+                    'workout_id': workout_id,
+                    'target_sets': target_sets,
+                    'target_reps': target_reps,
+                    'sets': [],
+                }
+            if session['workout_id'] == workout_id:
+                session['sets'].append((reps, weight, rpe))
+        
+        for day, volume, best in (
+            ArchivedWorkout.objects.filter(in_weeks, user_id=user_id)
+            .values_list('date', 'volume', 'e1rm')
+        ):
+            totals = self.days.setdefault(day, [0, Decimal('0')])
+            totals[0] += 1
+            totals[1] += volume
+            for exercise_id, value in best.items():
+                self._add_best(day, int(exercise_id), value)
+    
+    def contains(self, day):
+        return week_start(day) in self.weeks
+    
+    def _add_best(self, day, exercise_id, value):
+        key = (day, exercise_id)
+        if value > self.best.get(key, 0):
+            self.best[key] = value
+
+
+def record_workout_change(user_id, upserted=(), deleted=(), dates=(), exercise_ids=()):
+    """
+    Registrar una escritura sobre los workouts del usuario.
+
+    `upserted` y `deleted` son iterables de pares (tipo, id), con el tipo
+    tomado de WorkoutChange (WORKOUT, WORKOUT_EXERCISE o WORKOUT_SET).
+    `dates` son las fechas de los workouts afectados, antes y después de la
+    escritura si la fecha cambió, y `exercise_ids` los ejercicios que tenían
+    o tienen ahora.
+    """
+    upserted, deleted = list(upserted), list(deleted)
+    entries = [
+        WorkoutChange(
+            user_id=user_id, kind=kind, object_id=pk, operation=WorkoutChange.UPSERT
+        )
+        for kind, pk in upserted
+    ]
+    entries += [
+        WorkoutChange(
+            user_id=user_id, kind=kind, object_id=pk, operation=WorkoutChange.DELETE
+        )
+        for kind, pk in deleted
+    ]
+    if entries:
+        WorkoutChange.objects.bulk_create(entries)
+    written = WrittenWeeks(user_id, dates)
+    invalidate_buckets(user_id, dates)
+    update_progress(user_id, exercise_ids, written)
+    refresh_leaderboards(user_id, written)
+    refresh_activity(user_id, written)
+    sync_notes(
+        upserted=[pk for kind, pk in upserted if kind == WorkoutChange.WORKOUT],
+        deleted=[pk for kind, pk in deleted if kind == WorkoutChange.WORKOUT],
+    )
+    _bump_version(user_id)
+
+
+def record_archive_change(user_id, archived=(), restored=()):
+    """
+    Registrar workouts movidos entre las tablas y el archivo (ver
+    fitness/archive.py).
+    
+    `archived` son ids de workouts archivados y `restored` pares (tipo, id)
+    de los árboles restaurados. Los totales por fecha no cambian (el archivo
+    conserva el resumen de cada workout), así que no se recalculan agregados:
+    solo la versión, el índice de notas y el registro de cambios. Los
+    archivados no generan tombstones sino una operación archive del workout:
+    los clientes pueden conservar su copia.
+    """
+    archived = list(archived)
+    restored = list(restored)
+    if archived or restored:
+        WorkoutChange.objects.bulk_create([
+            *(
+                WorkoutChange(
+                    user_id=user_id, kind=WorkoutChange.WORKOUT, object_id=pk,
+                    operation=WorkoutChange.ARCHIVE,
+                )
+                for pk in archived
+            ),
+            *(
+                WorkoutChange(
+                    user_id=user_id, kind=kind, object_id=pk, operation=WorkoutChange.UPSERT
+                )
+                for kind, pk in restored
+            ),
+        ])
+    sync_notes(
+        upserted=[pk for kind, pk in restored if kind == WorkoutChange.WORKOUT],
+        deleted=archived,
+    )
+    _bump_version(user_id)
+
+
+def _bump_version(user_id):
+    updated = WorkoutVersion.objects.filter(user_id=user_id).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        _, created = WorkoutVersion.objects.get_or_create(
+            user_id=user_id, defaults={'version': 1}
+        )
+        if not created:
+            # Otra transacción creó la fila entre ambas consultas
+            _bump_version(user_id)
+
+
+def get_workout_version(user_id):
+    """(versión, fecha de última escritura) de los workouts del usuario"""
+    row = (
+        WorkoutVersion.objects.filter(user_id=user_id)
+        .values_list('version', 'updated_at')
+        .first()
+    )
+    return row or (0, None)
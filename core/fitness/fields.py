@@ -0,0 +1,33 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models
+
+
+class FixedPointField(models.DecimalField):
+    """
+    DecimalField guardado como entero escalado por 10 ** decimal_places.
+
+    En Python y en la API se comporta como un DecimalField (mismos
+    validadores y serialización), pero la columna es entera: los pesos se
+    guardan en gramas/10 (centésimas de kg) y el RPE en décimas. Las
+    agregaciones en la base de datos operan con enteros y no hace falta
+    convertir cada fila a Decimal dentro de SQLite.
+
+    Las expresiones que combinan campos escalados (p. ej. reps × peso) deben
+    declarar como output_field un FixedPointField con la escala resultante.
+    """
+
+    def get_internal_type(self):
+        return 'IntegerField' if self.max_digits <= 9 else 'BigIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return Decimal(int(value)).scaleb(-self.decimal_places)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None or hasattr(value, 'as_sql'):
+            return value
+        return int(value.scaleb(self.decimal_places).to_integral_value(ROUND_HALF_UP))
@@ -0,0 +1,95 @@
+"""
+Historial reciente de un ejercicio ("la última vez que hiciste esto").
+
+Una sesión es una aparición del ejercicio en un workout (un WorkoutExercise)
+con sus sets. Las sesiones de cada ejercicio se ordenan de la más reciente a
+la más antigua por (fecha del workout, id del WorkoutExercise); ese par
+también es el cursor de la paginación por clave.
+
+session_history resuelve uno o varios ejercicios con una sola consulta: un
+DENSE_RANK por ejercicio numera las sesiones sobre las filas de WorkoutSet y
+se filtran las primeras N de cada uno. Los ejercicios con menos de N
+sesiones en las tablas siguen en los workouts archivados
+(archived_sessions en fitness/archive.py).
+"""
+
+from datetime import datetime
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import DenseRank
+
+from .archive import archived_sessions
+from .models import WorkoutSet
+
+
+def format_cursor(session):
+    return f"{session['date'].isoformat()}:{session['workout_exercise_id']}"
+
+
+def _session_key(session):
+    return session['date'], session['workout_exercise_id']
+
+
+def parse_cursor(value):
+    """(fecha, id de WorkoutExercise) de un cursor; ValueError si es inválido"""
+    day, _, pk = value.partition(':')
+    return datetime.strptime(day, '%Y-%m-%d').date(), int(pk)
+
+
+def session_history(user_id, exercise_ids, sessions, before=None):
+    """
+    {ejercicio: [sesión, ...]} con hasta `sessions` sesiones por ejercicio,
+    de la más reciente a la más antigua. Con `before` (un cursor parseado)
+    solo se incluyen las sesiones anteriores a él.
+    """
+    sets = WorkoutSet.objects.filter(
+        workout_exercise__workout__user_id=user_id,
+        workout_exercise__exercise_id__in=exercise_ids,
+    )
+    if before is not None:
+        day, workout_exercise_id = before
+        sets = sets.filter(
+            Q(workout_exercise__workout__date__lt=day)
+            | Q(workout_exercise__workout__date=day, workout_exercise_id__lt=workout_exercise_id)
+        )
+    rows = (
+        sets.annotate(
+            session=Window(
+                DenseRank(),
+                partition_by=F('workout_exercise__exercise_id'),
+                order_by=[
+                    F('workout_exercise__workout__date').desc(),
+                    F('workout_exercise_id').desc(),
+                ],
+            )
+        )
+        .filter(session__lte=sessions)
+        .order_by(
+            'workout_exercise__exercise_id', '-workout_exercise__workout__date',
+            '-workout_exercise_id', 'set_number',
+        )
+        .values_list(
+            'workout_exercise__exercise_id', 'workout_exercise__workout__date',
+            'workout_exercise__workout_id', 'workout_exercise_id',
+            'set_number', 'reps_completed', 'weight_kg', 'rpe',
+        )
+    )
+
+    history = {exercise_id: [] for exercise_id in exercise_ids}
+    for exercise_id, day, workout_id, workout_exercise_id, *values in rows:
+        items = history[exercise_id]
+        if not items or items[-1]['workout_exercise_id'] != workout_exercise_id:
+            items.append({
+                'date': day,
+                'workout_id': workout_id,
+                'workout_exercise_id': workout_exercise_id,
+                'sets': [],
+            })
+        items[-1]['sets'].append(values)
+
+    short = [exercise_id for exercise_id, items in history.items() if len(items) < sessions]
+    if short:
+        for exercise_id, items in archived_sessions(user_id, short, sessions, before).items():
+            merged = sorted(history[exercise_id] + items, key=_session_key, reverse=True)
+            history[exercise_id] = merged[:sessions]
+    return history
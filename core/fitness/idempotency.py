@@ -0,0 +1,112 @@
+"""
+Escrituras idempotentes con el header Idempotency-Key.
+
+Un cliente con mala conexión puede reintentar un POST o PATCH de workouts
+sin saber si el primero llegó. Si envía el mismo Idempotency-Key en cada
+intento, la escritura se ejecuta una sola vez: la primera respuesta exitosa
+se guarda por (usuario, clave) y los reintentos dentro del TTL
+(FITNESS_IDEMPOTENCY_TTL) la reciben tal cual, con el header
+Idempotent-Replayed, sin pasar por el serializer ni tocar los workouts.
+
+- La clave se guarda en la misma transacción que la escritura. Si dos
+  intentos llegan a la vez, el segundo falla al insertar la clave, se
+  revierte su escritura y recibe la respuesta del primero.
+- Las respuestas con error no se guardan: el reintento se ejecuta de nuevo.
+- Reusar una clave con otro método, ruta o cuerpo responde 422.
+
+Las claves vencidas se ignoran y se reemplazan; el comando
+`prune_idempotency_keys` las elimina en lote.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+from .sharding import shard_atomic
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.FITNESS_IDEMPOTENCY_TTL)
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def idempotent(request, handler):
+    """
+    Ejecutar `handler` (que devuelve un Response) una sola vez por
+    Idempotency-Key; sin el header se ejecuta siempre.
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError(
+            {HEADER: f'Must be between 1 and {MAX_KEY_LENGTH} characters.'}
+        )
+
+    request_fingerprint = fingerprint(request)
+    stored = _lookup(request.user, key)
+    if stored is not None:
+        return _replay(stored, request_fingerprint)
+
+    try:
+        with shard_atomic():
+            response = handler()
+            if status.is_success(response.status_code):
+                IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    fingerprint=request_fingerprint,
+                    status_code=response.status_code,
+                    response_body=json.dumps(response.data, cls=JSONEncoder),
+                )
+    except IntegrityError:
+        # Otro intento con la misma clave terminó antes
+        stored = _lookup(request.user, key)
+        if stored is None:
+            raise
+        return _replay(stored, request_fingerprint)
+    return response
+
+
+def _lookup(user, key):
+    stored = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if stored is not None and stored.created_at < expiry_cutoff():
+        stored.delete()
+        return None
+    return stored
+
+
+def _replay(stored, request_fingerprint):
+    if stored.fingerprint != request_fingerprint:
+        raise IdempotencyKeyReused()
+    return Response(
+        json.loads(stored.response_body),
+        status=stored.status_code,
+        headers={REPLAYED_HEADER: 'true'},
+    )
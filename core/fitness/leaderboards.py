@@ -0,0 +1,178 @@
+"""
+Rankings semanales entre usuarios.
+
+Hay tres tipos de ranking por semana (de lunes a domingo): volumen total,
+cantidad de workouts y mejor 1RM estimado (Epley) de cada ejercicio. Cada
+usuario tiene a lo sumo una fila LeaderboardEntry por ranking y semana.
+
+Las filas se recalculan:
+
+- Al escribir workouts: record_workout_change llama a refresh_leaderboards
+  con los totales del usuario en las semanas afectadas (WrittenWeeks, ver
+  fitness/changes.py), leídos una vez para todos los hooks.
+- En lote, con el comando `rebuild_leaderboards` (carga inicial o
+  reparación).
+
+Los workouts archivados cuentan a partir de su resumen (ver
+fitness/archive.py).
+
+Leer un ranking no agrega sets: el top-N y la posición de un usuario se
+resuelven con el índice (board, period_start, -score, user).
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial, reduce
+from operator import or_
+
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Q, Sum, Value
+
+from .buckets import VOLUME_EXPRESSION
+from .models import ArchivedWorkout, LeaderboardEntry, Workout, WorkoutSet
+from .routers import current_shard, get_shards
+
+# weight_kg se guarda en centésimas de kg (ver fitness/fields.py)
+E1RM_EXPRESSION = ExpressionWrapper(
+    F('weight_kg') * (F('reps_completed') + 30) / Value(3000.0),
+    output_field=FloatField(),
+)
+
+
+def e1rm(reps, weight):
+    """1RM estimado de un set, con la misma aritmética que E1RM_EXPRESSION"""
+    return int(weight.scaleb(2)) * (reps + 30) / 3000.0
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def e1rm_board(exercise_id):
+    return f'{LeaderboardEntry.E1RM}:{exercise_id}'
+
+
+def refresh_leaderboards(user_id, written):
+    """Reemplazar las filas del usuario en las semanas escritas, desde sus totales"""
+    if not written.weeks:
+        return
+    scores = {}
+    for day, (count, volume) in written.days.items():
+        _add(scores, LeaderboardEntry.WORKOUTS, day, user_id, Decimal(count), Decimal.__add__)
+        _add(scores, LeaderboardEntry.VOLUME, day, user_id, volume, Decimal.__add__)
+    for (day, exercise_id), best in written.best.items():
+        _add(scores, e1rm_board(exercise_id), day, user_id, Decimal(str(round(best, 2))), max)
+    _replace(
+        LeaderboardEntry.objects.filter(period_start__in=written.weeks, user_id=user_id), scores
+    )
+
+
+def _add(scores, board, day, user, value, combine):
+    key = (board, week_start(day), user)
+    scores[key] = combine(scores[key], value) if key in scores else value
+
+
+def _replace(existing, scores):
+    """Reemplazar las filas `existing` por los puntajes {(ranking, semana, usuario): puntaje}"""
+    existing.delete()
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(board=board, period_start=week, user_id=user, score=score)
+            for (board, week, user), score in scores.items()
+            if score > 0
+        ],
+        batch_size=500,
+    )
+
+
+def rebuild_weeks(weeks, user_id=None):
+    """
+    Recalcular las filas de las semanas indicadas (que empiezan en lunes) para
+    un usuario (en el shard actual) o, con user_id=None, para todos (en todos
+    los shards).
+    """
+    weeks = sorted(weeks)
+    in_weeks = reduce(
+        or_,
+        (Q(date__gte=week, date__lt=week + timedelta(days=7)) for week in weeks),
+    )
+    existing = LeaderboardEntry.objects.filter(period_start__in=weeks)
+    if user_id is not None:
+        existing = existing.filter(user_id=user_id)
+
+    scores = {}
+    add = partial(_add, scores)
+
+    for alias in get_shards() if user_id is None else [current_shard()]:
+        workouts = Workout.objects.using(alias).filter(in_weeks)
+        sets = WorkoutSet.objects.using(alias).filter(
+            workout_exercise__workout__in=workouts, weight_kg__isnull=False
+        )
+        if user_id is not None:
+            workouts = workouts.filter(user_id=user_id)
+            sets = sets.filter(workout_exercise__workout__user_id=user_id)
+
+        for user, day, count in (
+            workouts.values_list('user_id', 'date').annotate(count=Count('id')).order_by()
+        ):
+            add(LeaderboardEntry.WORKOUTS, day, user, Decimal(count), Decimal.__add__)
+
+        for user, day, volume in (
+            sets.values_list('workout_exercise__workout__user_id', 'workout_exercise__workout__date')
+            .annotate(volume=Sum(VOLUME_EXPRESSION))
+            .order_by()
+        ):
+            add(LeaderboardEntry.VOLUME, day, user, Decimal(str(volume)), Decimal.__add__)
+
+        for user, exercise_id, day, best in (
+            sets.values_list(
+                'workout_exercise__workout__user_id', 'workout_exercise__exercise_id',
+                'workout_exercise__workout__date',
+            )
+            .annotate(best=Max(E1RM_EXPRESSION))
+            .order_by()
+        ):
+            add(e1rm_board(exercise_id), day, user, Decimal(str(round(best, 2))), max)
+
+    # Workouts archivados: sus resúmenes (en la base por defecto)
+    archived = ArchivedWorkout.objects.filter(in_weeks)
+    if user_id is not None:
+        archived = archived.filter(user_id=user_id)
+    for user, day, volume, best_by_exercise in archived.values_list('user_id', 'date', 'volume', 'e1rm'):
+        add(LeaderboardEntry.WORKOUTS, day, user, Decimal(1), Decimal.__add__)
+        add(LeaderboardEntry.VOLUME, day, user, volume, Decimal.__add__)
+        for exercise_id, best in best_by_exercise.items():
+            add(e1rm_board(exercise_id), day, user, Decimal(str(best)), max)
+
+    _replace(existing, scores)
+
+
+def top_entries(board, week, offset, limit):
+    """Filas del ranking ordenadas por puntaje, con el usuario (una consulta)"""
+    return list(
+        LeaderboardEntry.objects.filter(board=board, period_start=week)
+        .select_related('user')
+        .order_by('-score', 'user_id')[offset:offset + limit]
+    )
+
+
+def get_position(board, week, user_id):
+    """
+    (posición, puntaje) del usuario, o None si no figura en el ranking.
+    
+    La posición es 1 + la cantidad de filas con mayor puntaje: un COUNT que
+    recorre solo el índice de cubrimiento (board, period_start, -score, user),
+    O(posición) entradas del ranking de una semana, sin leer la tabla. Guardar
+    la posición no sirve: cada escritura que cambia un puntaje movería la de
+    todos los usuarios entre el puntaje viejo y el nuevo.
+    """
+    score = (
+        LeaderboardEntry.objects.filter(board=board, period_start=week, user_id=user_id)
+        .values_list('score', flat=True)
+        .first()
+    )
+    if score is None:
+        return None
+    ahead = LeaderboardEntry.objects.filter(
+        board=board, period_start=week, score__gt=score
+    ).count()
+    return ahead + 1, score
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fitness.archive import archive_user
+from fitness.models import Workout
+from fitness.routers import get_shards, use_shard
+from fitness.sharding import shard_for_user
+
+
+class Command(BaseCommand):
+    """
+    Archiva los workouts antiguos en segmentos comprimidos por usuario y año
+    (ver fitness/archive.py).
+
+    Cada año de cada usuario se archiva en su propia transacción, así que el
+    comando puede interrumpirse y volver a correr.
+    """
+
+    help = "Archiva los workouts con más de N días en segmentos comprimidos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.FITNESS_ARCHIVE_AFTER_DAYS,
+            help="Antigüedad mínima en días (por defecto FITNESS_ARCHIVE_AFTER_DAYS)",
+        )
+        parser.add_argument("--user", type=int, help="Archivar solo este usuario (id)")
+
+    def handle(self, *args, **options):
+        if options["days"] <= 0:
+            raise CommandError("--days debe ser mayor que 0")
+        before = timezone.now().date() - timedelta(days=options["days"])
+        total = 0
+        for alias in get_shards():
+            users = Workout.objects.using(alias).filter(date__lt=before)
+            if options["user"] is not None:
+                users = users.filter(user_id=options["user"])
+            for user_id in users.values_list("user_id", flat=True).distinct().order_by("user_id"):
+                if shard_for_user(user_id) != alias:
+                    continue  # restos de un movimiento interrumpido
+                with use_shard(alias):
+                    archived = archive_user(user_id, before)
+                total += archived
+                self.stdout.write(f"Usuario {user_id}: {archived} workouts archivados")
+        self.stdout.write(f"{total} workouts archivados (anteriores a {before})")
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from fitness import benchmark
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Ejecuta la suite de benchmarks de la API sobre la base de datos actual.
+
+    Usar junto a `seed_fitness_data` para generar un dataset realista. Con
+    --save-baseline guarda el resultado como baseline; en cada corrida se
+    compara contra el baseline almacenado si existe.
+    """
+
+    help = "Mide latencia p50/p95, consultas por request y throughput de la API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--user",
+            help="Email del usuario a usar (por defecto el de más workouts)",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Limitar a uno o más escenarios por nombre",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(benchmark.DEFAULT_BASELINE_PATH),
+            help="Ruta del baseline JSON",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Guardar el resultado como nuevo baseline",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] <= 0:
+            raise CommandError("--iterations debe ser mayor que 0")
+        user = self._get_user(options["user"])
+
+        try:
+            results = benchmark.run_benchmarks(
+                user,
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                only=options["scenarios"],
+            )
+        except (ValueError, RuntimeError) as exc:
+            raise CommandError(str(exc))
+
+        baseline = benchmark.load_baseline(options["baseline"])
+        changes = benchmark.compare(results, baseline)
+
+        header = (
+            f"{'escenario':<18}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}"
+            f"{'req/s':>10}{'Δp50 %':>9}{'Δp95 %':>9}{'Δq':>7}"
+        )
+        self.stdout.write(header)
+        for name, metrics in results.items():
+            change = changes.get(name, {})
+            self.stdout.write(
+                f"{name:<18}{metrics['p50_ms']:>10.2f}{metrics['p95_ms']:>10.2f}"
+                f"{metrics['queries']:>9}{metrics['throughput_rps']:>10.1f}"
+                f"{_fmt(change.get('p50_change_pct')):>9}"
+                f"{_fmt(change.get('p95_change_pct')):>9}"
+                f"{_fmt(change.get('queries_delta')):>7}"
+            )
+
+        if options["save_baseline"]:
+            report = benchmark.build_report(results, user, options["iterations"])
+            benchmark.save_baseline(report, options["baseline"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline guardado en {options['baseline']}")
+            )
+
+    def _get_user(self, email):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario {email}")
+        user = (
+            User.objects.annotate(workout_count=Count("workout"))
+            .order_by("-workout_count")
+            .first()
+        )
+        if user is None or user.workout_count == 0:
+            raise CommandError("No hay workouts; ejecutar seed_fitness_data primero")
+        return user
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:+}"
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fitness.catalog_loader import CHUNK_SIZE, load_exercises, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Carga el catálogo de ejercicios desde un CSV o JSON, con upsert por
+    nombre (ver fitness/catalog_loader.py).
+
+    Columnas del CSV: name, primary_muscle, secondary_muscles (separados por
+    ";" o "|"), equipment, difficulty, is_bodyweight, video_url. Las columnas
+    opcionales ausentes o vacías no cambian los ejercicios existentes. Las
+    filas inválidas se informan y no detienen la carga.
+    """
+
+    help = "Carga ejercicios desde un CSV o JSON (crea o actualiza por nombre)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Archivo CSV o JSON")
+        parser.add_argument(
+            "--format", choices=["csv", "json"], help="Formato (por defecto según la extensión)"
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=CHUNK_SIZE, help="Filas por transacción"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Validar y contar sin escribir"
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size debe ser mayor que 0")
+        try:
+            rows = read_rows(options["path"], options["format"])
+            result = load_exercises(
+                rows, chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for number, errors in result.rejected:
+            self.stderr.write(f"Fila {number}: {'; '.join(_messages(errors))}")
+        suffix = " (sin escribir)" if options["dry_run"] else ""
+        self.stdout.write(
+            f"{result.created} creados, {result.updated} actualizados, "
+            f"{result.unchanged} sin cambios, {len(result.rejected)} rechazados{suffix}"
+        )
+
+
+def _messages(detail, field=None):
+    """Mensajes de un ValidationError.detail, como 'campo: mensaje'"""
+    if isinstance(detail, dict):
+        for key, value in detail.items():
+            name = key if field is None else f"{field}[{key}]"
+            yield from _messages(value, None if key == "non_field_errors" else name)
+    elif isinstance(detail, list):
+        for value in detail:
+            yield from _messages(value, field)
+    else:
+        yield str(detail) if field is None else f"{field}: {detail}"
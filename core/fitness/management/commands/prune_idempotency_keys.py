@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from fitness.idempotency import expiry_cutoff
+from fitness.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """
+    Elimina las respuestas guardadas por Idempotency-Key que ya vencieron.
+
+    Las claves vencidas no se repiten aunque sigan en la tabla; este comando
+    solo libera espacio y puede correr como tarea periódica.
+    """
+
+    help = "Elimina las claves de idempotencia vencidas"
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expiry_cutoff()).delete()
+        self.stdout.write(f"{deleted} claves eliminadas")
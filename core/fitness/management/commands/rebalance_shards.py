@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from fitness.models import Workout
+from fitness.routers import get_shards
+from fitness.sharding import move_user, recover_moves, shard_for_user, shards_for_users
+
+
+class Command(BaseCommand):
+    """
+    Mueve usuarios entre shards (ver fitness/sharding.py).
+
+    Con --user y --to mueve un usuario. Sin argumentos reparte los workouts:
+    mientras la diferencia entre el shard más cargado y el menos cargado sea
+    mayor que la mitad de la media, mueve del primero al segundo el usuario
+    más grande que no invierta la diferencia. Cada usuario se mueve en su
+    propia transacción; conviene correrlo con poca actividad. Antes de
+    planificar borra las copias que dejaron las mudanzas interrumpidas.
+    """
+
+    help = "Mueve usuarios entre shards para repartir los workouts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Id del usuario a mover")
+        parser.add_argument("--to", help="Shard de destino (con --user)")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Mostrar los movimientos sin hacerlos"
+        )
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if (options["user"] is None) != (options["to"] is None):
+            raise CommandError("--user y --to van juntos")
+        if not options["dry_run"]:
+            recovered = recover_moves()
+            if recovered:
+                self.stdout.write(f"{recovered} mudanzas interrumpidas recuperadas")
+        if options["to"] is not None:
+            if options["to"] not in shards:
+                raise CommandError(f"Shard desconocido: {options['to']}")
+            moves = [(options["user"], shard_for_user(options["user"]), options["to"], None)]
+        else:
+            if len(shards) == 1:
+                raise CommandError("FITNESS_SHARDS tiene un solo shard")
+            moves = self._plan(shards)
+
+        for user_id, source, target, count in moves:
+            if options["dry_run"]:
+                self.stdout.write(f"Usuario {user_id}: {source} → {target} ({count} workouts)")
+                continue
+            moved = move_user(user_id, target)
+            self.stdout.write(f"Usuario {user_id}: {source} → {target} ({moved} workouts)")
+        verb = "a mover" if options["dry_run"] else "movidos"
+        self.stdout.write(f"{len(moves)} usuarios {verb}")
+
+    def _plan(self, shards):
+        """Movimientos (usuario, origen, destino, workouts) para repartir la carga"""
+        counts = {
+            alias: dict(
+                Workout.objects.using(alias)
+                .values_list("user_id")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            for alias in shards
+        }
+        # Filas de un movimiento interrumpido: cuentan solo donde está el usuario
+        placed = shards_for_users({user_id for rows in counts.values() for user_id in rows})
+        users = {
+            alias: {user_id: counts[alias].get(user_id, 0) for user_id in placed.get(alias, [])}
+            for alias in shards
+        }
+        load = {alias: sum(rows.values()) for alias, rows in users.items()}
+        tolerance = sum(load.values()) / len(shards) / 2
+
+        moves = []
+        while True:
+            fullest = max(shards, key=load.get)
+            emptiest = min(shards, key=load.get)
+            gap = load[fullest] - load[emptiest]
+            if gap <= tolerance:
+                return moves
+            candidates = [
+                (count, user_id)
+                for user_id, count in users[fullest].items()
+                if 0 < count <= gap / 2
+            ]
+            if not candidates:
+                return moves
+            count, user_id = max(candidates)
+            del users[fullest][user_id]
+            users[emptiest][user_id] = count
+            load[fullest] -= count
+            load[emptiest] += count
+            moves.append((user_id, fullest, emptiest, count))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from fitness.leaderboards import rebuild_weeks, week_start
+
+
+class Command(BaseCommand):
+    """
+    Recalcula los rankings semanales de todos los usuarios.
+
+    Las escrituras de workouts mantienen los rankings al día; este comando
+    sirve para la carga inicial, después de importar datos en masa o como
+    tarea periódica de reparación.
+    """
+
+    help = "Recalcula los rankings semanales de las últimas N semanas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--weeks",
+            type=int,
+            default=1,
+            help="Cantidad de semanas a recalcular, contando la actual",
+        )
+
+    def handle(self, *args, **options):
+        if options["weeks"] <= 0:
+            raise CommandError("--weeks debe ser mayor que 0")
+        current = week_start(timezone.now().date())
+        for i in range(options["weeks"]):
+            week = current - timedelta(weeks=i)
+            with transaction.atomic():
+                rebuild_weeks([week])
+            self.stdout.write(f"Semana {week} recalculada")
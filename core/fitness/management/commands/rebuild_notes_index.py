@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fitness.routers import get_shards
+from fitness.search import get_notes_search
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye el índice de búsqueda de notas de los workouts.
+
+    Las escrituras de la API lo mantienen al día; este comando sirve después
+    de importar datos en masa o de editar workouts por fuera de la API (admin,
+    shell). Reconstruye el índice de cada shard.
+    """
+
+    help = "Reconstruye el índice de búsqueda de notas de los workouts"
+
+    def handle(self, *args, **options):
+        for alias in get_shards():
+            search = get_notes_search(alias)
+            with transaction.atomic(using=alias):
+                search.rebuild()
+            self.stdout.write(f"Índice de {alias} reconstruido ({type(search).__name__})")
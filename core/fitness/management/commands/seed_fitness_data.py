@@ -0,0 +1,176 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from fitness.models import Exercise, Workout, WorkoutExercise, WorkoutSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Genera datos sintéticos de entrenamiento para pruebas de rendimiento.
+
+    Crea usuarios con años de historial (workouts, ejercicios y sets) sobre el
+    catálogo de ejercicios existente usando inserciones masivas (bulk_create).
+    Los usuarios se procesan por lotes para mantener acotado el uso de memoria.
+    """
+
+    help = "Genera usuarios y workouts sintéticos usando inserciones masivas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--years", type=float, default=2.0)
+        parser.add_argument(
+            "--workouts-per-week",
+            type=float,
+            default=3.0,
+            help="Frecuencia media de entrenamiento por usuario",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Usuarios generados por transacción",
+        )
+        parser.add_argument("--password", default="benchmark-pass-123")
+        parser.add_argument("--email-prefix", default="bench")
+
+    def handle(self, *args, **options):
+        if options["users"] <= 0 or options["years"] <= 0:
+            raise CommandError("--users y --years deben ser mayores que 0")
+
+        # Cargar el catálogo base si está vacío
+        if not Exercise.objects.exists():
+            call_command("loaddata", "exercises", verbosity=0)
+        exercises = list(Exercise.objects.values_list("id", "is_bodyweight"))
+
+        rng = random.Random(options["seed"])
+        password = make_password(options["password"])
+        prefix = options["email_prefix"]
+        # Continuar la numeración si ya existen usuarios sintéticos
+        existing = User.objects.filter(username__startswith=prefix).count()
+
+        totals = {"users": 0, "workouts": 0, "exercises": 0, "sets": 0}
+        remaining = options["users"]
+        offset = existing
+        while remaining > 0:
+            size = min(options["batch_size"], remaining)
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    [
+                        User(
+                            username=f"{prefix}{offset + i}",
+                            email=f"{prefix}{offset + i}@example.com",
+                            password=password,
+                        )
+                        for i in range(size)
+                    ]
+                )
+                counts = self._seed_history(
+                    rng, users, exercises, options["years"],
+                    options["workouts_per_week"],
+                )
+            totals["users"] += size
+            for key, value in counts.items():
+                totals[key] += value
+            remaining -= size
+            offset += size
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"  {totals['users']} usuarios generados")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Creados {users} usuarios, {workouts} workouts, "
+                "{exercises} ejercicios y {sets} sets".format(**totals)
+            )
+        )
+
+    def _seed_history(self, rng, users, exercises, years, per_week):
+        """Generar el historial de un lote de usuarios con tres bulk_create"""
+        today = timezone.now().date()
+        days = int(years * 365)
+        # Probabilidad diaria de entrenar según la frecuencia semanal
+        probability = min(per_week / 7.0, 1.0)
+
+        workouts = []
+        for user in users:
+            day = today - timedelta(days=days)
+            while day <= today:
+                if rng.random() < probability:
+                    workouts.append(
+                        Workout(
+                            user=user,
+                            date=day,
+                            notes=rng.choice(_NOTES),
+                            duration_min=rng.randint(30, 120),
+                        )
+                    )
+                day += timedelta(days=1)
+        workouts = Workout.objects.bulk_create(workouts, batch_size=2000)
+
+        workout_exercises = []
+        for workout in workouts:
+            chosen = rng.sample(exercises, k=min(rng.randint(3, 6), len(exercises)))
+            for order, (exercise_id, _) in enumerate(chosen, start=1):
+                workout_exercises.append(
+                    WorkoutExercise(
+                        workout=workout,
+                        exercise_id=exercise_id,
+                        order=order,
+                        target_sets=rng.randint(3, 5),
+                        target_reps=rng.choice((5, 8, 10, 12)),
+                    )
+                )
+        workout_exercises = WorkoutExercise.objects.bulk_create(
+            workout_exercises, batch_size=2000
+        )
+
+        bodyweight = {exercise_id for exercise_id, is_bw in exercises if is_bw}
+        sets = []
+        for workout_exercise in workout_exercises:
+            is_bodyweight = workout_exercise.exercise_id in bodyweight
+            base_weight = rng.randint(10, 120)
+            for number in range(1, workout_exercise.target_sets + 1):
+                sets.append(
+                    WorkoutSet(
+                        workout_exercise=workout_exercise,
+                        set_number=number,
+                        reps_completed=max(
+                            1, workout_exercise.target_reps - rng.randint(0, 2)
+                        ),
+                        weight_kg=(
+                            None
+                            if is_bodyweight
+                            else Decimal(base_weight + 2.5 * rng.randint(0, 2))
+                        ),
+                        rpe=Decimal(rng.randint(12, 20)) / 2,
+                        rest_sec=rng.choice((60, 90, 120, 180)),
+                    )
+                )
+        WorkoutSet.objects.bulk_create(sets, batch_size=2000)
+
+        return {
+            "workouts": len(workouts),
+            "exercises": len(workout_exercises),
+            "sets": len(sets),
+        }
+
+
+_NOTES = (
+    "",
+    "Buena sesión",
+    "Poca energía hoy",
+    "Nuevo récord personal",
+    "Entrenamiento de pecho y tríceps",
+    "Día de pierna",
+    "Sesión ligera de recuperación",
+)
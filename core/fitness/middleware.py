@@ -0,0 +1,38 @@
+from django.middleware.gzip import GZipMiddleware
+
+from . import profiling
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """
+    Comprime con gzip las respuestas de la API (JSON y MessagePack).
+
+    Las páginas HTML (admin, API navegable) no se comprimen: contienen el
+    token CSRF y comprimirlas las expone a ataques tipo BREACH. Las
+    respuestas en streaming se comprimen por partes.
+    """
+
+    COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack')
+
+    def process_response(self, request, response):
+        if not response.get('Content-Type', '').startswith(self.COMPRESSIBLE_TYPES):
+            return response
+        return super().process_response(request, response)
+
+
+class ProfilingMiddleware:
+    """
+    Perfil a pedido de un request de un usuario staff (ver
+    fitness/profiling.py). Debe ir después de AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.is_requested(request):
+            return self.get_response(request)
+        user = profiling.staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return profiling.profile(request, self.get_response, user)
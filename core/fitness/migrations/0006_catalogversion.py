@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0005_workoutchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
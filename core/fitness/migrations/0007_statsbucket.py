@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0006_catalogversion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatsBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[
+                            ("day", "Day"),
+                            ("week", "Week"),
+                            ("month", "Month"),
+                            ("year", "Year"),
+                        ],
+                        max_length=5,
+                    ),
+                ),
+                ("start", models.DateField()),
+                ("volume", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("set_count", models.PositiveIntegerField()),
+                ("workout_count", models.PositiveIntegerField()),
+                ("duration_min", models.PositiveIntegerField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "granularity", "start"),
+                        name="statsbucket_unique",
+                    )
+                ],
+            },
+        ),
+    ]
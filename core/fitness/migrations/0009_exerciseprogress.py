@@ -0,0 +1,77 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0008_plantemplate"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExerciseProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_date", models.DateField()),
+                ("last_workout_id", models.PositiveBigIntegerField()),
+                ("target_sets", models.PositiveIntegerField()),
+                ("target_reps", models.PositiveIntegerField()),
+                (
+                    "working_weight",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=5, null=True
+                    ),
+                ),
+                (
+                    "working_sets",
+                    models.PositiveIntegerField(
+                        help_text="Sets done with the working weight"
+                    ),
+                ),
+                ("min_reps", models.PositiveIntegerField()),
+                ("max_reps", models.PositiveIntegerField()),
+                (
+                    "average_rpe",
+                    models.DecimalField(
+                        blank=True, decimal_places=1, max_digits=3, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "exercise",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="fitness.exercise",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "exercise"), name="exerciseprogress_unique"
+                    )
+                ],
+            },
+        ),
+    ]
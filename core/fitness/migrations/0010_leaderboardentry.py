@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0009_exerciseprogress"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("board", models.CharField(max_length=30)),
+                ("period_start", models.DateField()),
+                ("score", models.DecimalField(decimal_places=2, max_digits=14)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["board", "period_start", "-score", "user"],
+                        name="leaderboardentry_rank_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("board", "period_start", "user"),
+                        name="leaderboardentry_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Round
+
+import fitness.fields
+
+
+def to_fixed_point(apps, schema_editor):
+    WorkoutSet = apps.get_model("fitness", "WorkoutSet")
+    WorkoutSet.objects.using(schema_editor.connection.alias).update(
+        weight_fixed=Round(F("weight_kg") * 100),
+        rpe_fixed=Round(F("rpe") * 10),
+    )
+
+
+def to_decimal(apps, schema_editor):
+    WorkoutSet = apps.get_model("fitness", "WorkoutSet")
+    WorkoutSet.objects.using(schema_editor.connection.alias).update(
+        weight_kg=F("weight_fixed") / Value(100.0),
+        rpe=F("rpe_fixed") / Value(10.0),
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Pasa WorkoutSet.weight_kg y rpe a enteros escalados (FixedPointField).
+
+    Los valores se convierten con un único UPDATE sobre la tabla.
+    """
+
+    dependencies = [
+        ("fitness", "0011_activityyear"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workoutset",
+            name="weight_fixed",
+            field=fitness.fields.FixedPointField(
+                blank=True, decimal_places=2, max_digits=5, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="workoutset",
+            name="rpe_fixed",
+            field=fitness.fields.FixedPointField(
+                blank=True, decimal_places=1, max_digits=3, null=True
+            ),
+        ),
+        migrations.RunPython(
+            to_fixed_point, to_decimal, hints={"model_name": "workoutset"}
+        ),
+        migrations.RemoveField(model_name="workoutset", name="weight_kg"),
+        migrations.RemoveField(model_name="workoutset", name="rpe"),
+        migrations.RenameField(
+            model_name="workoutset", old_name="weight_fixed", new_name="weight_kg"
+        ),
+        migrations.RenameField(
+            model_name="workoutset", old_name="rpe_fixed", new_name="rpe"
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0013_idempotencykey"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="workout",
+            index=models.Index(fields=["user", "date"], name="workout_user_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="workoutexercise",
+            index=models.Index(
+                fields=["workout", "exercise"], name="workoutex_workout_exercise_idx"
+            ),
+        ),
+        # Sin estadísticas, SQLite prefiere el índice de exercise_id (todas las
+        # filas del ejercicio, de todos los usuarios) a los índices nuevos.
+        migrations.RunSQL("ANALYZE", reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = "fitness_workout_notes_fts"
+
+
+def create_notes_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"owner, notes, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite sin FTS5: la búsqueda usa SubstringSearch
+            return
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, owner, notes) "
+            f"SELECT id, 'u' || user_id, notes FROM fitness_workout "
+            f"WHERE notes IS NOT NULL AND notes != ''"
+        )
+
+
+def drop_notes_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+    """
+    Índice de texto completo de Workout.notes (ver fitness/search.py).
+
+    Solo en SQLite con FTS5; en otras bases no hace nada.
+    """
+
+    dependencies = [
+        ("fitness", "0014_exercise_history_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_notes_index, drop_notes_index, hints={"model_name": "workout"}
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:50
+
+import django.db.models.deletion
+import fitness.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0015_workout_notes_fts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchiveSegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.PositiveSmallIntegerField()),
+                ("workout_count", models.PositiveIntegerField()),
+                ("set_count", models.PositiveIntegerField()),
+                ("data", models.BinaryField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedWorkout",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("duration_min", models.PositiveIntegerField()),
+                ("set_count", models.PositiveIntegerField()),
+                (
+                    "volume",
+                    fitness.fields.FixedPointField(decimal_places=2, max_digits=12),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "segment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="workouts",
+                        to="fitness.archivesegment",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="archivesegment",
+            constraint=models.UniqueConstraint(
+                fields=("user", "year"), name="archivesegment_unique"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedworkout",
+            index=models.Index(
+                fields=["user", "date"], name="archivedworkout_user_date_idx"
+            ),
+        ),
+    ]
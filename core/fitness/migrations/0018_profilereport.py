@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0017_user_shard"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileReport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.CharField(max_length=2000)),
+                ("query_string", models.TextField(blank=True)),
+                ("status_code", models.PositiveSmallIntegerField()),
+                ("duration_ms", models.FloatField()),
+                ("sql_count", models.PositiveIntegerField()),
+                ("sql_ms", models.FloatField()),
+                ("serializer_ms", models.FloatField(blank=True, null=True)),
+                ("functions", models.JSONField(default=list)),
+                ("queries", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
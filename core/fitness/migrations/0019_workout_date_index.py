@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0018_profilereport"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="workout",
+            index=models.Index(fields=["date", "id"], name="workout_date_id_idx"),
+        ),
+    ]
@@ -0,0 +1,70 @@
+import zlib
+
+import msgpack
+from django.db import migrations, models
+
+# Copias congeladas del formato de segmento y de la fórmula al momento de
+# esta migración (fitness/archive.py puede cambiar después)
+TABLE_COLUMNS = {
+    "workouts": ("id", "date", "notes", "duration_min"),
+    "exercises": ("id", "workout_id", "exercise_id", "order", "target_sets", "target_reps"),
+    "sets": (
+        "id", "workout_exercise_id", "set_number", "reps_completed", "weight_kg", "rpe",
+        "rest_sec",
+    ),
+}
+
+
+def decode_segment(data):
+    columns = msgpack.unpackb(zlib.decompress(bytes(data)), raw=False)
+    return {
+        table: list(zip(*(columns[table][name] for name in names)))
+        for table, names in TABLE_COLUMNS.items()
+    }
+
+
+def best_e1rm(rows):
+    exercise_of = {row[0]: (row[1], str(row[2])) for row in rows["exercises"]}
+    best = {row[0]: {} for row in rows["workouts"]}
+    for _, workout_exercise_id, _, reps, weight, _, _ in rows["sets"]:
+        if weight is None:
+            continue
+        workout_id, exercise_id = exercise_of[workout_exercise_id]
+        value = round(weight * (reps + 30) / 3000.0, 2)  # weight en centésimas de kg
+        if value > best[workout_id].get(exercise_id, 0):
+            best[workout_id][exercise_id] = value
+    return best
+
+
+def fill_e1rm(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    ArchiveSegment = apps.get_model("fitness", "ArchiveSegment")
+    ArchivedWorkout = apps.get_model("fitness", "ArchivedWorkout")
+    for segment in ArchiveSegment.objects.using(alias).iterator():
+        e1rm = best_e1rm(decode_segment(segment.data))
+        workouts = list(ArchivedWorkout.objects.using(alias).filter(segment_id=segment.pk))
+        for workout in workouts:
+            workout.e1rm = e1rm.get(workout.pk, {})
+        ArchivedWorkout.objects.using(alias).bulk_update(workouts, ["e1rm"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    """
+    Guarda el mejor 1RM estimado por ejercicio de cada workout archivado,
+    calculado desde su segmento, para que los rankings lo incluyan.
+    """
+
+    dependencies = [
+        ("fitness", "0019_workout_date_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedworkout",
+            name="e1rm",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(
+            fill_e1rm, migrations.RunPython.noop, hints={"model_name": "archivedworkout"}
+        ),
+    ]
@@ -0,0 +1,165 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:13
+
+import zlib
+from datetime import date
+from decimal import Decimal
+
+import django.db.models.deletion
+import fitness.fields
+import msgpack
+from django.conf import settings
+from django.db import migrations, models
+
+# Copias congeladas del formato de segmento y de los resúmenes al momento de
+# esta migración (fitness/archive.py puede cambiar después)
+TABLE_COLUMNS = {
+    "workouts": ("id", "date", "notes", "duration_min"),
+    "exercises": ("id", "workout_id", "exercise_id", "order", "target_sets", "target_reps"),
+    "sets": (
+        "id", "workout_exercise_id", "set_number", "reps_completed", "weight_kg", "rpe",
+        "rest_sec",
+    ),
+}
+
+
+def decode_segment(data):
+    columns = msgpack.unpackb(zlib.decompress(bytes(data)), raw=False)
+    return {
+        table: list(zip(*(columns[table][name] for name in names)))
+        for table, names in TABLE_COLUMNS.items()
+    }
+
+
+def _kg(value):
+    return None if value is None else Decimal(value).scaleb(-2)
+
+
+def exercise_summaries(ArchivedExercise, user_id, rows):
+    day_of = {row[0]: row[1] for row in rows["workouts"]}
+    exercise_of = {row[0]: (row[1], row[2]) for row in rows["exercises"]}
+    # (workout, ejercicio) → [sets, volumen, top (peso, reps), best (peso, reps)]
+    totals = {key: [0, 0, None, None] for key in exercise_of.values()}
+    for _, workout_exercise_id, _, reps, weight, _, _ in rows["sets"]:
+        total = totals[exercise_of[workout_exercise_id]]
+        total[0] += 1
+        if weight is None:
+            continue
+        total[1] += reps * weight  # centésimas de kg
+        if total[2] is None or reps * weight > total[2][1] * total[2][0]:
+            total[2] = (weight, reps)
+        if total[3] is None or weight * (reps + 30) > total[3][0] * (total[3][1] + 30):
+            total[3] = (weight, reps)
+    return [
+        ArchivedExercise(
+            user_id=user_id,
+            workout_id=workout_id,
+            exercise_id=exercise_id,
+            date=date.fromordinal(day_of[workout_id]),
+            set_count=sets,
+            volume=Decimal(volume).scaleb(-2),
+            top_weight=_kg(top and top[0]),
+            top_reps=top and top[1],
+            best_weight=_kg(best and best[0]),
+            best_reps=best and best[1],
+        )
+        for (workout_id, exercise_id), (sets, volume, top, best) in totals.items()
+    ]
+
+
+def fill_exercises(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    ArchiveSegment = apps.get_model("fitness", "ArchiveSegment")
+    ArchivedExercise = apps.get_model("fitness", "ArchivedExercise")
+    for segment in ArchiveSegment.objects.using(alias).iterator():
+        ArchivedExercise.objects.using(alias).bulk_create(
+            exercise_summaries(ArchivedExercise, segment.user_id, decode_segment(segment.data)),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Guarda un resumen por ejercicio de cada workout archivado (sets, volumen,
+    set de mayor volumen y de mayor 1RM), calculado desde su segmento, para
+    que las estadísticas por ejercicio lo incluyan.
+    """
+
+    dependencies = [
+        ("fitness", "0020_archivedworkout_e1rm"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedExercise",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("set_count", models.PositiveIntegerField()),
+                (
+                    "volume",
+                    fitness.fields.FixedPointField(decimal_places=2, max_digits=12),
+                ),
+                (
+                    "top_weight",
+                    fitness.fields.FixedPointField(
+                        decimal_places=2, max_digits=5, null=True
+                    ),
+                ),
+                ("top_reps", models.PositiveIntegerField(null=True)),
+                (
+                    "best_weight",
+                    fitness.fields.FixedPointField(
+                        decimal_places=2, max_digits=5, null=True
+                    ),
+                ),
+                ("best_reps", models.PositiveIntegerField(null=True)),
+                (
+                    "exercise",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="fitness.exercise",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "workout",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exercises",
+                        to="fitness.archivedworkout",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "exercise", "date"],
+                        name="archivedexercise_exercise_idx",
+                    ),
+                    models.Index(
+                        fields=["user", "date"], name="archivedexercise_date_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(
+            fill_exercises, migrations.RunPython.noop, hints={"model_name": "archivedexercise"}
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0021_archivedexercise"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="workoutchange",
+            name="operation",
+            field=models.CharField(
+                choices=[
+                    ("upsert", "Upsert"),
+                    ("delete", "Delete"),
+                    ("archive", "Archive"),
+                ],
+                max_length=10,
+            ),
+        ),
+    ]
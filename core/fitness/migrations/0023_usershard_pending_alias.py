@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("fitness", "0022_workoutchange_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usershard",
+            name="pending_alias",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 
+from .fields import FixedPointField
+
 # Create your models here.
 
 
@@ -57,28 +59,410 @@ class Exercise(models.Model):
         return self.name
 
 
+class CatalogVersion(models.Model):
+    """
+    Versión del catálogo de ejercicios (una sola fila, pk=1).
+    
+    Se incrementa con cada cambio en Exercise; los procesos la comparan con la
+    de su foto en memoria del catálogo (ver fitness/catalog.py).
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+
 class Workout(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Sin constraint: el workout puede vivir en otro shard que el usuario
+    # (ver fitness/routers.py)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
     date = models.DateField()
     notes = models.TextField(blank=True, null=True)
     duration_min = models.PositiveIntegerField(help_text="Duration in minutes")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='workout_user_date_idx'),
+            # Listado y filtro por fecha del admin, sin recorrer la tabla
+            models.Index(fields=['date', 'id'], name='workout_date_id_idx'),
+        ]
+
+    
+
+class UserShard(models.Model):
+    """
+    Shard (alias de DATABASES) donde viven los workouts de un usuario.
+    
+    Se asigna al crear el usuario y cambia con el comando `rebalance_shards`.
+    Un usuario sin fila vive en el primer shard (ver fitness/sharding.py).
+    
+    Durante una mudanza `pending_alias` es el shard con una copia que no
+    vale (la nueva a medio copiar, o la vieja por borrar); si la mudanza se
+    interrumpe, la próxima borra esa copia antes de seguir.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shard',
+    )
+    alias = models.CharField(max_length=100)
+    pending_alias = models.CharField(max_length=100, null=True, blank=True)
+
+
+class WorkoutVersion(models.Model):
+    """
+    Versión de los workouts de cada usuario.
     
+    Se incrementa en cada escritura (crear, actualizar o eliminar un workout)
+    y permite responder GETs condicionales del listado con una sola consulta.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='workout_version',
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
 
+class WorkoutChange(models.Model):
+    """
+    Registro de cambios de los workouts de un usuario para la sincronización.
     
+    Cada fila indica que un Workout, WorkoutExercise o WorkoutSet fue creado o
+    modificado (upsert) o eliminado (delete), o que un Workout pasó al archivo
+    (archive, ver fitness/archive.py). El id autoincremental funciona
+    como token de sincronización: un cliente pide los cambios con id mayor al
+    último que vio.
+    """
+    WORKOUT = 'workout'
+    WORKOUT_EXERCISE = 'workout_exercise'
+    WORKOUT_SET = 'workout_set'
+    KIND_CHOICES = [
+        (WORKOUT, 'Workout'),
+        (WORKOUT_EXERCISE, 'Workout exercise'),
+        (WORKOUT_SET, 'Workout set'),
+    ]
+    
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ARCHIVE = 'archive'
+    OPERATION_CHOICES = [
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+        (ARCHIVE, 'Archive'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='workoutchange_user_id_idx'),
+        ]
+
+
+class StatsBucket(models.Model):
+    """
+    Agregados de los workouts de un usuario en un período cerrado.
+    
+    Solo se guardan períodos (día, semana, mes o año) que ya terminaron; el
+    período en curso se calcula en cada request. Las escrituras sobre un
+    workout eliminan los períodos que contienen su fecha (ver
+    fitness/buckets.py).
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    YEAR = 'year'
+    GRANULARITY_CHOICES = [
+        (DAY, 'Day'),
+        (WEEK, 'Week'),
+        (MONTH, 'Month'),
+        (YEAR, 'Year'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    start = models.DateField()
+    volume = models.DecimalField(max_digits=14, decimal_places=2)
+    set_count = models.PositiveIntegerField()
+    workout_count = models.PositiveIntegerField()
+    duration_min = models.PositiveIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'granularity', 'start'], name='statsbucket_unique'
+            ),
+        ]
+
+
+class ExerciseProgress(models.Model):
+    """
+    Resumen de la última sesión de un ejercicio de cada usuario.
+    
+    Se actualiza al escribir workouts que contienen el ejercicio y alimenta la
+    sugerencia del próximo objetivo sin recorrer el historial (ver
+    fitness/progress.py).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    last_date = models.DateField()
+    last_workout_id = models.PositiveBigIntegerField()
+    target_sets = models.PositiveIntegerField()
+    target_reps = models.PositiveIntegerField()
+    working_weight = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+    working_sets = models.PositiveIntegerField(help_text="Sets done with the working weight")
+    min_reps = models.PositiveIntegerField()
+    max_reps = models.PositiveIntegerField()
+    average_rpe = models.DecimalField(max_digits=3, decimal_places=1, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'exercise'], name='exerciseprogress_unique'
+            ),
+        ]
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Puntaje semanal de un usuario en un ranking.
+    
+    `board` identifica el ranking: 'volume', 'workouts' o 'e1rm:<exercise_id>'.
+    Las filas de un usuario se recalculan al escribir sus workouts (ver
+    fitness/leaderboards.py); el índice por (board, period_start, score)
+    resuelve el top-N y la posición de un usuario sin agregar sets.
+    """
+    VOLUME = 'volume'
+    WORKOUTS = 'workouts'
+    E1RM = 'e1rm'
+    
+    board = models.CharField(max_length=30)
+    period_start = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    score = models.DecimalField(max_digits=14, decimal_places=2)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['board', 'period_start', 'user'], name='leaderboardentry_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['board', 'period_start', '-score', 'user'],
+                name='leaderboardentry_rank_idx',
+            ),
+        ]
+
+
+class ActivityYear(models.Model):
+    """
+    Actividad diaria de un usuario en un año, en forma compacta.
+    
+    `counts` tiene un byte por día del año (366) con la cantidad de workouts
+    (hasta 255) y `volumes` un entero sin signo de 32 bits por día con el
+    volumen en kg redondeado. Las escrituras de workouts actualizan los días
+    afectados (ver fitness/activity.py).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    year = models.PositiveSmallIntegerField()
+    counts = models.BinaryField()
+    volumes = models.BinaryField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='activityyear_unique'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Primera respuesta exitosa de una escritura enviada con Idempotency-Key.
+    
+    Los reintentos con la misma clave (por usuario) dentro del TTL reciben
+    esta respuesta sin volver a ejecutar la escritura. `fingerprint` es un
+    hash del método, la ruta y el cuerpo del request original (ver
+    fitness/idempotency.py).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotencykey_unique'),
+        ]
+
+
+class ArchiveSegment(models.Model):
+    """
+    Workouts archivados de un usuario en un año, comprimidos.
+    
+    `data` guarda las filas de Workout, WorkoutExercise y WorkoutSet por
+    columnas (una lista de valores por campo), serializadas con MessagePack y
+    comprimidas con zlib. Ver fitness/archive.py.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    year = models.PositiveSmallIntegerField()
+    workout_count = models.PositiveIntegerField()
+    set_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year'], name='archivesegment_unique'),
+        ]
+
+
+class ArchivedWorkout(models.Model):
+    """
+    Índice y resumen de un workout archivado.
+    
+    Conserva el id original, para encontrar su segmento cuando se pide el
+    workout, y los totales que usan las estadísticas por período, el
+    calendario de actividad y los rankings semanales.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    segment = models.ForeignKey(ArchiveSegment, on_delete=models.CASCADE, related_name='workouts')
+    date = models.DateField()
+    duration_min = models.PositiveIntegerField()
+    set_count = models.PositiveIntegerField()
+    volume = FixedPointField(max_digits=12, decimal_places=2)
+    # Mejor 1RM estimado (kg) por id de ejercicio, para los rankings semanales
+    e1rm = models.JSONField(default=dict)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='archivedworkout_user_date_idx'),
+        ]
+
+
+class ArchivedExercise(models.Model):
+    """
+    Resumen de un ejercicio dentro de un workout archivado.
+    
+    Una fila por ejercicio del workout (si aparece varias veces, se suman),
+    con la fecha del workout, para que las estadísticas por ejercicio
+    (volumen, top sets, 1RM, músculos) y el historial incluyan el archivo sin
+    descomprimir segmentos. El volumen cuenta los sets con peso; `top_*` es
+    el set de mayor volumen y `best_*` el de mayor 1RM estimado, nulos si
+    ningún set tiene peso.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    workout = models.ForeignKey(ArchivedWorkout, on_delete=models.CASCADE, related_name='exercises')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    set_count = models.PositiveIntegerField()
+    volume = FixedPointField(max_digits=12, decimal_places=2)
+    top_weight = FixedPointField(max_digits=5, decimal_places=2, null=True)
+    top_reps = models.PositiveIntegerField(null=True)
+    best_weight = FixedPointField(max_digits=5, decimal_places=2, null=True)
+    best_reps = models.PositiveIntegerField(null=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'exercise', 'date'], name='archivedexercise_exercise_idx'),
+            models.Index(fields=['user', 'date'], name='archivedexercise_date_idx'),
+        ]
+
 
 class WorkoutExercise(models.Model):
     workout = models.ForeignKey(Workout, on_delete=models.CASCADE, related_name='workout_exercises')
-    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    # El catálogo vive en la base por defecto
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, db_constraint=False)
     order = models.PositiveIntegerField()
     target_sets = models.PositiveIntegerField()
     target_reps = models.PositiveIntegerField()
     
+    class Meta:
+        indexes = [
+            # Historial por ejercicio: workouts del usuario -> sus ejercicios
+            models.Index(fields=['workout', 'exercise'], name='workoutex_workout_exercise_idx'),
+        ]
     
 
 class WorkoutSet(models.Model):
     workout_exercise = models.ForeignKey(WorkoutExercise, on_delete=models.CASCADE, related_name='sets')
     set_number = models.PositiveIntegerField()
     reps_completed = models.PositiveIntegerField()
-    weight_kg = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
-    rpe = models.DecimalField(max_digits=3, decimal_places=1, blank=True, null=True)
-    rest_sec = models.PositiveIntegerField(blank=True, null=True)
\ No newline at end of file
+    # Enteros escalados (centésimas de kg y décimas de RPE), ver fitness/fields.py
+    weight_kg = FixedPointField(max_digits=5, decimal_places=2, blank=True, null=True)
+    rpe = FixedPointField(max_digits=3, decimal_places=1, blank=True, null=True)
+    rest_sec = models.PositiveIntegerField(blank=True, null=True)
+
+
+class PlanTemplate(models.Model):
+    """
+    Programa de entrenamiento semanal recurrente.
+    
+    Las sesiones programadas no se guardan: se calculan para el rango de
+    fechas pedido a partir de los PlanExercise de cada día de la semana (ver
+    fitness/plans.py).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='plan_templates')
+    name = models.CharField(max_length=100)
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    interval_weeks = models.PositiveIntegerField(default=1, help_text="Repeat every N weeks")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.name
+
+
+class PlanExercise(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    ]
+    
+    template = models.ForeignKey(PlanTemplate, on_delete=models.CASCADE, related_name='exercises')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    order = models.PositiveIntegerField()
+    target_sets = models.PositiveIntegerField()
+    target_reps = models.PositiveIntegerField()
+
+
+class ProfileReport(models.Model):
+    """
+    Perfil de un request pedido por un usuario staff (ver fitness/profiling.py).
+    
+    `functions` guarda las funciones con mayor tiempo acumulado y `queries`
+    las consultas SQL más lentas con su plan (EXPLAIN), de mayor a menor
+    duración.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    query_string = models.TextField(blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField()
+    serializer_ms = models.FloatField(null=True, blank=True)
+    functions = models.JSONField(default=list)
+    queries = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
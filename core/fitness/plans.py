@@ -0,0 +1,56 @@
+"""
+Expansión de los planes de entrenamiento en sesiones programadas.
+
+Un PlanTemplate describe una semana tipo (ejercicios por día de la semana)
+que se repite cada `interval_weeks` semanas desde `start_date` hasta
+`end_date` (o indefinidamente). Las sesiones no se guardan como filas: se
+generan de forma perezosa para el rango pedido, sin materializar semanas
+fuera de él.
+"""
+
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+
+Occurrence = namedtuple('Occurrence', ['date', 'template', 'exercises'])
+
+
+def iter_template(template, date_from, date_to):
+    """
+    Sesiones de un plan entre date_from y date_to (inclusive), en orden.
+
+    Usa template.exercises.all(), que conviene traer con prefetch_related.
+    """
+    by_weekday = {}
+    for plan_exercise in sorted(template.exercises.all(), key=lambda e: e.order):
+        by_weekday.setdefault(plan_exercise.weekday, []).append(plan_exercise)
+    if not by_weekday:
+        return
+
+    first = max(date_from, template.start_date)
+    last = min(date_to, template.end_date) if template.end_date else date_to
+    if first > last:
+        return
+
+    # Las semanas válidas son las que están a un múltiplo de interval_weeks
+    # de la semana de start_date
+    anchor = template.start_date - timedelta(days=template.start_date.weekday())
+    step = max(template.interval_weeks, 1)
+    weeks = (first - anchor).days // 7
+    week = anchor + timedelta(weeks=weeks + (-weeks % step))
+
+    weekdays = sorted(by_weekday)
+    while week <= last:
+        for weekday in weekdays:
+            day = week + timedelta(days=weekday)
+            if first <= day <= last:
+                yield Occurrence(day, template, by_weekday[weekday])
+        week += timedelta(weeks=step)
+
+
+def iter_occurrences(templates, date_from, date_to):
+    """Sesiones de varios planes mezcladas por fecha (y por plan dentro del día)"""
+    return heapq.merge(
+        *(iter_template(template, date_from, date_to) for template in templates),
+        key=lambda occurrence: (occurrence.date, occurrence.template.pk),
+    )
@@ -0,0 +1,175 @@
+"""
+Perfil de requests a pedido, para usuarios staff.
+
+Un request con el header `X-Profile: 1` (o `?_profile=1`) de un usuario staff
+se ejecuta bajo cProfile, con todas las consultas SQL registradas (de todas
+las bases) y su duración. Al terminar se guarda un ProfileReport, visible en
+el admin, con:
+
+- Las funciones con mayor tiempo acumulado.
+- Las consultas más lentas con su plan: EXPLAIN QUERY PLAN en SQLite,
+  EXPLAIN en PostgreSQL. Los planes se obtienen después de responder, así
+  no cuentan en los tiempos.
+- El tiempo en los serializers de DRF (el mayor tiempo acumulado de
+  Serializer.data / to_representation).
+
+La respuesta lleva el header `X-Profile-Id` con el id del reporte. Sin el
+header ni el parámetro, el middleware solo hace esas dos comprobaciones.
+"""
+
+import cProfile
+import os
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.db import DatabaseError, connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .models import ProfileReport
+
+HEADER = 'X-Profile'
+QUERY_PARAM = '_profile'
+RESPONSE_HEADER = 'X-Profile-Id'
+TOP_FUNCTIONS = 40
+TOP_QUERIES = 25
+MAX_PARAMS_LENGTH = 500
+
+SERIALIZERS_FILE = os.path.join('rest_framework', 'serializers.py')
+SERIALIZER_FUNCTIONS = ('data', 'to_representation')
+
+
+def is_requested(request):
+    return HEADER in request.headers or QUERY_PARAM in request.GET
+
+
+def staff_user(request):
+    """
+    Usuario staff del request, autenticado con las clases de DRF (JWT o
+    sesión), o None.
+    """
+    original = getattr(request, 'user', None)
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        user = None
+    finally:
+        # Request.user también lo asigna al HttpRequest: dejarlo como estaba
+        if original is not None:
+            request.user = original
+    return user if user is not None and user.is_staff else None
+
+
+class QueryLog:
+    """execute_wrapper que registra cada consulta con su base y duración"""
+
+    def __init__(self):
+        self.queries = []
+
+    def wrapper(self, alias):
+        def execute(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append({
+                    'alias': alias,
+                    'sql': sql,
+                    'params': params,
+                    'many': many,
+                    'ms': (time.perf_counter() - start) * 1000,
+                })
+        return execute
+
+
+def explain(alias, sql, params):
+    """Plan de la consulta como lista de líneas (vacía si no se puede explicar)"""
+    connection = connections[alias]
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return []
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return [f'EXPLAIN failed: {exc}']
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def function_stats(profiler):
+    """(funciones con mayor tiempo acumulado, tiempo en serializers en ms)"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    serializer_ms = None
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        })
+        if filename.endswith(SERIALIZERS_FILE) and name in SERIALIZER_FUNCTIONS:
+            serializer_ms = max(serializer_ms or 0, cumulative * 1000)
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:TOP_FUNCTIONS], serializer_ms
+
+
+def profile(request, get_response, user):
+    """Ejecutar el request con el perfil activo y guardar el reporte"""
+    log = QueryLog()
+    profiler = cProfile.Profile()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(log.wrapper(alias)))
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            # Incluye el render: Django renderiza las respuestas de DRF
+            # antes de devolverlas a los middlewares
+            response = get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+    functions, serializer_ms = function_stats(profiler)
+    slowest = sorted(log.queries, key=lambda query: query['ms'], reverse=True)[:TOP_QUERIES]
+    report = ProfileReport.objects.create(
+        user=user,
+        method=request.method,
+        path=request.path,
+        query_string=request.META.get('QUERY_STRING', ''),
+        status_code=response.status_code,
+        duration_ms=round(duration_ms, 3),
+        sql_count=len(log.queries),
+        sql_ms=round(sum(query['ms'] for query in log.queries), 3),
+        serializer_ms=round(serializer_ms, 3) if serializer_ms is not None else None,
+        functions=functions,
+        queries=[
+            {
+                'alias': query['alias'],
+                'sql': query['sql'],
+                'params': repr(query['params'])[:MAX_PARAMS_LENGTH],
+                'ms': round(query['ms'], 3),
+                'plan': [] if query['many'] else explain(
+                    query['alias'], query['sql'], query['params']
+                ),
+            }
+            for query in slowest
+        ],
+    )
+    response[RESPONSE_HEADER] = str(report.pk)
+    return response
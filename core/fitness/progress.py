@@ -0,0 +1,206 @@
+"""
+Sugerencia del próximo objetivo (peso, reps y sets) por ejercicio.
+
+Cada par (usuario, ejercicio) tiene un ExerciseProgress con el resumen de la
+última sesión registrada: objetivo de sets/reps, peso de trabajo (el mayor
+de la sesión), reps mínimas y máximas con ese peso y RPE promedio.
+record_workout_change lo actualiza para los ejercicios de los workouts
+escritos a partir de las sesiones de las semanas escritas (update_progress),
+y solo lee el historial cuando la última sesión guardada desapareció; la
+sugerencia se calcula a partir del resumen sin consultar el historial.
+
+Regla (doble progresión):
+
+- Todos los sets objetivo con las reps objetivo y RPE < 9.5: subir el peso
+  (o una rep si el ejercicio es sin peso).
+- Sets o reps incompletos con RPE >= 9.5: bajar el peso un 10%.
+- En otro caso: repetir el mismo objetivo.
+"""
+
+from decimal import ROUND_DOWN, Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Max, Q
+
+from .models import ExerciseProgress, WorkoutSet
+
+WEIGHT_INCREMENTS = {
+    'barbell': Decimal('2.5'),
+    'dumbbell': Decimal('2'),
+    'kettlebell': Decimal('4'),
+    'machine': Decimal('5'),
+}
+DEFAULT_INCREMENT = Decimal('2.5')
+HARD_RPE = Decimal('9.5')
+DELOAD = Decimal('0.9')
+
+INCREASE_WEIGHT = 'increase_weight'
+ADD_REPS = 'add_reps'
+REPEAT = 'repeat'
+DELOAD_WEIGHT = 'deload'
+
+
+def refresh_progress(user_id, exercise_ids):
+    """Recalcular el resumen de los ejercicios indicados desde su última sesión"""
+    exercise_ids = set(exercise_ids)
+    if not exercise_ids:
+        return
+
+    user_sets = WorkoutSet.objects.filter(
+        workout_exercise__workout__user_id=user_id,
+        workout_exercise__exercise_id__in=exercise_ids,
+    )
+    last_dates = dict(
+        user_sets.values_list('workout_exercise__exercise_id')
+        .annotate(last=Max('workout_exercise__workout__date'))
+        .order_by()
+    )
+
+    sessions = {}
+    if last_dates:
+        rows = user_sets.filter(
+            reduce(
+                or_,
+                (
+                    Q(workout_exercise__exercise_id=exercise_id, workout_exercise__workout__date=day)
+                    for exercise_id, day in last_dates.items()
+                ),
+            )
+        ).values_list(
+            'workout_exercise__exercise_id', 'workout_exercise__workout_id',
+            'workout_exercise__target_sets', 'workout_exercise__target_reps',
+            'reps_completed', 'weight_kg', 'rpe',
+        )
+        for exercise_id, workout_id, target_sets, target_reps, reps, weight, rpe in rows:
+            # Si hubo varios workouts ese día, vale el último
+            session = sessions.get(exercise_id)
+            if session is None or workout_id > session['workout_id']:
+                session = sessions[exercise_id] = {
+                    'workout_id': workout_id,
+                    'target_sets': target_sets,
+                    'target_reps': target_reps,
+                    'sets': [],
+                }
+            if workout_id == session['workout_id']:
+                session['sets'].append((reps, weight, rpe))
+
+    stale = exercise_ids - sessions.keys()
+    if stale:
+        ExerciseProgress.objects.filter(user_id=user_id, exercise_id__in=stale).delete()
+    _save([
+        _summarize(user_id, exercise_id, last_dates[exercise_id], session)
+        for exercise_id, session in sessions.items()
+    ])
+
+
+def update_progress(user_id, exercise_ids, written):
+    """
+    Actualizar el resumen de los ejercicios escritos desde la última sesión
+    de cada uno dentro de las semanas escritas (WrittenWeeks, ver
+    fitness/changes.py).
+    
+    Las sesiones fuera de esas semanas no cambiaron. Si la última sesión
+    guardada está fuera, basta con compararla con la última de las semanas;
+    si está dentro, la de las semanas la reemplaza mientras no sea anterior.
+    Solo se vuelve al historial (refresh_progress) sin resumen guardado o si
+    la última sesión guardada se borró o se movió a una fecha anterior.
+    """
+    exercise_ids = set(exercise_ids)
+    if not exercise_ids:
+        return
+    stored = {
+        exercise_id: (day, workout_id)
+        for exercise_id, day, workout_id in ExerciseProgress.objects.filter(
+            user_id=user_id, exercise_id__in=exercise_ids
+        ).values_list('exercise_id', 'last_date', 'last_workout_id')
+    }
+    
+    history, changed = [], []
+    for exercise_id in exercise_ids:
+        last = stored.get(exercise_id)
+        session = written.sessions.get(exercise_id)
+        latest = session and (session['date'], session['workout_id'])
+        if last is None or (written.contains(last[0]) and (latest is None or latest < last)):
+            history.append(exercise_id)
+        elif latest is not None and (written.contains(last[0]) or latest > last):
+            changed.append(_summarize(user_id, exercise_id, session['date'], session))
+    
+    if history:
+        refresh_progress(user_id, history)
+    _save(changed)
+
+
+def _save(summaries):
+    if summaries:
+        ExerciseProgress.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['user', 'exercise'],
+            update_fields=[
+                'last_date', 'last_workout_id', 'target_sets', 'target_reps',
+                'working_weight', 'working_sets', 'min_reps', 'max_reps',
+                'average_rpe', 'updated_at',
+            ],
+        )
+
+
+def _summarize(user_id, exercise_id, day, session):
+    weights = [weight for _, weight, _ in session['sets'] if weight is not None]
+    working_weight = max(weights) if weights else None
+    working = [s for s in session['sets'] if s[1] == working_weight]
+    reps = [s[0] for s in working]
+    rpes = [s[2] for s in working if s[2] is not None]
+    average_rpe = (
+        (sum(rpes) / len(rpes)).quantize(Decimal('0.1')) if rpes else None
+    )
+    return ExerciseProgress(
+        user_id=user_id,
+        exercise_id=exercise_id,
+        last_date=day,
+        last_workout_id=session['workout_id'],
+        target_sets=session['target_sets'],
+        target_reps=session['target_reps'],
+        working_weight=working_weight,
+        working_sets=len(working),
+        min_reps=min(reps),
+        max_reps=max(reps),
+        average_rpe=average_rpe,
+    )
+
+
+def suggest_next(progress, equipment=None):
+    """
+    Próximo objetivo a partir del resumen de la última sesión.
+
+    Devuelve un dict con weight (Decimal o None), reps, sets y reason.
+    """
+    completed = (
+        progress.working_sets >= progress.target_sets
+        and progress.min_reps >= progress.target_reps
+    )
+    hard = progress.average_rpe is not None and progress.average_rpe >= HARD_RPE
+    weight = progress.working_weight
+    reps = progress.target_reps
+    increment = WEIGHT_INCREMENTS.get(equipment, DEFAULT_INCREMENT)
+
+    if weight is None:
+        if completed and not hard:
+            reps, reason = progress.max_reps + 1, ADD_REPS
+        else:
+            reason = REPEAT
+    elif completed and not hard:
+        weight, reason = weight + increment, INCREASE_WEIGHT
+    elif not completed and hard:
+        # 10% menos, redondeado hacia abajo al incremento del equipo
+        steps = (weight * DELOAD / increment).to_integral_value(rounding=ROUND_DOWN)
+        weight, reason = max(steps * increment, Decimal('0')), DELOAD_WEIGHT
+    else:
+        reason = REPEAT
+
+    return {
+        'weight': weight,
+        'reps': reps,
+        'sets': progress.target_sets,
+        'reason': reason,
+    }
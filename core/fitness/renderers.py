@@ -0,0 +1,43 @@
+"""
+Formato binario MessagePack para la API.
+
+Los clientes lo piden con `Accept: application/msgpack` (o `?format=msgpack`)
+y pueden enviar payloads con `Content-Type: application/msgpack`. Los datos
+son los mismos que en JSON: decimales y fechas se codifican como strings,
+igual que los produce JSONRenderer.
+"""
+
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Mismas conversiones que el JSONEncoder de DRF (Decimal, fechas, UUID...)
+    return _encoder.default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
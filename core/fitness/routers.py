@@ -0,0 +1,85 @@
+"""
+Router de los workouts por shard.
+
+Workout, WorkoutExercise y WorkoutSet de cada usuario viven en uno de los
+shards de FITNESS_SHARDS (alias de DATABASES); el resto de los modelos
+(usuarios, catálogo, agregados, registro de cambios...) en `default`.
+
+El shard se toma del contexto actual (use_shard), que las vistas activan
+con el shard del usuario autenticado (ver fitness/sharding.py), o de la
+instancia relacionada (p. ej. workout.workout_exercises). Sin contexto se
+usa el primer shard, donde viven los usuarios sin ubicar.
+
+Las tablas de los modelos con shard se crean en las bases con bloque de ids
+(FITNESS_SHARD_ID_BLOCKS) y las demás solo en `default`.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SHARDED_MODELS = frozenset({'fitness.workout', 'fitness.workoutexercise', 'fitness.workoutset'})
+
+_current_shard = ContextVar('fitness_shard', default=None)
+
+
+def get_shards():
+    return settings.FITNESS_SHARDS
+
+
+def is_sharded():
+    return len(get_shards()) > 1
+
+
+def current_shard():
+    return _current_shard.get() or get_shards()[0]
+
+
+def activate_shard(alias):
+    """Activar un shard; devuelve el token para deactivate_shard"""
+    return _current_shard.set(alias)
+
+
+def deactivate_shard(token):
+    _current_shard.reset(token)
+
+
+@contextmanager
+def use_shard(alias):
+    token = activate_shard(alias)
+    try:
+        yield alias
+    finally:
+        deactivate_shard(token)
+
+
+def is_sharded_model(model):
+    """Modelo o instancia (también un usuario en SimpleLazyObject) con shard"""
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+class ShardRouter:
+    def db_for_read(self, model, **hints):
+        if not is_sharded_model(model):
+            # Explícito: sin router, Django usaría la base de la instancia
+            # relacionada (p. ej. el shard de un WorkoutExercise para su Exercise)
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and is_sharded_model(instance) and instance._state.db:
+            return instance._state.db
+        return current_shard()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las operaciones sin modelo (RunSQL, RunPython sin hints) van en todas
+        if model_name is None:
+            return None
+        if f'{app_label}.{model_name}' in SHARDED_MODELS:
+            return db in settings.FITNESS_SHARD_ID_BLOCKS
+        return db == DEFAULT_DB_ALIAS
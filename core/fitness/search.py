@@ -0,0 +1,189 @@
+"""
+Búsqueda de texto completo sobre las notas de los workouts.
+
+WorkoutListView acepta `?q=<texto>` y devuelve los workouts del usuario cuyas
+notas contienen todos los términos (el último como prefijo, sin distinguir
+mayúsculas ni acentos), ordenados por relevancia salvo que se pida otro
+`ordering`.
+
+El motor depende de la base de datos:
+
+- SQLite: tabla virtual FTS5 `fitness_workout_notes_fts` (creada en la
+  migración 0015), con rowid = id del workout. El usuario se indexa como un
+  token en la columna `owner`, así la búsqueda recorre solo el índice
+  invertido y no las notas de otros usuarios. record_workout_change la
+  mantiene al día con los workouts escritos; el comando
+  `rebuild_notes_index` la reconstruye completa.
+- Otras bases: SubstringSearch, que filtra con icontains por término y
+  ordena por fecha. Para agregar un motor nativo (p. ej. tsvector en
+  PostgreSQL) basta con otra subclase de NotesSearch registrada en
+  SEARCH_BACKENDS.
+
+Cada shard (ver fitness/routers.py) tiene su propio índice, junto a sus
+workouts.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import Workout
+from .routers import current_shard
+
+FTS_TABLE = 'fitness_workout_notes_fts'
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    return TERM_RE.findall(query.lower())
+
+
+class NotesSearch:
+    """Interfaz de un motor de búsqueda de notas de la base (shard) `alias`"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def index(self, workout_ids):
+        """Reindexar los workouts indicados (creados o modificados)"""
+
+    def remove(self, workout_ids):
+        """Quitar del índice los workouts eliminados"""
+
+    def rebuild(self):
+        """Reconstruir el índice completo"""
+
+    # Orden de los resultados de filter() por relevancia
+    ordering = ('-date', '-id')
+
+    def filter(self, queryset, user_id, query):
+        """
+        Workouts del queryset (del usuario) que coinciden, en la misma
+        consulta y sin límite: los demás filtros y la paginación se aplican
+        sobre todas las coincidencias.
+        """
+        raise NotImplementedError
+
+
+class SubstringSearch(NotesSearch):
+    """Sin índice: icontains por término, más recientes primero"""
+
+    def filter(self, queryset, user_id, query):
+        queryset = queryset.filter(user_id=user_id)
+        for term in search_terms(query):
+            queryset = queryset.filter(notes__icontains=term)
+        return queryset
+
+
+class SQLiteFTSSearch(NotesSearch):
+    """Tabla virtual FTS5 con ranking BM25"""
+    ordering = ('search_rank', '-id')
+
+    def index(self, workout_ids):
+        workout_ids = list(workout_ids)
+        if not workout_ids:
+            return
+        # Las notas se copian dentro de SQLite, sin leerlas desde Python
+        placeholders = ', '.join(['%s'] * len(workout_ids))
+        with connections[self.alias].cursor() as cursor:
+            self._delete(cursor, workout_ids)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, owner, notes) "
+                f"SELECT id, 'u' || user_id, notes FROM {Workout._meta.db_table} "
+                f"WHERE id IN ({placeholders}) AND notes IS NOT NULL AND notes != ''",
+                workout_ids,
+            )
+
+    def remove(self, workout_ids):
+        workout_ids = list(workout_ids)
+        if workout_ids:
+            with connections[self.alias].cursor() as cursor:
+                self._delete(cursor, workout_ids)
+
+    def rebuild(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, owner, notes) "
+                f"SELECT id, 'u' || user_id, notes FROM {Workout._meta.db_table} "
+                f"WHERE notes IS NOT NULL AND notes != ''"
+            )
+
+    def filter(self, queryset, user_id, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        # Términos entre comillas (sin sintaxis FTS del usuario); el último
+        # como prefijo, para buscar mientras se escribe
+        phrases = [f'"{term}"' for term in terms]
+        phrases[-1] += '*'
+        match = 'owner : u%d AND notes : (%s)' % (user_id, ' '.join(phrases))
+        # La subconsulta recorre el índice invertido; bm25 (search_rank,
+        # menor es mejor) se calcula solo para las coincidencias, buscando
+        # cada una por rowid
+        fts = connections[self.alias].ops.quote_name(FTS_TABLE)
+        workouts = connections[self.alias].ops.quote_name(Workout._meta.db_table)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT bm25({fts}, 0.0, 1.0) FROM {fts} '
+                f'WHERE {fts} MATCH %s AND {fts}.rowid = {workouts}.id',
+                [match],
+            )
+        )
+
+    def _delete(self, cursor, workout_ids):
+        placeholders = ', '.join(['%s'] * len(workout_ids))
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', workout_ids)
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteFTSSearch,
+}
+
+_backends = {}
+
+
+def get_notes_search(alias=None):
+    """
+    Motor de la base indicada o, por defecto, del shard actual (ver
+    fitness/routers.py). Se resuelve una vez por proceso y base.
+    """
+    alias = alias or current_shard()
+    if alias not in _backends:
+        connection = connections[alias]
+        backend_class = SEARCH_BACKENDS.get(connection.vendor, SubstringSearch)
+        if backend_class is SQLiteFTSSearch and FTS_TABLE not in connection.introspection.table_names():
+            # SQLite compilado sin FTS5: la migración no creó la tabla
+            backend_class = SubstringSearch
+        _backends[alias] = backend_class(alias)
+    return _backends[alias]
+
+
+def sync_notes(upserted=(), deleted=()):
+    """Mantener el índice de notas del shard actual al día con los workouts escritos"""
+    search = get_notes_search()
+    search.remove(deleted)
+    search.index(upserted)
+
+
+class WorkoutNotesSearchFilter(BaseFilterBackend):
+    """
+    `?q=` sobre las notas de los workouts. Debe ir después de OrderingFilter:
+    sin `ordering` explícito reemplaza el orden por la relevancia.
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        search = get_notes_search()
+        queryset = search.filter(queryset, request.user.pk, query)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.order_by(*search.ordering)
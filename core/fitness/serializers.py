@@ -1,5 +1,12 @@
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
-from .models import Exercise, Workout, WorkoutExercise, WorkoutSet
+from .catalog import get_catalog
+from .changes import record_workout_change, workout_tree
+from .models import (
+    ArchivedWorkout, Exercise, PlanExercise, PlanTemplate, Workout, WorkoutChange, WorkoutExercise,
+    WorkoutSet,
+)
+from .sharding import shard_atomic
 
 class ExerciseSerializer(serializers.ModelSerializer):
     # Definir secondary_muscles como una lista de strings
@@ -48,7 +55,8 @@ class WorkoutSetSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorkoutSet
         fields = "__all__"
-        read_only_fields = ('id',)
+        # El workout_exercise lo asigna el serializer padre al crear
+        read_only_fields = ('id', 'workout_exercise')
         
     def validate_rpe(self, value):
         """Validar que RPE esté entre 1 y 10"""
@@ -63,14 +71,70 @@ class WorkoutSetSerializer(serializers.ModelSerializer):
         return value
 
 
-class WorkoutExerciseSerializer(serializers.ModelSerializer):
+class ExerciseRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que resuelve el ejercicio desde la foto en memoria
+    del catálogo (fitness/catalog.py), sin una consulta por item.
+    
+    Los errores (id inexistente o de tipo inválido) son los mismos que los de
+    PrimaryKeyRelatedField.
+    """
+    
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        record = get_catalog().get(pk)
+        if record is None:
+            self.fail('does_not_exist', pk_value=data)
+        return record.as_model()
+
+
+class CatalogExerciseMixin(serializers.ModelSerializer):
+    """
+    Campos `exercise` y `exercise_name` resueltos desde la foto del catálogo,
+    para los serializers de modelos con una FK a Exercise. Cada serializer
+    declara `exercise_name = SerializerMethodField()` donde corresponde en el
+    orden de sus campos (los campos de la clase base irían primero).
+    """
+    
+    def build_relational_field(self, field_name, relation_info):
+        """Usar ExerciseRelatedField para `exercise` sin cambiar el orden de campos"""
+        field_class, field_kwargs = super().build_relational_field(field_name, relation_info)
+        if field_name == 'exercise':
+            field_class = ExerciseRelatedField
+        return field_class, field_kwargs
+        
+    def get_exercise_name(self, obj):
+        """Nombre del ejercicio desde la foto del catálogo (sin join)"""
+        name = get_catalog().name_of(obj.exercise_id)
+        return name if name is not None else obj.exercise.name
+    
+    def validate_target_sets(self, value):
+        """Validar que target_sets sea positivo"""
+        if value <= 0:
+            raise serializers.ValidationError("Target sets must be greater than 0")
+        return value
+        
+    def validate_target_reps(self, value):
+        """Validar que target_reps sea positivo"""
+        if value <= 0:
+            raise serializers.ValidationError("Target reps must be greater than 0")
+        return value
+
+
+class WorkoutExerciseSerializer(CatalogExerciseMixin):
     sets = WorkoutSetSerializer(many=True, required=False)
-    exercise_name = serializers.CharField(source='exercise.name', read_only=True)
+    exercise_name = serializers.SerializerMethodField()
     
     class Meta:
         model = WorkoutExercise
         fields = "__all__"
-        read_only_fields = ('id',)
+        # El workout lo asigna el serializer padre al crear
+        read_only_fields = ('id', 'workout')
         
     def validate_sets(self, value):
         """Validar que los números de set sean únicos y consecutivos"""
@@ -84,18 +148,6 @@ class WorkoutExerciseSerializer(serializers.ModelSerializer):
             if sorted(set_numbers) != expected:
                 raise serializers.ValidationError("Set numbers must be consecutive starting from 1")
         return value
-        
-    def validate_target_sets(self, value):
-        """Validar que target_sets sea positivo"""
-        if value <= 0:
-            raise serializers.ValidationError("Target sets must be greater than 0")
-        return value
-        
-    def validate_target_reps(self, value):
-        """Validar que target_reps sea positivo"""
-        if value <= 0:
-            raise serializers.ValidationError("Target reps must be greater than 0")
-        return value
 
 
 class WorkoutSerializer(serializers.ModelSerializer):
@@ -104,7 +156,8 @@ class WorkoutSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Workout
-        fields = "__all__"
+        # updated_at es interno (ETag y sincronización)
+        exclude = ('updated_at',)
         read_only_fields = ('id', 'user')
         
     def get_exercise_count(self, obj):
@@ -125,6 +178,30 @@ class WorkoutSerializer(serializers.ModelSerializer):
         return value
 
 
+def create_workout_exercises(workout, exercises_data):
+    """
+    Crear los ejercicios y sets anidados de un workout.
+    
+    Cada nivel se inserta con un bulk_create, sin importar la cantidad de
+    ejercicios y sets. Devuelve las filas creadas como pares (tipo, id) para
+    el registro de cambios.
+    """
+    sets_data = [exercise_data.pop('sets', []) for exercise_data in exercises_data]
+    workout_exercises = WorkoutExercise.objects.bulk_create([
+        WorkoutExercise(workout=workout, **exercise_data)
+        for exercise_data in exercises_data
+    ])
+    workout_sets = WorkoutSet.objects.bulk_create([
+        WorkoutSet(workout_exercise=workout_exercise, **set_data)
+        for workout_exercise, items in zip(workout_exercises, sets_data)
+        for set_data in items
+    ])
+    
+    created = [(WorkoutChange.WORKOUT_EXERCISE, item.pk) for item in workout_exercises]
+    created += [(WorkoutChange.WORKOUT_SET, item.pk) for item in workout_sets]
+    return created
+
+
 # Serializers adicionales para casos específicos
 class WorkoutCreateSerializer(serializers.ModelSerializer):
     """Serializer para crear workouts con ejercicios y sets anidados"""
@@ -142,13 +219,16 @@ class WorkoutCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Exercise orders must be unique")
         return value
         
+    def to_representation(self, instance):
+        """Precargar el árbol escrito: la respuesta no hace una consulta por ejercicio"""
+        prefetch_related_objects([instance], 'workout_exercises__sets')
+        return super().to_representation(instance)
+        
     def create(self, validated_data):
         """Crear workout con ejercicios y sets anidados"""
-        from django.db import transaction
-        
         workout_exercises_data = validated_data.pop('workout_exercises', [])
         
-        with transaction.atomic():
+        with shard_atomic():
             # Crear el workout base
             workout = Workout.objects.create(
                 user=self.context['request'].user,
@@ -156,21 +236,15 @@ class WorkoutCreateSerializer(serializers.ModelSerializer):
             )
             
             # Crear ejercicios y sets
-            for exercise_data in workout_exercises_data:
-                sets_data = exercise_data.pop('sets', [])
-                
-                workout_exercise = WorkoutExercise.objects.create(
-                    workout=workout,
-                    **exercise_data
-                )
-                
-                # Crear sets para este ejercicio
-                for set_data in sets_data:
-                    WorkoutSet.objects.create(
-                        workout_exercise=workout_exercise,
-                        **set_data
-                    )
+            exercise_ids = {item['exercise'].pk for item in workout_exercises_data}
+            created = create_workout_exercises(workout, workout_exercises_data)
             
+            record_workout_change(
+                workout.user_id,
+                upserted=[(WorkoutChange.WORKOUT, workout.pk), *created],
+                dates=[workout.date],
+                exercise_ids=exercise_ids,
+            )
             return workout
 
 
@@ -190,6 +264,11 @@ class WorkoutUpdateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Exercise orders must be unique")
         return value
         
+    def to_representation(self, instance):
+        """Precargar el árbol escrito: la respuesta no hace una consulta por ejercicio"""
+        prefetch_related_objects([instance], 'workout_exercises__sets')
+        return super().to_representation(instance)
+        
     def validate_date(self, value):
         """Validar que la fecha no sea futura"""
         from django.utils import timezone
@@ -205,40 +284,128 @@ class WorkoutUpdateSerializer(serializers.ModelSerializer):
         
     def update(self, instance, validated_data):
         """Actualizar workout con manejo inteligente de ejercicios"""
-        from django.db import transaction
-        
         workout_exercises_data = validated_data.pop('workout_exercises', None)
         
-        with transaction.atomic():
+        with shard_atomic():
+            previous_date = instance.date
+            exercise_ids = set(
+                instance.workout_exercises.values_list('exercise_id', flat=True)
+            )
             # Actualizar campos básicos del workout
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
             instance.save()
             
+            upserted = [(WorkoutChange.WORKOUT, instance.pk)]
+            deleted = []
             # Manejo inteligente de ejercicios
             if workout_exercises_data is not None:
-                self._update_workout_exercises(instance, workout_exercises_data)
+                exercise_ids.update(item['exercise'].pk for item in workout_exercises_data)
+                deleted, created = self._update_workout_exercises(
+                    instance, workout_exercises_data
+                )
+                upserted += created
             
+            record_workout_change(
+                instance.user_id,
+                upserted=upserted,
+                deleted=deleted,
+                dates={previous_date, instance.date},
+                exercise_ids=exercise_ids,
+            )
             return instance
     
     def _update_workout_exercises(self, workout, exercises_data):
-        """Actualizar ejercicios de manera inteligente"""
+        """
+        Actualizar ejercicios de manera inteligente.
+        
+        Devuelve (filas eliminadas, filas creadas) como pares (tipo, id).
+        """
         # Estrategia: reemplazar completamente (más simple y consistente)
+        deleted = workout_tree([workout.pk], include_workouts=False)
         workout.workout_exercises.all().delete()
         
-        for exercise_data in exercises_data:
-            sets_data = exercise_data.pop('sets', [])
-            
-            workout_exercise = WorkoutExercise.objects.create(
-                workout=workout,
-                **exercise_data
+        return deleted, create_workout_exercises(workout, exercises_data)
+
+
+class WorkoutCloneSerializer(serializers.Serializer):
+    """
+    Copia de un workout (context['workout']) con sus ejercicios y, si se pide,
+    sus sets.
+    
+    Cada nivel del árbol se lee con una consulta y se inserta con un
+    bulk_create, sin importar la cantidad de ejercicios y sets.
+    """
+    date = serializers.DateField(required=False)
+    include_sets = serializers.BooleanField(default=True)
+    
+    def validate_date(self, value):
+        """Validar que la fecha no sea futura"""
+        from django.utils import timezone
+        if value > timezone.now().date():
+            raise serializers.ValidationError("Workout date cannot be in the future")
+        return value
+    
+    def create(self, validated_data):
+        from django.utils import timezone
+        
+        source = self.context['workout']
+        with shard_atomic():
+            workout = Workout.objects.create(
+                user_id=source.user_id,
+                date=validated_data.get('date') or timezone.now().date(),
+                notes=source.notes,
+                duration_min=source.duration_min,
             )
             
-            for set_data in sets_data:
-                WorkoutSet.objects.create(
-                    workout_exercise=workout_exercise,
-                    **set_data
+            rows = list(
+                WorkoutExercise.objects.filter(workout=source)
+                .order_by('order', 'id')
+                .values_list('id', 'exercise_id', 'order', 'target_sets', 'target_reps')
+            )
+            created = WorkoutExercise.objects.bulk_create([
+                WorkoutExercise(
+                    workout=workout,
+                    exercise_id=exercise_id,
+                    order=order,
+                    target_sets=target_sets,
+                    target_reps=target_reps,
                 )
+                for _, exercise_id, order, target_sets, target_reps in rows
+            ])
+            upserted = [(WorkoutChange.WORKOUT, workout.pk)]
+            upserted += [(WorkoutChange.WORKOUT_EXERCISE, item.pk) for item in created]
+            
+            if validated_data['include_sets'] and created:
+                # id original del ejercicio → id de la copia
+                mapping = {row[0]: item.pk for row, item in zip(rows, created)}
+                sets = WorkoutSet.objects.bulk_create([
+                    WorkoutSet(
+                        workout_exercise_id=mapping[workout_exercise_id],
+                        set_number=set_number,
+                        reps_completed=reps_completed,
+                        weight_kg=weight_kg,
+                        rpe=rpe,
+                        rest_sec=rest_sec,
+                    )
+                    for workout_exercise_id, set_number, reps_completed, weight_kg, rpe, rest_sec in (
+                        WorkoutSet.objects.filter(workout_exercise__workout=source)
+                        .order_by('workout_exercise_id', 'set_number')
+                        .values_list(
+                            'workout_exercise_id', 'set_number', 'reps_completed',
+                            'weight_kg', 'rpe', 'rest_sec',
+                        )
+                    )
+                ])
+                upserted += [(WorkoutChange.WORKOUT_SET, item.pk) for item in sets]
+            
+            record_workout_change(
+                workout.user_id,
+                upserted=upserted,
+                dates=[workout.date],
+                exercise_ids={row[1] for row in rows},
+            )
+            return workout
 
 
 class WorkoutDetailSerializer(serializers.ModelSerializer):
@@ -248,4 +415,113 @@ class WorkoutDetailSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Workout
-        fields = "__all__"
+        exclude = ('updated_at',)
+
+
+class ArchivedWorkoutSerializer(serializers.ModelSerializer):
+    """
+    Workout archivado en el listado, sin notas ni ejercicios: pedir su
+    detalle lo devuelve a las tablas (ver fitness/archive.py)
+    """
+    archived = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedWorkout
+        fields = ['id', 'date', 'duration_min', 'user', 'archived']
+        
+    def get_archived(self, obj):
+        return True
+
+
+# Serializers planos para la sincronización delta
+class WorkoutSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Workout
+        fields = ['id', 'date', 'notes', 'duration_min', 'updated_at']
+
+
+class WorkoutExerciseSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WorkoutExercise
+        fields = ['id', 'workout', 'exercise', 'order', 'target_sets', 'target_reps']
+
+
+class WorkoutSetSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WorkoutSet
+        fields = [
+            'id', 'workout_exercise', 'set_number', 'reps_completed',
+            'weight_kg', 'rpe', 'rest_sec',
+        ]
+
+
+# Planes de entrenamiento
+class PlanExerciseSerializer(CatalogExerciseMixin):
+    exercise_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = PlanExercise
+        fields = ['id', 'weekday', 'exercise', 'exercise_name', 'order', 'target_sets', 'target_reps']
+        read_only_fields = ('id',)
+
+
+class PlanTemplateSerializer(serializers.ModelSerializer):
+    """Plan con sus ejercicios por día de la semana; al escribir se reemplazan todos"""
+    exercises = PlanExerciseSerializer(many=True, required=False)
+    
+    class Meta:
+        model = PlanTemplate
+        fields = [
+            'id', 'name', 'start_date', 'end_date', 'interval_weeks', 'created_at',
+            'exercises',
+        ]
+        read_only_fields = ('id', 'created_at')
+    
+    def validate_interval_weeks(self, value):
+        """Validar que el intervalo sea de al menos una semana"""
+        if value < 1:
+            raise serializers.ValidationError("Interval must be at least 1 week")
+        return value
+    
+    def validate_exercises(self, value):
+        """Validar que los órdenes sean únicos dentro de cada día"""
+        keys = [(item['weekday'], item['order']) for item in value]
+        if len(keys) != len(set(keys)):
+            raise serializers.ValidationError("Exercise orders must be unique per weekday")
+        return value
+    
+    def validate(self, data):
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': ["End date must be after start date"]})
+        return data
+    
+    def create(self, validated_data):
+        from django.db import transaction
+        
+        exercises_data = validated_data.pop('exercises', [])
+        with transaction.atomic():
+            template = PlanTemplate.objects.create(
+                user=self.context['request'].user, **validated_data
+            )
+            self._create_exercises(template, exercises_data)
+        return template
+    
+    def update(self, instance, validated_data):
+        from django.db import transaction
+        
+        exercises_data = validated_data.pop('exercises', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if exercises_data is not None:
+                instance.exercises.all().delete()
+                self._create_exercises(instance, exercises_data)
+        return instance
+    
+    def _create_exercises(self, template, exercises_data):
+        PlanExercise.objects.bulk_create(
+            PlanExercise(template=template, **item) for item in exercises_data
+        )
+        # Descartar el prefetch previo para serializar los ejercicios nuevos
+        getattr(template, '_prefetched_objects_cache', {}).pop('exercises', None)
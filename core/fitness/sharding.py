@@ -0,0 +1,228 @@
+"""
+Reparto de los workouts de los usuarios entre shards (ver fitness/routers.py).
+
+- Cada usuario nuevo se ubica en un shard (id % cantidad de shards) y la
+  asignación se guarda en UserShard, en la base por defecto. Los usuarios sin
+  fila (anteriores al sharding) viven en el primer shard.
+- Las vistas con UserShardMixin activan el shard del usuario autenticado
+  durante el request; las escrituras usan shard_atomic para abrir la
+  transacción en el shard y en la base por defecto (registro de cambios,
+  versiones, agregados).
+- Cada shard reserva su propio rango de ids para los workouts, ejercicios y
+  sets, según su bloque en FITNESS_SHARD_ID_BLOCKS (reserve_id_range), así
+  los ids siguen siendo únicos entre shards y un usuario se puede mover
+  conservándolos (move_user, comando `rebalance_shards`).
+
+Con un solo shard (FITNESS_SHARDS por defecto) nada de esto agrega consultas.
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import UserShard, Workout, WorkoutExercise, WorkoutSet
+from .routers import activate_shard, current_shard, deactivate_shard, get_shards, is_sharded
+from .search import get_notes_search
+
+SHARDED_MODELS = (Workout, WorkoutExercise, WorkoutSet)
+
+# Ids reservados por shard: el de bloque N (FITNESS_SHARD_ID_BLOCKS) empieza en N * ID_RANGE
+ID_RANGE = 10 ** 12
+
+
+def shard_for_user(user_id):
+    """Alias del shard con los workouts del usuario (sin consultas si hay uno solo)"""
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+    alias = UserShard.objects.filter(user_id=user_id).values_list('alias', flat=True).first()
+    return alias or shards[0]
+
+
+def shards_for_users(user_ids):
+    """{alias: [ids de usuario]} de los usuarios indicados"""
+    user_ids = list(user_ids)
+    shards = get_shards()
+    if len(shards) == 1:
+        return {shards[0]: user_ids} if user_ids else {}
+    placed = dict(
+        UserShard.objects.filter(user_id__in=user_ids).values_list('user_id', 'alias')
+    )
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(placed.get(user_id, shards[0]), []).append(user_id)
+    return groups
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def place_user(sender, instance, created, raw=False, **kwargs):
+    """Ubicar a los usuarios nuevos, repartidos por id entre los shards"""
+    if not created or raw or not is_sharded():
+        return
+    shards = get_shards()
+    UserShard.objects.get_or_create(
+        user_id=instance.pk, defaults={'alias': shards[instance.pk % len(shards)]}
+    )
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_workouts(sender, instance, **kwargs):
+    """
+    Borrar los workouts del usuario (con ejercicios, sets y notas indexadas)
+    en todos los shards: Workout.user no tiene restricción de clave foránea,
+    así que la cascada del usuario no llega a los otros shards ni al índice.
+    """
+    for alias in get_shards():
+        _delete_workouts(instance.pk, alias)
+
+
+def _delete_workouts(user_id, alias):
+    """Borrar los workouts del usuario en un shard, con sus notas indexadas"""
+    workouts = Workout.objects.using(alias).filter(user_id=user_id)
+    with transaction.atomic(using=alias):
+        workout_ids = list(workouts.values_list('id', flat=True))
+        if workout_ids:
+            workouts.delete()
+            get_notes_search(alias).remove(workout_ids)
+
+
+@contextmanager
+def shard_atomic(alias=None):
+    """
+    transaction.atomic en la base por defecto y en el shard (por defecto el
+    actual). No es un commit en dos fases: el shard confirma primero.
+    """
+    alias = alias or current_shard()
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        if alias == DEFAULT_DB_ALIAS:
+            yield
+        else:
+            with transaction.atomic(using=alias):
+                yield
+
+
+class UserShardMixin:
+    """Activa el shard del usuario autenticado durante el request (vistas DRF)"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self._shard_token = activate_shard(shard_for_user(request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            deactivate_shard(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def move_user(user_id, target):
+    """
+    Mover los workouts del usuario (con ejercicios, sets y notas indexadas)
+    a otro shard, conservando los ids. Devuelve la cantidad de workouts
+    movidos.
+
+    No hay transacciones entre bases: cada paso confirma en una sola. Se
+    marca la mudanza (UserShard.pending_alias = destino), se copia al
+    destino, se cambia el shard del usuario (pending_alias = origen), se
+    borra el origen y se quita la marca. Si se interrumpe, el shard marcado
+    tiene una copia que no vale: la próxima mudanza del usuario (o
+    recover_moves) la borra antes de seguir.
+
+    Los requests del usuario que ya resolvieron el shard anterior pueden
+    escribir en él mientras tanto: conviene mover usuarios sin actividad.
+    """
+    if target not in get_shards():
+        raise ValueError(f'Unknown shard: {target}')
+    recover_move(user_id)
+    source = shard_for_user(user_id)
+    if source == target:
+        return 0
+
+    UserShard.objects.update_or_create(
+        user_id=user_id, defaults={'alias': source, 'pending_alias': target}
+    )
+    querysets = (
+        Workout.objects.using(source).filter(user_id=user_id),
+        WorkoutExercise.objects.using(source).filter(workout__user_id=user_id),
+        WorkoutSet.objects.using(source).filter(workout_exercise__workout__user_id=user_id),
+    )
+    with transaction.atomic(using=target):
+        workout_ids = list(querysets[0].values_list('id', flat=True))
+        for queryset in querysets:
+            queryset.model.objects.using(target).bulk_create(
+                list(queryset.order_by('pk')), batch_size=500
+            )
+        get_notes_search(target).index(workout_ids)
+    UserShard.objects.filter(user_id=user_id).update(alias=target, pending_alias=source)
+    _delete_workouts(user_id, source)
+    UserShard.objects.filter(user_id=user_id).update(pending_alias=None)
+    return len(workout_ids)
+
+
+def recover_move(user_id):
+    """
+    Borrar la copia que dejó una mudanza interrumpida del usuario. Devuelve
+    True si había una.
+    """
+    pending = (
+        UserShard.objects.filter(user_id=user_id, pending_alias__isnull=False)
+        .values_list('pending_alias', flat=True)
+        .first()
+    )
+    if pending is None:
+        return False
+    _delete_workouts(user_id, pending)
+    UserShard.objects.filter(user_id=user_id).update(pending_alias=None)
+    return True
+
+
+def recover_moves():
+    """Recuperar todas las mudanzas interrumpidas; devuelve cuántas había"""
+    user_ids = list(
+        UserShard.objects.filter(pending_alias__isnull=False).values_list('user_id', flat=True)
+    )
+    for user_id in user_ids:
+        recover_move(user_id)
+    return len(user_ids)
+
+
+def reserve_id_range(alias):
+    """
+    Llevar las secuencias de ids de los modelos con shard al inicio del rango
+    del bloque del alias, si todavía no llegaron. Se llama después de cada
+    migrate; las bases sin bloque no tienen esas tablas.
+    """
+    start = settings.FITNESS_SHARD_ID_BLOCKS.get(alias, 0) * ID_RANGE
+    if not start:
+        return
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in SHARDED_MODELS:
+            table = model._meta.db_table
+            if connection.vendor == 'sqlite':
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute(
+                        'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start]
+                    )
+                elif row[0] < start:
+                    cursor.execute(
+                        'UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table]
+                    )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {table})))",
+                    [table, start],
+                )
+
+
+def reserve_id_ranges(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Receptor de post_migrate (ver FitnessConfig.ready)"""
+    reserve_id_range(using)
@@ -1,3 +1,2267 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import benchmark
+from .catalog import get_catalog
+from .changes import record_workout_change, workout_tree
+from .models import Exercise, PlanTemplate, Workout, WorkoutSet
+
+User = get_user_model()
+
+
+@override_settings(FITNESS_THROTTLE_STORE=None)
+class SeedAndBenchmarkTests(TestCase):
+    def test_seed_and_benchmark(self):
+        call_command(
+            "seed_fitness_data", users=2, years=0.1, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 2)
+        self.assertTrue(Exercise.objects.exists())
+        self.assertTrue(WorkoutSet.objects.exists())
+
+        user = User.objects.filter(workout__isnull=False).first()
+        results = benchmark.run_benchmarks(
+            user, iterations=2, warmup=0, host="testserver"
+        )
+        self.assertIn("workout-create", results)
+        for metrics in results.values():
+            self.assertGreater(metrics["queries"], 0)
+            self.assertLessEqual(metrics["p50_ms"], metrics["p95_ms"])
+
+        # Las escrituras del benchmark se revierten
+        self.assertFalse(Workout.objects.filter(notes="Benchmark").exists())
+
+
+class QueryCase:
+    """
+    Un request a verificar: nombre de la ruta, método y constructores de los
+    kwargs de la URL y del payload a partir de los datos sembrados.
+    """
+
+    def __init__(
+        self, route, method="GET", kwargs=None, data=None, query=None, auth=True
+    ):
+        self.route = route
+        self.method = method
+        self.kwargs = kwargs or (lambda seed: {})
+        self.data = data or (lambda seed: None)
+        self.query = query or (lambda seed: "")
+        self.auth = auth
+
+    def __str__(self):
+        return f"{self.method} {self.route}"
+
+
+def _workout_payload(seed):
+    """Workout de `size` ejercicios con `size` sets, como los sembrados"""
+    return {
+        "date": "2025-01-10",
+        "duration_min": 45,
+        "workout_exercises": [
+            {
+                "exercise": exercise.pk,
+                "order": order,
+                "target_sets": seed["size"],
+                "target_reps": 5,
+                "sets": [
+                    {"set_number": number, "reps_completed": 5, "weight_kg": "80.00"}
+                    for number in range(1, seed["size"] + 1)
+                ],
+            }
+            for order, exercise in enumerate(seed["exercises"], start=1)
+        ],
+    }
+
+
+def _plan_payload(seed):
+    return {
+        "name": "Push/Pull",
+        "start_date": "2025-01-06",
+        "exercises": [
+            {
+                "weekday": weekday,
+                "exercise": seed["exercise"].pk,
+                "order": 1,
+                "target_sets": 3,
+                "target_reps": 8,
+            }
+            for weekday in (0, 3)
+        ],
+    }
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    FITNESS_THROTTLE_STORE=None,
+)
+class QueryCountTests(TestCase):
+    """
+    Verifica que cada endpoint ejecute el mismo número de consultas con dos
+    tamaños de datos distintos (O(1) respecto al tamaño del resultado).
+
+    Toda ruta nueva en fitness/urls.py o accounts/urls.py debe declararse en
+    CASES; test_all_routes_are_covered falla si falta alguna.
+    """
+
+    SIZES = (2, 5)
+    PASSWORD = "StrongPass123!"
+
+    CASES = [
+        # accounts
+        QueryCase(
+            "register",
+            "POST",
+            data=lambda seed: {
+                "username": "newuser",
+                "email": "new@test.com",
+                "password": QueryCountTests.PASSWORD,
+            },
+            auth=False,
+        ),
+        QueryCase(
+            "login",
+            "POST",
+            data=lambda seed: {
+                "email": seed["user"].email,
+                "password": QueryCountTests.PASSWORD,
+            },
+            auth=False,
+        ),
+        QueryCase("refresh", "POST", data=lambda seed: {"refresh": seed["refresh"]}),
+        QueryCase("me"),
+        QueryCase("coach-list"),
+        QueryCase(
+            "coach-list",
+            "POST",
+            data=lambda seed: {"coach_email": "athlete0@test.com"},
+        ),
+        QueryCase(
+            "coach-detail", "DELETE", kwargs=lambda seed: {"pk": seed["coach_link"].pk}
+        ),
+        # exercises
+        QueryCase("exercise-list", auth=False),
+        QueryCase(
+            "exercise-detail",
+            kwargs=lambda seed: {"pk": seed["exercise"].pk},
+            auth=False,
+        ),
+        QueryCase(
+            "exercise-next-target", kwargs=lambda seed: {"pk": seed["exercise"].pk}
+        ),
+        # Más sesiones que las del seed: con los dos tamaños la historia
+        # también se busca en los workouts archivados
+        QueryCase(
+            "exercise-history",
+            kwargs=lambda seed: {"pk": seed["exercise"].pk},
+            query=lambda seed: "?limit=10",
+        ),
+        QueryCase(
+            "exercise-history-batch",
+            query=lambda seed: f"?exercise_ids={seed['exercise'].pk}&last=10",
+        ),
+        # workouts
+        QueryCase("workout-list"),
+        QueryCase("workout-list", query=lambda seed: "?q=pecho"),
+        QueryCase("workout-list", "POST", data=_workout_payload),
+        QueryCase("workout-detail", kwargs=lambda seed: {"pk": seed["workout"].pk}),
+        QueryCase(
+            "workout-detail",
+            "PATCH",
+            kwargs=lambda seed: {"pk": seed["workout"].pk},
+            data=_workout_payload,
+        ),
+        QueryCase(
+            "workout-detail", "DELETE", kwargs=lambda seed: {"pk": seed["workout"].pk}
+        ),
+        QueryCase(
+            "workout-clone",
+            "POST",
+            kwargs=lambda seed: {"pk": seed["workout"].pk},
+            data=lambda seed: {},
+        ),
+        # plans
+        QueryCase("plan-list"),
+        QueryCase("plan-list", "POST", data=_plan_payload),
+        QueryCase("plan-detail", kwargs=lambda seed: {"pk": seed["plan"].pk}),
+        QueryCase(
+            "plan-detail",
+            "PUT",
+            kwargs=lambda seed: {"pk": seed["plan"].pk},
+            data=_plan_payload,
+        ),
+        QueryCase(
+            "plan-detail", "DELETE", kwargs=lambda seed: {"pk": seed["plan"].pk}
+        ),
+        QueryCase("plan-calendar", query=lambda seed: "?date_from=2025-01-01&date_to=2025-12-31"),
+        # sync
+        QueryCase("sync"),
+        QueryCase("sync", query=lambda seed: "?since=1"),
+        # stats
+        QueryCase("stats-volume"),
+        QueryCase("stats-top-sets"),
+        QueryCase("stats-1rm", query=lambda seed: f"?exercise_id={seed['exercise'].pk}"),
+        QueryCase("stats-consistency"),
+        QueryCase("stats-muscles"),
+        QueryCase("stats-buckets", query=lambda seed: "?bucket=day"),
+        QueryCase("stats-calendar"),
+        # coach
+        QueryCase("coach-athletes", query=lambda seed: "?page_size=10"),
+        # leaderboards
+        QueryCase("leaderboard", kwargs=lambda seed: {"metric": "volume"}),
+        QueryCase(
+            "leaderboard",
+            kwargs=lambda seed: {"metric": "e1rm"},
+            query=lambda seed: f"?exercise_id={seed['exercise'].pk}&offset=1",
+        ),
+    ]
+
+    def test_all_routes_are_covered(self):
+        from accounts.urls import urlpatterns as account_urls
+        from fitness.urls import urlpatterns as fitness_urls
+
+        declared = {case.route for case in self.CASES}
+        missing = [
+            pattern.name
+            for pattern in [*account_urls, *fitness_urls]
+            if pattern.name not in declared
+        ]
+        self.assertEqual(missing, [], "Rutas sin QueryCase declarado")
+
+    def test_query_count_is_constant(self):
+        for case in self.CASES:
+            with self.subTest(case=str(case)):
+                small, large = (self._capture(case, size) for size in self.SIZES)
+                if len(small) != len(large):
+                    self.fail(self._report(case, small, large))
+
+    def _seed(self, size):
+        """Usuario con `size` workouts de `size` ejercicios con `size` sets"""
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        today = timezone.now().date()
+        user = User.objects.create_user(
+            username="harness", email="harness@test.com", password=self.PASSWORD
+        )
+        exercises = [
+            Exercise.objects.create(
+                name=f"Exercise {i}",
+                primary_muscle="chest",
+                equipment="barbell",
+                difficulty="medium",
+            )
+            for i in range(size)
+        ]
+        workouts = []
+        for day in range(size):
+            workout = Workout.objects.create(
+                user=user,
+                date=today - timedelta(days=day),
+                duration_min=60,
+                notes="Sesión de pecho",
+            )
+            for order, exercise in enumerate(exercises, start=1):
+                workout_exercise = workout.workout_exercises.create(
+                    exercise=exercise, order=order, target_sets=size, target_reps=5
+                )
+                for number in range(1, size + 1):
+                    workout_exercise.sets.create(
+                        set_number=number, reps_completed=5, weight_kg="50.00"
+                    )
+            workouts.append(workout)
+        record_workout_change(
+            user.pk,
+            upserted=workout_tree(workout.pk for workout in workouts),
+            dates=[workout.date for workout in workouts],
+        )
+        for i in range(size):
+            plan = PlanTemplate.objects.create(
+                user=user, name=f"Plan {i}", start_date=today - timedelta(days=365)
+            )
+            for weekday in range(size):
+                for order, exercise in enumerate(exercises, start=1):
+                    plan.exercises.create(
+                        weekday=weekday,
+                        exercise=exercise,
+                        order=order,
+                        target_sets=3,
+                        target_reps=5,
+                    )
+        from accounts.models import CoachAthlete
+
+        for i in range(size):
+            athlete = User.objects.create_user(
+                username=f"athlete{i}", email=f"athlete{i}@test.com", password="x"
+            )
+            CoachAthlete.objects.create(coach=user, athlete=athlete)
+            for day in range(size):
+                workout = Workout.objects.create(
+                    user=athlete, date=today - timedelta(days=day), duration_min=30
+                )
+                workout.workout_exercises.create(
+                    exercise=exercises[0], order=1, target_sets=1, target_reps=5
+                ).sets.create(set_number=1, reps_completed=5, weight_kg="40.00")
+        coach = User.objects.create_user(
+            username="coach", email="coach@test.com", password="x"
+        )
+        coach_link = CoachAthlete.objects.create(coach=coach, athlete=user)
+        return {
+            "size": size,
+            "user": user,
+            "coach_link": coach_link,
+            "exercise": exercises[0],
+            "exercises": exercises,
+            "workout": workouts[0],
+            "plan": plan,
+            "refresh": str(RefreshToken.for_user(user)),
+        }
+
+    def _capture(self, case, size):
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+        from django.urls import reverse
+
+        with transaction.atomic():
+            seed = self._seed(size)
+            self.client.logout()
+            if case.auth:
+                self.client.force_login(seed["user"])
+            url = reverse(case.route, kwargs=case.kwargs(seed)) + case.query(seed)
+            data = case.data(seed)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.generic(
+                    case.method,
+                    url,
+                    json.dumps(data) if data is not None else "",
+                    content_type="application/json",
+                )
+            self.assertLess(
+                response.status_code, 400, f"{case} -> {response.content[:300]!r}"
+            )
+            transaction.set_rollback(True)
+        return [query["sql"] for query in ctx.captured_queries]
+
+    def _report(self, case, small, large):
+        import difflib
+
+        diff = "\n".join(
+            difflib.unified_diff(
+                small,
+                large,
+                fromfile=f"size={self.SIZES[0]}",
+                tofile=f"size={self.SIZES[1]}",
+                lineterm="",
+            )
+        )
+        return (
+            f"{case}: {len(small)} consultas con size={self.SIZES[0]} y "
+            f"{len(large)} con size={self.SIZES[1]}\n{diff}"
+        )
+
+
+@override_settings(FITNESS_THROTTLE_STORE=None)
+class StatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="stats", email="stats@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.bench = Exercise.objects.create(
+            name="Bench Press",
+            primary_muscle="chest",
+            equipment="barbell",
+            difficulty="medium",
+        )
+        self.today = timezone.now().date()
+        # Hoy: 2 × 5 × 100 kg; hace 2 días: 1 × 10 × 80 kg
+        self._workout(self.today, [(5, "100.00"), (5, "100.00")])
+        self._workout(self.today - timedelta(days=2), [(10, "80.00")])
+
+    def _workout(self, date, sets):
+        workout = Workout.objects.create(user=self.user, date=date, duration_min=60)
+        workout_exercise = workout.workout_exercises.create(
+            exercise=self.bench, order=1, target_sets=len(sets), target_reps=5
+        )
+        for number, (reps, weight) in enumerate(sets, start=1):
+            workout_exercise.sets.create(
+                set_number=number, reps_completed=reps, weight_kg=weight
+            )
+        return workout
+
+    def test_volume(self):
+        response = self.client.get("/api/stats/volume/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_volume"], "1800.00")
+        self.assertEqual(response.data["workout_count"], 2)
+        self.assertEqual(
+            [row["volume"] for row in response.data["daily_volumes"]],
+            ["1000.00", "800.00"],
+        )
+
+    def test_volume_rejects_long_ranges(self):
+        response = self.client.get("/api/stats/volume/?date_from=2020-01-01")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.data)
+
+    def test_top_sets_and_1rm(self):
+        response = self.client.get("/api/stats/top-sets/?limit=1")
+        self.assertEqual(response.data["top_sets"][0]["volume"], "800.00")
+        self.assertEqual(response.data["top_sets"][0]["estimated_1rm"], "106.67")
+
+        self.assertEqual(self.client.get("/api/stats/1rm/").status_code, 400)
+        response = self.client.get(f"/api/stats/1rm/?exercise_id={self.bench.pk}")
+        self.assertEqual(response.data["current_estimated_1rm"], "116.67")
+        self.assertEqual(response.data["improvement"], "10.00")
+        self.assertEqual(len(response.data["data_points"]), 2)
+
+    @override_settings(FITNESS_SECONDARY_MUSCLE_WEIGHT=0.25)
+    def test_muscle_volume(self):
+        self.bench.secondary_muscles = ["arms", "shoulders", "unknown"]
+        self.bench.save()
+        response = self.client.get("/api/stats/muscles/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["secondary_weight"], "0.25")
+        self.assertEqual(
+            response.data["total_volumes"],
+            {
+                "chest": "1800.00",
+                "back": "0.00",
+                "legs": "0.00",
+                "arms": "450.00",
+                "shoulders": "450.00",
+            },
+        )
+        weeks = response.data["weekly_volumes"]
+        self.assertEqual(weeks[0]["week_start"].weekday(), 0)
+        self.assertEqual(
+            sum(float(week["volumes"]["chest"]) for week in weeks), 1800.0
+        )
+
+    def test_buckets_are_stored_when_closed_and_invalidated_on_write(self):
+        from .models import StatsBucket
+
+        url = "/api/stats/buckets/?bucket=day&date_from={}".format(
+            self.today - timedelta(days=3)
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row["volume"], row["set_count"], row["workout_count"]) for row in response.data["buckets"]],
+            [("0.00", 0, 0), ("800.00", 1, 1), ("0.00", 0, 0), ("1000.00", 2, 1)],
+        )
+        # Los 3 días cerrados se guardan; hoy se recalcula siempre
+        self.assertEqual(StatsBucket.objects.filter(user=self.user).count(), 3)
+        with self.assertNumQueries(6):  # sesión, usuario, guardados y 3 agregados de hoy
+            self.client.get(url)
+
+        past = Workout.objects.get(user=self.user, date=self.today - timedelta(days=2))
+        response = self.client.patch(
+            f"/api/workouts/{past.pk}/",
+            {"date": str(self.today - timedelta(days=3))},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(
+            [row["volume"] for row in response.data["buckets"]],
+            ["800.00", "0.00", "0.00", "1000.00"],
+        )
+
+        self.client.delete(f"/api/workouts/{past.pk}/")
+        response = self.client.get("/api/stats/buckets/?bucket=year")
+        self.assertEqual(response.data["buckets"][-1]["volume"], "1000.00")
+
+    def test_write_hooks_run_a_fixed_number_of_statements(self):
+        # Primera escritura: construye el resumen y el año de actividad
+        workouts = list(Workout.objects.filter(user=self.user))
+        record_workout_change(
+            self.user.pk,
+            upserted=workout_tree(workout.pk for workout in workouts),
+            dates=[workout.date for workout in workouts],
+            exercise_ids=[self.bench.pk],
+        )
+        for size in (1, 10):
+            workout = self._workout(self.today, [(5, "100.00")] * size)
+            tree = workout_tree([workout.pk])
+            # Cambios, semanas escritas (shard y archivo), períodos, resumen
+            # (leído y guardado), rankings, actividad e índice de notas
+            # (dos cada uno) y versión, sin importar la cantidad de sets
+            with self.assertNumQueries(13):
+                record_workout_change(
+                    self.user.pk,
+                    upserted=tree,
+                    dates=[workout.date],
+                    exercise_ids=[self.bench.pk],
+                )
+        response = self.client.get(f"/api/stats/calendar/?year={self.today.year}")
+        days = {row["date"]: row for row in response.data["days"]}
+        self.assertEqual((days[self.today]["workouts"], days[self.today]["volume"]), (3, 6500))
+
+    def test_buckets_validation(self):
+        self.assertEqual(self.client.get("/api/stats/buckets/?bucket=hour").status_code, 400)
+        response = self.client.get("/api/stats/buckets/?bucket=day&date_from=2000-01-01")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            "/api/stats/buckets/?bucket=day&date_from=0001-01-01&date_to=9998-11-30"
+        )
+        self.assertEqual(response.status_code, 400)
+        for bucket in ("day", "year"):
+            response = self.client.get(
+                f"/api/stats/buckets/?bucket={bucket}&date_from=9998-12-01&date_to=9999-12-31"
+            )
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            "/api/stats/buckets/?bucket=month&date_from=9998-01-01&date_to=9998-12-31"
+        )
+        self.assertEqual(len(response.data["buckets"]), 12)
+        self.assertEqual(response.data["buckets"][-1]["end"], date(9998, 12, 31))
+        response = self.client.get("/api/stats/buckets/?bucket=year&date_to=0001-02-01")
+        self.assertEqual(len(response.data["buckets"]), 1)
+
+    def test_bucket_count_matches_bucket_starts(self):
+        from .buckets import GRANULARITIES, bucket_count, bucket_starts
+
+        for granularity in GRANULARITIES:
+            for date_from, date_to in [
+                (date(2023, 12, 31), date(2025, 1, 1)),
+                (date(2024, 2, 29), date(2024, 2, 29)),
+                (date(2024, 1, 7), date(2024, 3, 4)),
+            ]:
+                self.assertEqual(
+                    bucket_count(date_from, date_to, granularity),
+                    len(bucket_starts(date_from, date_to, granularity)),
+                )
+
+    def test_activity_calendar_is_kept_by_writes(self):
+        from .models import ActivityYear
+
+        # Historial previo: el año se construye en la primera lectura
+        response = self.client.get(f"/api/stats/calendar/?year={self.today.year}")
+        self.assertEqual(response.status_code, 200)
+        days = {row["date"]: row for row in response.data["days"]}
+        self.assertEqual(days[self.today], {"date": self.today, "workouts": 1, "volume": 1000, "level": 4})
+        self.assertEqual(ActivityYear.objects.filter(user=self.user).count(), 1)
+
+        # Leer años sin actividad no guarda filas
+        for year in (1950, 9999):
+            response = self.client.get(f"/api/stats/calendar/?year={year}")
+            self.assertEqual(response.data["days"], [])
+        self.assertEqual(ActivityYear.objects.filter(user=self.user).count(), 1)
+
+        # Las escrituras actualizan el día; la lectura no consulta Workout
+        self._workout_via_api(self.today, "10.00")
+        with self.assertNumQueries(3):  # sesión, usuario y año
+            response = self.client.get(f"/api/stats/calendar/?year={self.today.year}")
+        days = {row["date"]: row for row in response.data["days"]}
+        self.assertEqual((days[self.today]["workouts"], days[self.today]["volume"]), (2, 1050))
+
+    def _workout_via_api(self, date, weight):
+        payload = {
+            "date": str(date),
+            "duration_min": 20,
+            "workout_exercises": [
+                {
+                    "exercise": self.bench.pk,
+                    "order": 1,
+                    "target_sets": 1,
+                    "target_reps": 5,
+                    "sets": [{"set_number": 1, "reps_completed": 5, "weight_kg": weight}],
+                }
+            ],
+        }
+        response = self.client.post("/api/workouts/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_consistency(self):
+        response = self.client.get("/api/stats/consistency/?days=7")
+        self.assertEqual(response.data["total_workouts"], 2)
+        self.assertEqual(response.data["active_days"], 2)
+        self.assertEqual(response.data["current_streak_days"], 1)
+        self.assertEqual(response.data["longest_streak_days"], 1)
+
+
+class ThrottlingTests(TestCase):
+    def test_file_store_is_shared_and_resets_per_window(self):
+        import tempfile
+        from pathlib import Path
+
+        from .throttling import FileCounterStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "throttle.counters"
+            # Dos instancias simulan dos procesos worker sobre el mismo archivo
+            first, second = FileCounterStore(path), FileCounterStore(path)
+            self.assertEqual(first.incr("k", 1, 60), 1)
+            self.assertEqual(second.incr("k", 1, 60), 2)
+            self.assertEqual(first.incr("k", 2, 60), 1)
+            self.assertEqual(second.incr("other", 2, 60), 1)
+
+    def test_file_store_reuses_expired_entries_when_bucket_is_full(self):
+        import tempfile
+        from pathlib import Path
+
+        from .throttling import FileCounterStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FileCounterStore(Path(tmp) / "throttle.counters", buckets=1)
+            for i in range(store.BUCKET_ENTRIES):
+                store.incr(f"old-{i}", 1, 60)
+            self.assertEqual(store.incr("new", 5, 60), 1)
+            self.assertEqual(store.incr("new", 5, 60), 2)
+
+    def test_file_store_never_evicts_live_entries(self):
+        import tempfile
+        from pathlib import Path
+
+        from .throttling import FileCounterStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FileCounterStore(Path(tmp) / "throttle.counters", buckets=1)
+            for i in range(store.BUCKET_ENTRIES):
+                store.incr(f"live-{i}", 1, 60)
+            # Grupo lleno de contadores vigentes: la clave nueva se cuenta aparte
+            self.assertEqual(store.incr("new", 1, 60), 1)
+            self.assertEqual(store.incr("new", 1, 60), 2)
+            for i in range(store.BUCKET_ENTRIES):
+                self.assertEqual(store.incr(f"live-{i}", 1, 60), 2)
+
+    @override_settings(
+        FITNESS_THROTTLE_STORE=None,
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"volume_stats": "2/min"},
+        },
+    )
+    def test_stats_endpoint_is_throttled(self):
+        user = User.objects.create_user(username="t", email="t@test.com", password="x")
+        self.client.force_login(user)
+        statuses = [self.client.get("/api/stats/volume/").status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="etag", email="etag@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.workout = Workout.objects.create(
+            user=self.user, date=timezone.now().date(), duration_min=30
+        )
+
+    def _assert_revalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Sesión, usuario y la consulta de versión
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_updated_at_stays_internal(self):
+        workout = self.client.get("/api/workouts/").json()[0]
+        self.assertEqual(
+            list(workout), ["id", "workout_exercises", "exercise_count", "date", "notes", "duration_min", "user"]
+        )
+        detail = self.client.get(f"/api/workouts/{self.workout.pk}/").json()
+        self.assertEqual(
+            list(detail), ["id", "workout_exercises", "user_username", "date", "notes", "duration_min", "user"]
+        )
+
+    def test_list_revalidates_after_create(self):
+        self._assert_revalidates(
+            "/api/workouts/",
+            lambda: self.client.post(
+                "/api/workouts/",
+                {"date": "2025-01-01", "duration_min": 20},
+                content_type="application/json",
+            ),
+        )
+
+    def test_list_revalidates_after_delete(self):
+        self._assert_revalidates(
+            "/api/workouts/",
+            lambda: self.client.delete(f"/api/workouts/{self.workout.pk}/"),
+        )
+
+    def test_detail_revalidates_after_update(self):
+        self._assert_revalidates(
+            f"/api/workouts/{self.workout.pk}/",
+            lambda: self.client.patch(
+                f"/api/workouts/{self.workout.pk}/",
+                {"notes": "editado"},
+                content_type="application/json",
+            ),
+        )
+
+    def test_etag_depends_on_query_params(self):
+        first = self.client.get("/api/workouts/")
+        second = self.client.get("/api/workouts/?ordering=date")
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="sync", email="sync@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.exercise = Exercise.objects.create(
+            name="Squat", primary_muscle="legs", equipment="barbell", difficulty="hard"
+        )
+
+    def _create(self):
+        response = self.client.post(
+            "/api/workouts/",
+            {
+                "date": "2025-03-01",
+                "duration_min": 40,
+                "workout_exercises": [
+                    {
+                        "exercise": self.exercise.pk,
+                        "order": 1,
+                        "target_sets": 1,
+                        "target_reps": 5,
+                        "sets": [{"set_number": 1, "reps_completed": 5}],
+                    }
+                ],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Workout.objects.latest("id")
+
+    def test_snapshot_then_deltas(self):
+        workout = self._create()
+        snapshot = self.client.get("/api/sync/").data
+        self.assertEqual(len(snapshot["workouts"]), 1)
+        self.assertEqual(len(snapshot["workout_sets"]), 1)
+        token = snapshot["token"]
+
+        # Sin cambios: respuesta vacía con el mismo token
+        delta = self.client.get(f"/api/sync/?since={token}").data
+        self.assertEqual(delta["token"], token)
+        self.assertEqual(delta["workouts"], [])
+
+        # Reemplazar los ejercicios genera tombstones de las filas anteriores
+        old_set = WorkoutSet.objects.get()
+        self.client.patch(
+            f"/api/workouts/{workout.pk}/",
+            {"notes": "editado", "workout_exercises": []},
+            content_type="application/json",
+        )
+        delta = self.client.get(f"/api/sync/?since={token}").data
+        self.assertEqual([w["notes"] for w in delta["workouts"]], ["editado"])
+        self.assertEqual(delta["deleted"]["workout_sets"], [old_set.pk])
+        token = delta["token"]
+
+        self.client.delete(f"/api/workouts/{workout.pk}/")
+        delta = self.client.get(f"/api/sync/?since={token}").data
+        self.assertEqual(delta["deleted"]["workouts"], [workout.pk])
+        self.assertEqual(delta["workouts"], [])
+
+    def test_pagination_and_isolation(self):
+        self._create()
+        self._create()
+        other = User.objects.create_user(username="o", email="o@test.com", password="x")
+        record_workout_change(other.pk, upserted=[("workout", 999)])
+
+        delta = self.client.get("/api/sync/?since=1&limit=2").data
+        self.assertTrue(delta["has_more"])
+        delta = self.client.get(f"/api/sync/?since={delta['token']}").data
+        self.assertFalse(delta["has_more"])
+        self.assertNotIn(999, [w["id"] for w in delta["workouts"]])
+
+
+class NestedValidationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="nested", email="nested@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.exercises = [
+            Exercise.objects.create(
+                name=f"Exercise {i}",
+                primary_muscle="back",
+                equipment="machine",
+                difficulty="easy",
+            )
+            for i in range(6)
+        ]
+
+    def _payload(self, exercise_ids):
+        return {
+            "date": "2025-02-01",
+            "duration_min": 30,
+            "workout_exercises": [
+                {"exercise": pk, "order": order, "target_sets": 1, "target_reps": 8}
+                for order, pk in enumerate(exercise_ids, start=1)
+            ],
+        }
+
+    def test_exercises_are_resolved_without_per_item_queries(self):
+        from rest_framework.test import APIRequestFactory
+
+        from .serializers import WorkoutCreateSerializer
+
+        request = APIRequestFactory().post("/api/workouts/")
+        request.user = self.user
+        serializer = WorkoutCreateSerializer(
+            data=self._payload([e.pk for e in self.exercises]),
+            context={"request": request},
+        )
+        get_catalog()
+        # Los ejercicios se resuelven desde la foto del catálogo
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_unknown_ids_are_reported_per_item(self):
+        payload = self._payload([self.exercises[0].pk, 9999, "abc"])
+        response = self.client.post(
+            "/api/workouts/", payload, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.data["workout_exercises"]
+        self.assertEqual(errors[0], {})
+        self.assertEqual(
+            errors[1]["exercise"], ['Invalid pk "9999" - object does not exist.']
+        )
+        self.assertEqual(errors[2]["exercise"][0].code, "incorrect_type")
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        self.exercise = Exercise.objects.create(
+            name="Row", primary_muscle="back", equipment="barbell", difficulty="medium"
+        )
+
+    def test_snapshot_is_reloaded_when_catalog_changes(self):
+        from . import catalog
+
+        snapshot = get_catalog()
+        self.assertEqual(snapshot.name_of(self.exercise.pk), "Row")
+        self.assertIs(snapshot.get_by_name("Row"), snapshot.get(self.exercise.pk))
+        with self.assertRaises(AttributeError):
+            snapshot.get(self.exercise.pk).name = "otro"
+
+        self.exercise.name = "Barbell Row"
+        self.exercise.save()
+        self.assertEqual(get_catalog().name_of(self.exercise.pk), "Barbell Row")
+
+        # Otro proceso cambió la versión: se detecta al empezar el request
+        from .models import CatalogVersion
+
+        Exercise.objects.filter(pk=self.exercise.pk).update(name="Pendlay Row")
+        CatalogVersion.objects.update(version=F("version") + 1)
+        catalog._local.checked = False
+        self.assertEqual(get_catalog().name_of(self.exercise.pk), "Pendlay Row")
+
+    def test_workout_exercise_keys_keep_their_order(self):
+        user = User.objects.create_user(username="order", email="order@test.com", password="x")
+        self.client.force_login(user)
+        workout = Workout.objects.create(user=user, date=timezone.now().date(), duration_min=30)
+        workout_exercise = workout.workout_exercises.create(
+            exercise=self.exercise, order=1, target_sets=1, target_reps=5
+        )
+        workout_exercise.sets.create(set_number=1, reps_completed=5, weight_kg="50.00")
+
+        expected = ["id", "sets", "exercise_name", "order", "target_sets", "target_reps", "workout", "exercise"]
+        for url in ("/api/workouts/", f"/api/workouts/{workout.pk}/"):
+            data = self.client.get(url).json()
+            data = data[0] if isinstance(data, list) else data
+            self.assertEqual(list(data["workout_exercises"][0]), expected)
+            self.assertEqual(data["workout_exercises"][0]["exercise_name"], "Row")
+
+    def test_detail_matches_serializer(self):
+        from .serializers import ExerciseSerializer
+
+        self.assertEqual(self.client.get("/api/exercises/9999/").status_code, 404)
+        response = self.client.get(f"/api/exercises/{self.exercise.pk}/")
+        self.assertEqual(response.json(), ExerciseSerializer(self.exercise).data)
+
+
+class PlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="planner", email="planner@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.squat = Exercise.objects.create(
+            name="Squat", primary_muscle="legs", equipment="barbell", difficulty="hard"
+        )
+
+    def _create(self, **extra):
+        payload = {
+            "name": "Legs",
+            "start_date": "2025-01-01",  # miércoles
+            "exercises": [
+                {"weekday": 0, "exercise": self.squat.pk, "order": 1, "target_sets": 5, "target_reps": 5},
+                {"weekday": 4, "exercise": self.squat.pk, "order": 1, "target_sets": 3, "target_reps": 8},
+            ],
+            **extra,
+        }
+        response = self.client.post("/api/plans/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data
+
+    def test_create_and_calendar(self):
+        plan = self._create(interval_weeks=2, end_date="2025-01-31")
+        self.assertEqual(len(plan["exercises"]), 2)
+        self.assertEqual(plan["exercises"][0]["exercise_name"], "Squat")
+
+        response = self.client.get("/api/plans/calendar/?date_from=2024-12-01&date_to=2025-03-01")
+        self.assertEqual(response.status_code, 200)
+        # Semanas del 30/12, 13/01 y 27/01; el lunes 30/12 es anterior al inicio
+        self.assertEqual(
+            [str(item["date"]) for item in response.data["occurrences"]],
+            ["2025-01-03", "2025-01-13", "2025-01-17", "2025-01-27", "2025-01-31"],
+        )
+        self.assertEqual(response.data["occurrences"][0]["exercises"][0]["target_reps"], 8)
+
+    def test_occurrences_are_merged_across_plans_and_not_stored(self):
+        self._create()
+        self._create(name="Legs 2", start_date="2025-01-06")
+        response = self.client.get("/api/plans/calendar/?date_from=2025-01-06&date_to=2025-01-12")
+        self.assertEqual(
+            [(str(item["date"]), item["plan_name"]) for item in response.data["occurrences"]],
+            [("2025-01-06", "Legs"), ("2025-01-06", "Legs 2"), ("2025-01-10", "Legs"), ("2025-01-10", "Legs 2")],
+        )
+        self.assertFalse(Workout.objects.exists())
+
+    def test_update_replaces_exercises_and_validates(self):
+        plan = self._create()
+        response = self.client.patch(
+            f"/api/plans/{plan['id']}/",
+            {"exercises": [{"weekday": 2, "exercise": self.squat.pk, "order": 1, "target_sets": 1, "target_reps": 1}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["weekday"] for item in response.data["exercises"]], [2])
+
+        response = self.client.patch(
+            f"/api/plans/{plan['id']}/", {"end_date": "2024-01-01"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get("/api/plans/calendar/?date_from=2025-01-01&date_to=2027-01-01").status_code,
+            400,
+        )
+
+
+class WorkoutCloneTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cloner", email="cloner@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        exercise = Exercise.objects.create(
+            name="Deadlift", primary_muscle="back", equipment="barbell", difficulty="hard"
+        )
+        self.workout = Workout.objects.create(
+            user=self.user, date="2025-01-10", duration_min=50, notes="Pull"
+        )
+        for order in (1, 2):
+            workout_exercise = self.workout.workout_exercises.create(
+                exercise=exercise, order=order, target_sets=2, target_reps=5
+            )
+            for number in (1, 2):
+                workout_exercise.sets.create(
+                    set_number=number, reps_completed=5, weight_kg=f"{100 + order}.00", rpe="8.0"
+                )
+
+    def test_clone_copies_tree(self):
+        response = self.client.post(
+            f"/api/workouts/{self.workout.pk}/clone/",
+            {"date": "2025-02-01"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.data["id"], self.workout.pk)
+        self.assertEqual(str(response.data["date"]), "2025-02-01")
+        self.assertEqual(response.data["notes"], "Pull")
+        self.assertEqual(
+            [
+                [(s["set_number"], s["weight_kg"], s["rpe"]) for s in item["sets"]]
+                for item in response.data["workout_exercises"]
+            ],
+            [[(1, "101.00", "8.0"), (2, "101.00", "8.0")], [(1, "102.00", "8.0"), (2, "102.00", "8.0")]],
+        )
+        self.assertEqual(WorkoutSet.objects.count(), 8)
+
+        # El clon completo queda en el registro de cambios
+        from .models import WorkoutChange
+
+        self.assertEqual(WorkoutChange.objects.filter(user=self.user).count(), 7)
+
+    def test_clone_without_sets_and_validation(self):
+        response = self.client.post(
+            f"/api/workouts/{self.workout.pk}/clone/",
+            {"include_sets": False},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(str(response.data["date"]), str(timezone.now().date()))
+        self.assertEqual([item["sets"] for item in response.data["workout_exercises"]], [[], []])
+
+        future = timezone.now().date() + timedelta(days=3)
+        response = self.client.post(
+            f"/api/workouts/{self.workout.pk}/clone/",
+            {"date": str(future)},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        other = User.objects.create_user(username="o", email="o@test.com", password="x")
+        self.client.force_login(other)
+        self.assertEqual(
+            self.client.post(f"/api/workouts/{self.workout.pk}/clone/").status_code, 404
+        )
+
+
+class NextTargetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="lifter", email="lifter@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.press = Exercise.objects.create(
+            name="Overhead Press", primary_muscle="shoulders", equipment="barbell", difficulty="medium"
+        )
+        self.pullup = Exercise.objects.create(
+            name="Pull Up", primary_muscle="back", equipment="bodyweight", difficulty="medium",
+            is_bodyweight=True,
+        )
+
+    def _log(self, date, exercise, sets, target_sets=3, target_reps=5):
+        payload = {
+            "date": str(date),
+            "duration_min": 40,
+            "workout_exercises": [
+                {
+                    "exercise": exercise.pk,
+                    "order": 1,
+                    "target_sets": target_sets,
+                    "target_reps": target_reps,
+                    "sets": [
+                        dict({"set_number": n, "reps_completed": reps}, **extra)
+                        for n, (reps, extra) in enumerate(sets, start=1)
+                    ],
+                }
+            ],
+        }
+        response = self.client.post("/api/workouts/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return Workout.objects.filter(user=self.user).latest("id").pk
+
+    def _target(self, exercise):
+        response = self.client.get(f"/api/exercises/{exercise.pk}/next-target/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_progression_rules(self):
+        today = timezone.now().date()
+        self.assertEqual(self._target(self.press)["reason"], "no_history")
+
+        heavy = {"weight_kg": "50.00", "rpe": "8.0"}
+        self._log(today - timedelta(days=7), self.press, [(5, heavy)] * 3)
+        target = self._target(self.press)
+        self.assertEqual(
+            (target["suggested_weight"], target["suggested_reps"], target["reason"]),
+            ("52.50", 5, "increase_weight"),
+        )
+
+        # Sesión más reciente fallida con RPE alto: deload
+        failed = self._log(
+            today, self.press, [(5, {"weight_kg": "52.50", "rpe": "10.0"}), (3, {"weight_kg": "52.50", "rpe": "10.0"})]
+        )
+        target = self._target(self.press)
+        self.assertEqual((target["suggested_weight"], target["reason"]), ("45.00", "deload"))
+
+        # Borrarla vuelve a la sesión anterior, sin recorrer el historial al leer
+        self.client.delete(f"/api/workouts/{failed}/")
+        with self.assertNumQueries(4):  # sesión, usuario, catálogo y resumen
+            target = self._target(self.press)
+        self.assertEqual(target["suggested_weight"], "52.50")
+
+    def test_older_session_keeps_the_latest_summary(self):
+        today = timezone.now().date()
+        self._log(today, self.press, [(5, {"weight_kg": "50.00", "rpe": "8.0"})] * 3)
+        # Una sesión cargada tarde, en otra semana, no es la última
+        self._log(today - timedelta(days=21), self.press, [(5, {"weight_kg": "70.00"})] * 3)
+        self.assertEqual(self._target(self.press)["suggested_weight"], "52.50")
+
+        # Otro workout el mismo día: vale el último
+        self._log(today, self.press, [(5, {"weight_kg": "60.00", "rpe": "8.0"})] * 3)
+        self.assertEqual(self._target(self.press)["suggested_weight"], "62.50")
+
+    def test_bodyweight_adds_reps(self):
+        self._log(timezone.now().date(), self.pullup, [(8, {}), (9, {})], target_sets=2, target_reps=8)
+        target = self._target(self.pullup)
+        self.assertEqual(
+            (target["suggested_weight"], target["suggested_reps"], target["reason"]),
+            (None, 10, "add_reps"),
+        )
+
+
+@override_settings(FITNESS_THROTTLE_STORE=None)
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.squat = Exercise.objects.create(
+            name="Squat", primary_muscle="legs", equipment="barbell", difficulty="hard"
+        )
+        self.today = timezone.now().date()
+        self.users = [
+            User.objects.create_user(username=f"athlete{i}", email=f"a{i}@test.com", password="x")
+            for i in range(4)
+        ]
+        # Volúmenes de la semana: 1000, 500, 1000 y nada para el último
+        for user, weight in zip(self.users, ["100.00", "50.00", "100.00"]):
+            self._log(user, self.today, weight)
+        # Un workout de otra semana no cuenta
+        self._log(self.users[1], self.today - timedelta(days=14), "200.00")
+
+    def _log(self, user, date, weight):
+        self.client.force_login(user)
+        payload = {
+            "date": str(date),
+            "duration_min": 30,
+            "workout_exercises": [
+                {
+                    "exercise": self.squat.pk,
+                    "order": 1,
+                    "target_sets": 2,
+                    "target_reps": 5,
+                    "sets": [
+                        {"set_number": n, "reps_completed": 5, "weight_kg": weight}
+                        for n in (1, 2)
+                    ],
+                }
+            ],
+        }
+        response = self.client.post("/api/workouts/", payload, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_rankings_with_ties_and_position(self):
+        self.client.force_login(self.users[1])
+        response = self.client.get("/api/leaderboards/volume/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row["rank"], row["username"], row["score"]) for row in response.data["results"]],
+            [(1, "athlete0", "1000.00"), (1, "athlete2", "1000.00"), (3, "athlete1", "500.00")],
+        )
+        self.assertEqual(response.data["me"], {"rank": 3, "score": "500.00"})
+
+        response = self.client.get("/api/leaderboards/volume/?offset=1&limit=1")
+        self.assertEqual(response.data["results"][0]["rank"], 1)
+        self.assertEqual(response.data["next_offset"], 2)
+
+        self.client.force_login(self.users[3])
+        response = self.client.get(f"/api/leaderboards/e1rm/?exercise_id={self.squat.pk}")
+        self.assertEqual(response.data["results"][0]["score"], "116.67")
+        self.assertIsNone(response.data["me"])
+        self.assertEqual(self.client.get("/api/leaderboards/e1rm/").status_code, 400)
+        self.assertEqual(self.client.get("/api/leaderboards/unknown/").status_code, 404)
+
+    def test_writes_update_scores_and_rebuild_matches(self):
+        from .models import LeaderboardEntry
+
+        workout = Workout.objects.get(user=self.users[0])
+        self.client.force_login(self.users[0])
+        self.client.delete(f"/api/workouts/{workout.pk}/")
+        response = self.client.get("/api/leaderboards/workouts/")
+        self.assertEqual(
+            [(row["username"], row["score"]) for row in response.data["results"]],
+            [("athlete1", 1), ("athlete2", 1)],
+        )
+
+        def snapshot():
+            return sorted(
+                LeaderboardEntry.objects.values_list("board", "period_start", "user_id", "score")
+            )
+
+        incremental = snapshot()
+        call_command("rebuild_leaderboards", weeks=3, stdout=StringIO())
+        self.assertEqual(snapshot(), incremental)
+
+
+class CoachDashboardTests(TestCase):
+    def setUp(self):
+        self.coach = User.objects.create_user(username="coach", email="coach@test.com", password="x")
+        self.athletes = [
+            User.objects.create_user(username=f"ath{i}", email=f"ath{i}@test.com", password="x")
+            for i in range(3)
+        ]
+        self.exercise = Exercise.objects.create(
+            name="Bench", primary_muscle="chest", equipment="barbell", difficulty="medium"
+        )
+        today = timezone.now().date()
+        for i, athlete in enumerate(self.athletes):
+            for day in range(i + 1):
+                workout = Workout.objects.create(
+                    user=athlete, date=today - timedelta(days=day), duration_min=30
+                )
+                workout.workout_exercises.create(
+                    exercise=self.exercise, order=1, target_sets=1, target_reps=10
+                ).sets.create(set_number=1, reps_completed=10, weight_kg="60.00")
+        # Un workout viejo fuera de la ventana
+        Workout.objects.create(user=self.athletes[0], date=today - timedelta(days=30), duration_min=90)
+
+    def test_athletes_add_coach_and_coach_sees_page(self):
+        for athlete in self.athletes[:2]:
+            self.client.force_login(athlete)
+            response = self.client.post(
+                "/auth/coaches/", {"coach_email": "coach@test.com"}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post(
+            "/auth/coaches/", {"coach_email": "coach@test.com"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(self.coach)
+        response = self.client.get("/api/coach/athletes/?workouts=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 2)
+        rows = {row["athlete"]["username"]: row for row in response.data["results"]}
+        self.assertEqual(set(rows), {"ath0", "ath1"})
+        self.assertEqual(rows["ath1"]["summary"]["workout_count"], 2)
+        self.assertEqual(rows["ath1"]["summary"]["total_volume"], "1200.00")
+        self.assertEqual(rows["ath0"]["summary"]["total_duration_min"], 30)
+        self.assertEqual(len(rows["ath1"]["recent_workouts"]), 1)
+
+        response = self.client.get("/api/coach/athletes/?page_size=1&page=2")
+        self.assertEqual([row["athlete"]["username"] for row in response.data["results"]], ["ath1"])
+
+        # El atleta quita al entrenador
+        self.client.force_login(self.athletes[0])
+        link = self.client.get("/auth/coaches/").json()[0]
+        self.assertEqual(self.client.delete(f"/auth/coaches/{link['id']}/").status_code, 204)
+        self.client.force_login(self.coach)
+        self.assertEqual(self.client.get("/api/coach/athletes/").data["count"], 1)
+
+
+class FixedPointStorageTests(TestCase):
+    def test_weights_are_integers_in_db_and_decimals_in_json(self):
+        from django.db import connection
+
+        user = User.objects.create_user(username="fp", email="fp@test.com", password="x")
+        exercise = Exercise.objects.create(
+            name="Curl", primary_muscle="arms", equipment="dumbbell", difficulty="easy"
+        )
+        workout = Workout.objects.create(user=user, date="2025-03-01", duration_min=20)
+        workout_set = workout.workout_exercises.create(
+            exercise=exercise, order=1, target_sets=1, target_reps=10
+        ).sets.create(set_number=1, reps_completed=10, weight_kg="12.5", rpe="7.5")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT weight_kg, rpe FROM fitness_workoutset WHERE id = %s", [workout_set.pk]
+            )
+            self.assertEqual(cursor.fetchone(), (1250, 75))
+
+        self.client.force_login(user)
+        response = self.client.get(f"/api/workouts/{workout.pk}/")
+        self.assertIn(b'"weight_kg":"12.50","rpe":"7.5"', response.content)
+        self.assertTrue(WorkoutSet.objects.filter(weight_kg__gt="12.49", rpe=7.5).exists())
+
+
+class ContentNegotiationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="packed", email="packed@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.exercise = Exercise.objects.create(
+            name="Remo", primary_muscle="back", equipment="barbell", difficulty="medium"
+        )
+
+    def test_msgpack_round_trip(self):
+        import msgpack
+
+        payload = {
+            "date": "2025-04-01",
+            "duration_min": 45,
+            "workout_exercises": [
+                {
+                    "exercise": self.exercise.pk,
+                    "order": 1,
+                    "target_sets": 1,
+                    "target_reps": 8,
+                    "sets": [{"set_number": 1, "reps_completed": 8, "weight_kg": "60.00"}],
+                }
+            ],
+        }
+        response = self.client.post(
+            "/api/workouts/",
+            msgpack.packb(payload),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+
+        workout = Workout.objects.get(user=self.user)
+        response = self.client.get(
+            f"/api/workouts/{workout.pk}/", HTTP_ACCEPT="application/msgpack"
+        )
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data, json.loads(self.client.get(f"/api/workouts/{workout.pk}/").content))
+        self.assertEqual(data["workout_exercises"][0]["sets"][0]["weight_kg"], "60.00")
+
+    def test_invalid_msgpack_is_a_parse_error(self):
+        response = self.client.post(
+            "/api/workouts/", b"\xc1", content_type="application/msgpack"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_responses_are_gzipped(self):
+        import gzip
+
+        for day in range(1, 21):
+            Workout.objects.create(user=self.user, date=f"2025-05-{day:02d}", duration_min=30)
+
+        response = self.client.get("/api/workouts/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        plain = self.client.get("/api/workouts/")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get(
+            "/api/workouts/", HTTP_ACCEPT="text/html", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="retry", email="retry@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+
+    def _post(self, payload, key="k-1"):
+        return self.client.post(
+            "/api/workouts/", payload, content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retried_create_is_replayed(self):
+        from .models import WorkoutChange
+
+        payload = {"date": "2025-06-01", "duration_min": 40, "notes": "pierna"}
+        first = self._post(payload)
+        self.assertEqual(first.status_code, 201)
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        changes = WorkoutChange.objects.count()
+
+        # Sesión, usuario y la clave guardada: no toca los workouts
+        with self.assertNumQueries(3):
+            retry = self._post(payload)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(WorkoutChange.objects.count(), changes)
+
+        # Otra clave es otra escritura
+        self._post(payload, key="k-2")
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 2)
+
+    def test_retried_update_is_replayed(self):
+        workout = Workout.objects.create(user=self.user, date="2025-06-02", duration_min=30)
+        url = f"/api/workouts/{workout.pk}/"
+        first = self.client.patch(
+            url, {"duration_min": 50}, content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="edit-1",
+        )
+        Workout.objects.filter(pk=workout.pk).update(duration_min=35)
+
+        retry = self.client.patch(
+            url, {"duration_min": 50}, content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="edit-1",
+        )
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Workout.objects.get(pk=workout.pk).duration_min, 35)
+
+    def test_key_reused_with_another_payload(self):
+        self._post({"date": "2025-06-03", "duration_min": 20})
+        response = self._post({"date": "2025-06-04", "duration_min": 20})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 1)
+
+    def test_errors_are_not_stored(self):
+        response = self._post({"date": "2025-06-05"})
+        self.assertEqual(response.status_code, 400)
+        response = self._post({"date": "2025-06-05", "duration_min": 25})
+        self.assertEqual(response.status_code, 201)
+
+    def test_expired_keys_are_executed_again(self):
+        from .models import IdempotencyKey
+
+        payload = {"date": "2025-06-06", "duration_min": 20}
+        self._post(payload)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        response = self._post(payload)
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command("prune_idempotency_keys", stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ExerciseHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="history", email="history@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.squat, self.bench = (
+            Exercise.objects.create(
+                name=name, primary_muscle="legs", equipment="barbell", difficulty="medium"
+            )
+            for name in ("Sentadilla", "Press banca")
+        )
+        for day in range(1, 6):
+            workout = Workout.objects.create(
+                user=self.user, date=f"2025-07-{day:02d}", duration_min=40
+            )
+            workout_exercise = workout.workout_exercises.create(
+                exercise=self.squat, order=1, target_sets=2, target_reps=5
+            )
+            for set_number in (1, 2):
+                workout_exercise.sets.create(
+                    set_number=set_number, reps_completed=5, weight_kg=100 + day
+                )
+        other = User.objects.create_user(username="other", email="o@test.com", password="x")
+        workout = Workout.objects.create(user=other, date="2025-07-09", duration_min=10)
+        workout.workout_exercises.create(
+            exercise=self.squat, order=1, target_sets=1, target_reps=5
+        ).sets.create(set_number=1, reps_completed=5, weight_kg=200)
+
+    def test_keyset_pages(self):
+        url = f"/api/exercises/{self.squat.pk}/history/"
+        first = self.client.get(url, {"limit": 2}).json()
+        self.assertEqual([s["date"] for s in first["sessions"]], ["2025-07-05", "2025-07-04"])
+        self.assertEqual(
+            first["sessions"][0]["sets"],
+            [
+                {"set_number": 1, "reps_completed": 5, "weight_kg": "105.00", "rpe": None},
+                {"set_number": 2, "reps_completed": 5, "weight_kg": "105.00", "rpe": None},
+            ],
+        )
+
+        dates = [s["date"] for s in first["sessions"]]
+        cursor = first["next_cursor"]
+        while cursor:
+            page = self.client.get(url, {"limit": 2, "cursor": cursor}).json()
+            dates += [s["date"] for s in page["sessions"]]
+            cursor = page["next_cursor"]
+        self.assertEqual(dates, [f"2025-07-{day:02d}" for day in range(5, 0, -1)])
+
+        self.assertEqual(self.client.get(url, {"cursor": "ayer"}).status_code, 400)
+
+    def test_batch_returns_last_sessions_per_exercise(self):
+        response = self.client.get(
+            "/api/exercises/history/",
+            {"exercise_ids": f"{self.bench.pk},{self.squat.pk}", "last": 2},
+        )
+        results = response.json()["results"]
+        self.assertEqual([r["exercise_id"] for r in results], [self.bench.pk, self.squat.pk])
+        self.assertEqual(results[0]["sessions"], [])
+        self.assertEqual(
+            [s["date"] for s in results[1]["sessions"]], ["2025-07-05", "2025-07-04"]
+        )
+
+        response = self.client.get("/api/exercises/history/", {"exercise_ids": "1,x"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/exercises/history/", {"exercise_ids": "99999"})
+        self.assertEqual(response.status_code, 400)
+
+
+class NotesSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="journal", email="journal@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+
+    def _create(self, date, notes, client=None):
+        response = (client or self.client).post(
+            "/api/workouts/",
+            {"date": date, "duration_min": 30, "notes": notes},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Workout.objects.latest("id")
+
+    def _search(self, query, **params):
+        response = self.client.get("/api/workouts/", {"q": query, **params})
+        return [workout["notes"] for workout in response.json()]
+
+    def test_ranked_prefix_search_without_accents(self):
+        self._create("2025-08-01", "Día de pierna, sentadilla pesada")
+        self._create("2025-08-02", "Pierna: sentadilla, prensa y sentadilla búlgara")
+        self._create("2025-08-03", "Press banca")
+        # La más reciente, pero con una mención en una nota larga
+        self._create("2025-08-04", "Cardio suave, movilidad, estiramientos y al final algo de sentadilla")
+
+        self.assertEqual(
+            self._search("SENTADILLA"),
+            [
+                "Pierna: sentadilla, prensa y sentadilla búlgara",
+                "Día de pierna, sentadilla pesada",
+                "Cardio suave, movilidad, estiramientos y al final algo de sentadilla",
+            ],
+        )
+        self.assertEqual(self._search("dia piern"), ["Día de pierna, sentadilla pesada"])
+        self.assertEqual(
+            self._search("pierna", ordering="date"),
+            [
+                "Día de pierna, sentadilla pesada",
+                "Pierna: sentadilla, prensa y sentadilla búlgara",
+            ],
+        )
+        self.assertEqual(self._search('"banca" OR *'), [])
+        self.assertEqual(self._search("remo"), [])
+
+    def test_index_follows_writes_and_owner(self):
+        from django.test import Client
+
+        other = User.objects.create_user(username="other", email="o@test.com", password="x")
+        other_client = Client()
+        other_client.force_login(other)
+        self._create("2025-08-01", "Remo con barra", client=other_client)
+
+        workout = self._create("2025-08-02", "Peso muerto")
+        self.assertEqual(self._search("remo"), [])
+
+        self.client.patch(
+            f"/api/workouts/{workout.pk}/", {"notes": "Remo y dominadas"},
+            content_type="application/json",
+        )
+        self.assertEqual(self._search("remo"), ["Remo y dominadas"])
+        self.assertEqual(self._search("muerto"), [])
+
+        self.client.delete(f"/api/workouts/{workout.pk}/")
+        self.assertEqual(self._search("remo"), [])
+
+    def test_rebuild_command(self):
+        Workout.objects.create(user=self.user, date="2025-08-04", duration_min=20, notes="Cardio")
+        self.assertEqual(self._search("cardio"), [])
+        call_command("rebuild_notes_index", stdout=StringIO())
+        self.assertEqual(self._search("cardio"), ["Cardio"])
+
+    def test_filters_apply_to_every_match(self):
+        Workout.objects.create(user=self.user, date="2024-01-01", duration_min=20, notes="Sentadilla vieja")
+        Workout.objects.bulk_create([
+            Workout(user=self.user, date=date(2025, 1, 1) + timedelta(days=i), duration_min=20, notes="Sentadilla")
+            for i in range(520)
+        ])
+        call_command("rebuild_notes_index", stdout=StringIO())
+        self.assertEqual(self._search("sentadilla", to_date="2024-12-31"), ["Sentadilla vieja"])
+        self.assertEqual(len(self._search("sentadilla")), 521)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="veteran", email="veteran@test.com", password="x"
+        )
+        self.client.force_login(self.user)
+        self.exercise = Exercise.objects.create(
+            name="Press militar", primary_muscle="shoulders", equipment="barbell",
+            difficulty="medium",
+        )
+        self.old = []
+        for day, notes in ((3, "Hombro viejo"), (10, "")):
+            workout = Workout.objects.create(
+                user=self.user, date=date(2019, 2, day), duration_min=50, notes=notes
+            )
+            workout_exercise = workout.workout_exercises.create(
+                exercise=self.exercise, order=1, target_sets=2, target_reps=5
+            )
+            workout_exercise.sets.create(
+                set_number=1, reps_completed=5, weight_kg="42.50", rpe="8.5"
+            )
+            workout_exercise.sets.create(set_number=2, reps_completed=4, rest_sec=90)
+            self.old.append(workout)
+        self.recent = Workout.objects.create(
+            user=self.user, date=timezone.now().date(), duration_min=30
+        )
+        record_workout_change(
+            self.user.pk,
+            upserted=workout_tree([w.pk for w in self.old] + [self.recent.pk]),
+            dates=[w.date for w in self.old],
+        )
+
+    def _stats(self):
+        buckets = self.client.get(
+            "/api/stats/buckets/",
+            {"bucket": "month", "date_from": "2019-02-01", "date_to": "2019-02-28"},
+        ).json()
+        calendar = self.client.get("/api/stats/calendar/", {"year": 2019}).json()
+        return buckets["buckets"], calendar
+
+    def test_archive_keeps_rollups_and_restores_on_demand(self):
+        from .models import ActivityYear, ArchivedWorkout, ArchiveSegment, StatsBucket
+
+        detail = self.client.get(f"/api/workouts/{self.old[0].pk}/").json()
+        stats = self._stats()
+
+        call_command("archive_workouts", "--days", "365", stdout=StringIO())
+
+        self.assertEqual(list(Workout.objects.values_list("pk", flat=True)), [self.recent.pk])
+        self.assertFalse(WorkoutSet.objects.exists())
+        segment = ArchiveSegment.objects.get(user=self.user, year=2019)
+        self.assertEqual((segment.workout_count, segment.set_count), (2, 4))
+        self.assertEqual(ArchivedWorkout.objects.count(), 2)
+        self.assertEqual(self._stats(), stats)
+        # Recalculados desde los resúmenes del archivo
+        StatsBucket.objects.all().delete()
+        ActivityYear.objects.all().delete()
+        self.assertEqual(self._stats(), stats)
+        self.assertEqual(self.client.get("/api/workouts/", {"q": "hombro"}).json(), [])
+
+        # Pedir el workout lo devuelve a las tablas con sus ids
+        restored = self.client.get(f"/api/workouts/{self.old[0].pk}/").json()
+        self.assertEqual(restored, detail)
+        self.assertEqual(ArchivedWorkout.objects.get().pk, self.old[1].pk)
+        self.assertEqual(self._stats(), stats)
+        self.assertEqual(len(self.client.get("/api/workouts/", {"q": "hombro"}).json()), 1)
+
+        # Clonar restaura el último; el segmento vacío se elimina
+        response = self.client.post(f"/api/workouts/{self.old[1].pk}/clone/")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(ArchiveSegment.objects.exists())
+        self.assertEqual(WorkoutSet.objects.filter(rest_sec=90).count(), 3)
+
+    def test_exercise_stats_and_history_include_archived_workouts(self):
+        from .models import ArchivedExercise
+
+        period = {"date_from": "2019-01-01", "date_to": "2019-12-31"}
+        history = f"/api/exercises/{self.exercise.pk}/history/"
+
+        def responses():
+            pages = [self.client.get(history, {"limit": 1}).json()]
+            while pages[-1]["next_cursor"]:
+                pages.append(
+                    self.client.get(history, {"limit": 1, "cursor": pages[-1]["next_cursor"]}).json()
+                )
+            return [
+                self.client.get("/api/stats/volume/", period).json(),
+                self.client.get("/api/stats/top-sets/", period).json(),
+                self.client.get(
+                    "/api/stats/1rm/", {**period, "exercise_id": self.exercise.pk}
+                ).json(),
+                self.client.get("/api/stats/muscles/", period).json(),
+                self.client.get(
+                    "/api/exercises/history/", {"exercise_ids": self.exercise.pk, "last": 5}
+                ).json(),
+                pages,
+            ]
+
+        expected = responses()
+        self.assertEqual(expected[0]["workout_count"], 2)
+        self.assertEqual(len(expected[5]), 2)
+        call_command("archive_workouts", "--days", "365", stdout=StringIO())
+        self.assertEqual(
+            list(ArchivedExercise.objects.values_list("set_count", "volume", "top_weight", "best_reps")),
+            [(2, Decimal("212.50"), Decimal("42.50"), 5)] * 2,
+        )
+        self.assertFalse(WorkoutSet.objects.exists())
+        self.assertEqual(responses(), expected)
+
+    def test_leaderboards_include_archived_workouts(self):
+        from .leaderboards import rebuild_weeks, week_start
+        from .models import LeaderboardEntry
+
+        # Los dos workouts viejos en la misma semana
+        Workout.objects.filter(pk=self.old[1].pk).update(date=date(2019, 2, 2))
+        week = week_start(date(2019, 2, 3))
+        rebuild_weeks([week])
+
+        def entries():
+            return sorted(
+                LeaderboardEntry.objects.filter(period_start=week).values_list("board", "user_id", "score")
+            )
+
+        expected = entries()
+        self.assertEqual(
+            expected,
+            [
+                (f"e1rm:{self.exercise.pk}", self.user.pk, Decimal("49.58")),
+                ("volume", self.user.pk, Decimal("425.00")),
+                ("workouts", self.user.pk, Decimal("2.00")),
+            ],
+        )
+        call_command("archive_workouts", "--days", "365", stdout=StringIO())
+        call_command("rebuild_leaderboards", weeks=1, stdout=StringIO())
+        rebuild_weeks([week])
+        self.assertEqual(entries(), expected)
+
+        # Editar un workout restaurado conserva el otro, todavía archivado
+        self.client.patch(
+            f"/api/workouts/{self.old[0].pk}/", {"notes": "Editado"}, content_type="application/json"
+        )
+        self.assertEqual(Workout.objects.filter(notes="Editado").count(), 1)
+        self.assertEqual(entries(), expected)
+
+    def test_list_and_sync_report_archived_workouts(self):
+        token = self.client.get("/api/sync/").data["token"]
+        call_command("archive_workouts", "--days", "365", stdout=StringIO())
+        old_ids = [w.pk for w in self.old]
+
+        listed = self.client.get("/api/workouts/", {"ordering": "date"}).json()
+        self.assertEqual([w["id"] for w in listed], old_ids + [self.recent.pk])
+        self.assertEqual(
+            listed[0],
+            {
+                "id": self.old[0].pk, "date": "2019-02-03", "duration_min": 50,
+                "user": self.user.pk, "archived": True,
+            },
+        )
+        self.assertNotIn("archived", listed[2])
+        listed = self.client.get("/api/workouts/", {"to_date": "2019-02-05"}).json()
+        self.assertEqual([w["id"] for w in listed], [self.old[0].pk])
+
+        delta = self.client.get(f"/api/sync/?since={token}").data
+        self.assertEqual(delta["archived"], {"workouts": old_ids})
+        self.assertEqual(delta["deleted"]["workouts"], [])
+        self.assertEqual(self.client.get("/api/sync/").data["archived"], {"workouts": old_ids})
+
+        # Restaurado por el detalle: vuelve como upsert
+        self.client.get(f"/api/workouts/{self.old[0].pk}/")
+        delta = self.client.get(f"/api/sync/?since={token}").data
+        self.assertEqual(delta["archived"], {"workouts": [self.old[1].pk]})
+        self.assertEqual([w["id"] for w in delta["workouts"]], [self.old[0].pk])
+        self.assertEqual(
+            self.client.get("/api/sync/").data["archived"], {"workouts": [self.old[1].pk]}
+        )
+
+    def test_other_users_cannot_restore(self):
+        call_command("archive_workouts", "--days", "365", stdout=StringIO())
+        other = User.objects.create_user(username="other", email="o@test.com", password="x")
+        self.client.force_login(other)
+        response = self.client.get(f"/api/workouts/{self.old[0].pk}/")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FITNESS_SHARDS=["default", "shard1"], FITNESS_THROTTLE_STORE=None)
+class ShardingTests(TestCase):
+    databases = {"default", "shard1"}
+
+    def setUp(self):
+        from .sharding import shard_for_user
+
+        self.exercise = Exercise.objects.create(
+            name="Remo", primary_muscle="back", equipment="barbell", difficulty="medium"
+        )
+        users = [
+            User.objects.create_user(username=f"sharded{i}", email=f"s{i}@test.com", password="x")
+            for i in range(2)
+        ]
+        # Los usuarios nuevos se reparten por id
+        self.users = {shard_for_user(user.pk): user for user in users}
+        self.assertEqual(set(self.users), {"default", "shard1"})
+
+    def _create(self, user, notes="Espalda"):
+        self.client.force_login(user)
+        response = self.client.post(
+            "/api/workouts/",
+            {
+                "date": timezone.now().date().isoformat(),
+                "duration_min": 40,
+                "notes": notes,
+                "workout_exercises": [{
+                    "exercise": self.exercise.pk, "order": 1, "target_sets": 1,
+                    "target_reps": 8,
+                    "sets": [{"set_number": 1, "reps_completed": 8, "weight_kg": "70.00"}],
+                }],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return max(
+            Workout.objects.using(alias).filter(user=user).values_list("pk", flat=True).first() or 0
+            for alias in ("default", "shard1")
+        )
+
+    def test_workouts_live_in_the_users_shard(self):
+        from .models import WorkoutChange
+        from .sharding import ID_RANGE
+
+        ids = {alias: self._create(user) for alias, user in self.users.items()}
+        for alias, user in self.users.items():
+            other = "shard1" if alias == "default" else "default"
+            self.assertEqual(Workout.objects.using(alias).filter(user=user).count(), 1)
+            self.assertFalse(Workout.objects.using(other).filter(user=user).exists())
+            self.assertTrue(WorkoutChange.objects.filter(user=user).exists())
+        # Rangos de ids separados por shard
+        self.assertLess(ids["default"], ID_RANGE)
+        self.assertGreaterEqual(ids["shard1"], ID_RANGE)
+
+        user, pk = self.users["shard1"], ids["shard1"]
+        self.client.force_login(user)
+        detail = self.client.get(f"/api/workouts/{pk}/").json()
+        self.assertEqual(detail["user_username"], user.username)
+        self.assertEqual(len(detail["workout_exercises"][0]["sets"]), 1)
+        self.assertEqual([w["id"] for w in self.client.get("/api/workouts/").json()], [pk])
+        self.assertEqual(len(self.client.get("/api/workouts/", {"q": "espalda"}).json()), 1)
+        today = timezone.now().date().isoformat()
+        volume = self.client.get(
+            "/api/stats/volume/", {"date_from": today, "date_to": today}
+        ).json()
+        self.assertEqual(volume["total_volume"], "560.00")
+        # Los workouts de otro shard no se ven
+        self.assertEqual(self.client.get(f"/api/workouts/{ids['default']}/").status_code, 404)
+
+        response = self.client.patch(
+            f"/api/workouts/{pk}/", {"notes": "Dorsales"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Workout.objects.using("shard1").get(pk=pk).notes, "Dorsales")
+        self.assertEqual(self.client.delete(f"/api/workouts/{pk}/").status_code, 204)
+        self.assertFalse(WorkoutSet.objects.using("shard1").exists())
+
+    def test_deleting_a_user_deletes_workouts_in_every_shard(self):
+        from django.db import connections
+
+        from .search import FTS_TABLE
+
+        user = self.users["shard1"]
+        self._create(user, notes="Remo privado")
+        user.delete()
+        self.assertFalse(Workout.objects.using("shard1").exists())
+        self.assertFalse(WorkoutSet.objects.using("shard1").exists())
+        with connections["shard1"].cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_rebalance_moves_a_user_keeping_ids(self):
+        from .sharding import shard_for_user
+
+        user = self.users["shard1"]
+        pk = self._create(user, notes="Remo pesado")
+        call_command("rebalance_shards", "--user", user.pk, "--to", "default", stdout=StringIO())
+
+        self.assertEqual(shard_for_user(user.pk), "default")
+        self.assertFalse(Workout.objects.using("shard1").exists())
+        self.assertEqual(WorkoutSet.objects.filter(workout_exercise__workout_id=pk).count(), 1)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(f"/api/workouts/{pk}/").status_code, 200)
+        self.assertEqual(len(self.client.get("/api/workouts/", {"q": "remo"}).json()), 1)
+
+    def test_interrupted_move_is_recovered(self):
+        from unittest import mock
+
+        from .models import UserShard
+        from .sharding import recover_moves, shard_for_user
+
+        user = self.users["shard1"]
+        pk = self._create(user, notes="Remo pesado")
+
+        # Falla al borrar el origen, con el usuario ya en el destino
+        with mock.patch("fitness.sharding._delete_workouts", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    "rebalance_shards", "--user", user.pk, "--to", "default", stdout=StringIO()
+                )
+        self.assertEqual(shard_for_user(user.pk), "default")
+        self.assertEqual(UserShard.objects.get(user=user).pending_alias, "shard1")
+        self.assertTrue(Workout.objects.using("shard1").filter(pk=pk).exists())
+        self.assertEqual(recover_moves(), 1)
+        self.assertIsNone(UserShard.objects.get(user=user).pending_alias)
+        self.assertFalse(Workout.objects.using("shard1").exists())
+
+        # Falla al copiar de vuelta: el destino no confirma nada
+        with mock.patch("fitness.sharding.get_notes_search", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    "rebalance_shards", "--user", user.pk, "--to", "shard1", stdout=StringIO()
+                )
+        self.assertEqual(shard_for_user(user.pk), "default")
+        self.assertEqual(UserShard.objects.get(user=user).pending_alias, "shard1")
+        self.assertFalse(Workout.objects.using("shard1").exists())
+
+        # Sin la falla, la mudanza termina
+        call_command("rebalance_shards", "--user", user.pk, "--to", "shard1", stdout=StringIO())
+        self.assertEqual(shard_for_user(user.pk), "shard1")
+        self.assertIsNone(UserShard.objects.get(user=user).pending_alias)
+        self.assertFalse(Workout.objects.using("default").exists())
+        self.client.force_login(user)
+        self.assertEqual(len(self.client.get("/api/workouts/", {"q": "remo"}).json()), 1)
+
+    def test_shards_only_have_the_workout_tables(self):
+        from django.db import connections
+
+        tables = connections["shard1"].introspection.table_names()
+        self.assertIn("fitness_workoutset", tables)
+        self.assertNotIn("fitness_exercise", tables)
+        self.assertNotIn("auth_user", tables)
+
+    def test_admin_reads_and_edits_every_shard(self):
+        user = self.users["shard1"]
+        pk = self._create(user)
+        admin_user = User.objects.create_superuser(
+            username="support", email="support@test.com", password="x"
+        )
+        self.client.force_login(admin_user)
+
+        response = self.client.get("/admin/fitness/workout/", {"user": user.pk})
+        self.assertContains(response, user.email)
+        self.assertContains(self.client.get(f"/admin/fitness/workout/{pk}/change/"), "Remo")
+        response = self.client.get(f"/admin/fitness/workoutset/?workout={pk}")
+        self.assertContains(response, "70.00")
+
+        response = self.client.post("/admin/fitness/workout/?shard=shard1", {
+            "action": "delete_in_batches", "_selected_action": [pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Workout.objects.using("shard1").exists())
+
+    def test_coach_dashboard_and_leaderboards_span_shards(self):
+        from .leaderboards import rebuild_weeks, week_start
+        from .models import LeaderboardEntry
+
+        coach = User.objects.create_user(username="coach", email="coach@test.com", password="x")
+        for user in self.users.values():
+            self._create(user)
+            self.client.post(
+                "/auth/coaches/", {"coach_email": "coach@test.com"}, content_type="application/json"
+            )
+
+        self.client.force_login(coach)
+        response = self.client.get("/api/coach/athletes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["summary"]["workout_count"] for row in response.data["results"]], [1, 1]
+        )
+
+        LeaderboardEntry.objects.all().delete()
+        rebuild_weeks([week_start(timezone.now().date())])
+        self.assertEqual(
+            LeaderboardEntry.objects.filter(board=LeaderboardEntry.WORKOUTS).count(), 2
+        )
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="ops", email="ops@test.com", password="x", is_staff=True
+        )
+        self.user = User.objects.create_user(username="slow", email="slow@test.com", password="x")
+        exercise = Exercise.objects.create(
+            name="Dominadas", primary_muscle="back", equipment="bodyweight", difficulty="hard"
+        )
+        for user in (self.staff, self.user):
+            workout = Workout.objects.create(user=user, date=date(2025, 5, 1), duration_min=45)
+            workout.workout_exercises.create(
+                exercise=exercise, order=1, target_sets=1, target_reps=8
+            ).sets.create(set_number=1, reps_completed=8)
+
+    def test_staff_request_is_profiled_with_query_plans(self):
+        from .models import ProfileReport
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/api/workouts/", HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+        report = ProfileReport.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual((report.method, report.path, report.status_code), ("GET", "/api/workouts/", 200))
+        self.assertEqual(report.user, self.staff)
+        self.assertGreater(report.sql_count, 0)
+        self.assertIsNotNone(report.serializer_ms)
+        self.assertTrue(report.functions)
+        selects = [query for query in report.queries if query["sql"].startswith("SELECT")]
+        self.assertTrue(selects)
+        self.assertTrue(all(query["plan"] for query in selects))
+        self.assertTrue(any("fitness_workout" in query["sql"] for query in selects))
+
+        # El reporte se ve en el admin
+        self.staff.is_superuser = True
+        self.staff.save()
+        response = self.client.get(f"/admin/fitness/profilereport/{report.pk}/change/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "fitness_workout")
+
+    def test_only_staff_and_only_when_asked(self):
+        from .models import ProfileReport
+
+        self.client.force_login(self.user)
+        response = self.client.get("/api/workouts/", {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+
+        self.client.force_login(self.staff)
+        response = self.client.get("/api/workouts/")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(ProfileReport.objects.exists())
+
+
+class WorkoutAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="support", email="support@test.com", password="x"
+        )
+        self.client.force_login(self.admin)
+        self.user = User.objects.create_user(username="lifter", email="lifter@test.com", password="x")
+        self.exercise = Exercise.objects.create(
+            name="Hip thrust", primary_muscle="glutes", equipment="barbell", difficulty="easy"
+        )
+        self.workouts = [self._workout(day) for day in range(1, 4)]
+
+    def _workout(self, day):
+        workout = Workout.objects.create(user=self.user, date=date(2025, 3, day), duration_min=30)
+        workout.workout_exercises.create(
+            exercise=self.exercise, order=1, target_sets=1, target_reps=10
+        ).sets.create(set_number=1, reps_completed=10, weight_kg="80.00")
+        return workout
+
+    def _changelist_queries(self, path):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_changelists_do_not_grow_queries_per_row(self):
+        for path in (
+            "/admin/fitness/workout/",
+            f"/admin/fitness/workout/?user={self.user.pk}&date__gte=2025-03-01",
+            "/admin/fitness/workoutexercise/",
+            f"/admin/fitness/workoutset/?workout={self.workouts[0].pk}",
+        ):
+            self.client.get(path)  # Carga la foto del catálogo
+            _, before = self._changelist_queries(path)
+            for day in range(4, 9):
+                self._workout(day)
+            response, after = self._changelist_queries(path)
+            self.assertEqual(before, after, path)
+        self.assertContains(response, "80.00")
+
+        response = self.client.get("/admin/accounts/user/")
+        self.assertContains(response, f"/admin/fitness/workout/?user={self.user.pk}")
+        response = self.client.get(f"/admin/fitness/workout/?user={self.admin.pk}")
+        self.assertContains(response, "0 workouts")
+
+    def test_estimated_count_for_unfiltered_lists(self):
+        from unittest import mock
+
+        from django.db import connection
+
+        from .admin import EstimatedCountPaginator
+
+        Workout.objects.filter(pk=self.workouts[1].pk).delete()
+        queryset = Workout.objects.order_by("-id")
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 2)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        Workout.objects.create(user=self.user, date="2025-03-20", duration_min=20)
+        with mock.patch("fitness.admin.EXACT_COUNT_LIMIT", 0):
+            # Filas según el último ANALYZE, sin recorrer la tabla
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 2)
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(user=self.user), 100).count, 3)
+
+    def test_edits_and_batch_deletes_are_recorded(self):
+        from .models import WorkoutChange
+
+        workout = self.workouts[0]
+        workout_exercise = workout.workout_exercises.get()
+        response = self.client.post(f"/admin/fitness/workout/{workout.pk}/change/", {
+            "date": "2025-03-10",
+            "notes": "Corregido",
+            "duration_min": 35,
+            "workout_exercises-TOTAL_FORMS": 1,
+            "workout_exercises-INITIAL_FORMS": 1,
+            "workout_exercises-0-id": workout_exercise.pk,
+            "workout_exercises-0-workout": workout.pk,
+            "workout_exercises-0-order": 1,
+            "workout_exercises-0-exercise": self.exercise.pk,
+            "workout_exercises-0-target_sets": 2,
+            "workout_exercises-0-target_reps": 10,
+        })
+        self.assertEqual(response.status_code, 302)
+        workout_exercise.refresh_from_db()
+        self.assertEqual(workout_exercise.target_sets, 2)
+        self.assertTrue(
+            WorkoutChange.objects.filter(
+                user=self.user, kind=WorkoutChange.WORKOUT_EXERCISE, object_id=workout_exercise.pk
+            ).exists()
+        )
+        self.client.force_login(self.user)
+        calendar = self.client.get("/api/stats/calendar/", {"year": 2025}).json()
+        self.client.force_login(self.admin)
+
+        set_ids = set(WorkoutSet.objects.values_list("pk", flat=True))
+        response = self.client.post("/admin/fitness/workout/", {
+            "action": "delete_in_batches",
+            "_selected_action": [w.pk for w in self.workouts],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Workout.objects.exists())
+        self.assertFalse(WorkoutSet.objects.exists())
+        deleted = set(
+            WorkoutChange.objects.filter(operation=WorkoutChange.DELETE).values_list("kind", "object_id")
+        )
+        self.assertIn((WorkoutChange.WORKOUT, workout.pk), deleted)
+        self.assertTrue({(WorkoutChange.WORKOUT_SET, pk) for pk in set_ids} <= deleted)
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get("/api/stats/calendar/", {"year": 2025}).json(), calendar)
+
+
+class ExerciseLoaderTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.existing = Exercise.objects.create(
+            name="Pull-ups", primary_muscle="back", equipment="dumbbell", difficulty="medium"
+        )
+
+    def write(self, name, content):
+        from pathlib import Path
+
+        path = Path(self.dir) / name
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    def load(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command("load_exercises", path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_upserts_by_name_and_reports_rejections(self):
+        from .models import CatalogVersion
+
+        path = self.write("catalog.csv", "\n".join([
+            "name,primary_muscle,secondary_muscles,equipment,difficulty,is_bodyweight,video_url",
+            "Pull-ups,back,arms;shoulders,bodyweight,hard,,https://youtu.be/abc",
+            "Goblet Squat,legs,,kettlebell,easy,false,",
+            "Bad Muscle,chest,neck,barbell,easy,,",
+            "Bad Video,chest,,barbell,easy,,https://example.com/video",
+            "Overlap,chest,chest,barbell,easy,,",
+            "Goblet Squat,legs,back,kettlebell,medium,,",
+        ]))
+        snapshot = get_catalog()
+        version = CatalogVersion.objects.values_list("version", flat=True).first()
+        out, err = self.load(path, "--chunk-size", "1")
+        self.assertIn("1 creados, 1 actualizados, 0 sin cambios, 3 rechazados", out)
+        self.assertIn("Fila 4: secondary_muscles[0]: \"neck\" is not a valid choice.", err)
+        self.assertIn("Fila 5: video_url: Video URL must be from YouTube or Vimeo", err)
+        self.assertIn("Fila 6: Primary muscle cannot be in secondary muscles list", err)
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.secondary_muscles, ["arms", "shoulders"])
+        self.assertTrue(self.existing.is_bodyweight)
+        self.assertEqual(self.existing.video_url, "https://youtu.be/abc")
+        # La última fila repetida gana
+        squat = Exercise.objects.get(name="Goblet Squat")
+        self.assertEqual((squat.difficulty, squat.secondary_muscles), ("medium", ["back"]))
+        self.assertIsNone(squat.video_url)
+
+        # Las escrituras masivas no emiten señales: la versión se incrementa una vez
+        self.assertEqual(
+            CatalogVersion.objects.values_list("version", flat=True).get(), (version or 0) + 1
+        )
+        self.assertIsNot(get_catalog(), snapshot)
+        self.assertEqual(get_catalog().get_by_name("Goblet Squat").id, squat.pk)
+
+        out, _ = self.load(path)
+        self.assertIn("0 creados, 0 actualizados, 2 sin cambios, 3 rechazados", out)
+
+    def test_json_accepts_fixture_format_and_dry_run_writes_nothing(self):
+        path = self.write("catalog.json", json.dumps([
+            {"model": "fitness.exercise", "pk": 7, "fields": {
+                "name": "Plank", "primary_muscle": "back", "equipment": "bodyweight",
+                "difficulty": "easy",
+            }},
+            {"name": "Curl", "primary_muscle": "arms", "equipment": "dumbbell", "difficulty": "easy",
+             "video_url": "https://vimeo.com/1"},
+        ]))
+        out, _ = self.load(path, "--dry-run")
+        self.assertIn("2 creados, 0 actualizados, 0 sin cambios, 0 rechazados (sin escribir)", out)
+        self.assertFalse(Exercise.objects.filter(name__in=["Plank", "Curl"]).exists())
+
+        self.load(path)
+        plank = Exercise.objects.get(name="Plank")
+        self.assertTrue(plank.is_bodyweight)
+        self.assertNotEqual(plank.pk, 7)
+
+    def test_missing_optional_columns_keep_stored_values(self):
+        Exercise.objects.filter(pk=self.existing.pk).update(
+            secondary_muscles=["arms"], is_bodyweight=True, video_url="https://vimeo.com/2"
+        )
+        path = self.write("catalog.csv", "\n".join([
+            "name,primary_muscle,equipment,difficulty,video_url",
+            "Pull-ups,back,dumbbell,hard,",
+            "Lunge,legs,dumbbell,easy,",
+        ]))
+        out, _ = self.load(path)
+        self.assertIn("1 creados, 1 actualizados", out)
+        self.existing.refresh_from_db()
+        self.assertEqual(
+            (self.existing.difficulty, self.existing.secondary_muscles, self.existing.is_bodyweight,
+             self.existing.video_url),
+            ("hard", ["arms"], True, "https://vimeo.com/2"),
+        )
+        lunge = Exercise.objects.get(name="Lunge")
+        self.assertEqual((lunge.secondary_muscles, lunge.is_bodyweight, lunge.video_url), ([], False, None))
+
+    def test_committed_chunks_refresh_the_catalog_when_a_later_one_fails(self):
+        from unittest import mock
+
+        from django.db import DatabaseError
+
+        path = self.write("catalog.json", json.dumps([
+            {"name": name, "primary_muscle": "legs", "equipment": "barbell", "difficulty": "easy"}
+            for name in ("Squat", "Deadlift")
+        ]))
+        self.assertIsNone(get_catalog().get_by_name("Squat"))
+        bulk_create = Exercise.objects.bulk_create
+        calls = []
+
+        def fail_second_chunk(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) > 1:
+                raise DatabaseError("disk full")
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Exercise.objects, "bulk_create", fail_second_chunk):
+            with self.assertRaises(DatabaseError):
+                self.load(path, "--chunk-size", "1")
+        self.assertTrue(Exercise.objects.filter(name="Squat").exists())
+        self.assertFalse(Exercise.objects.filter(name="Deadlift").exists())
+        self.assertIsNotNone(get_catalog().get_by_name("Squat"))
+
+    def test_invalid_file_is_a_command_error(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaises(CommandError):
+            self.load(self.write("catalog.json", "{\"name\": \"x\"}"))
+        with self.assertRaises(CommandError):
+            self.load(self.write("catalog.xml", "<x/>"))
@@ -0,0 +1,208 @@
+"""
+Throttling por ventana fija con contadores atómicos.
+
+Los throttles por defecto de DRF guardan en caché una lista creciente de
+timestamps por clave y la reescriben en cada request. Aquí cada clave es un
+único contador (ventana, cuenta) que se incrementa de forma atómica.
+
+El almacén se elige con el setting FITNESS_THROTTLE_STORE:
+
+- Una ruta de archivo: contadores en un archivo mapeado en memoria,
+  compartidos entre todos los procesos worker del mismo host.
+- None: contadores en memoria del proceso (útil para tests o un solo worker).
+
+El costo por request es de unos pocos microsegundos: un hash de la clave, un
+flock y la lectura/escritura de 32 bytes en el mapa.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import UserRateThrottle
+
+
+class LocMemCounterStore:
+    """Contadores en memoria del proceso, protegidos por un lock"""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key, window, duration):
+        """Incrementar el contador de `key` en `window` y devolver la cuenta"""
+        with self._lock:
+            current_window, count = self._counters.get(key, (window, 0))
+            count = count + 1 if current_window == window else 1
+            self._counters[key] = (window, count)
+            return count
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class FileCounterStore:
+    """
+    Contadores en un archivo mapeado en memoria, compartido entre procesos.
+
+    El archivo es una tabla hash de tamaño fijo: `buckets` grupos de
+    BUCKET_ENTRIES entradas (hash de la clave, ventana, cuenta, expiración).
+    Cada incremento bloquea el archivo con flock, busca la entrada dentro de su
+    grupo y la actualiza en el lugar, sin serializar ni reescribir nada más.
+    Si el grupo está lleno se reutiliza una entrada vencida; si todas siguen
+    vigentes, la clave se cuenta en memoria del proceso (sin pisar el
+    contador de otro cliente).
+    """
+
+    ENTRY = struct.Struct("<QqQq")
+    BUCKET_ENTRIES = 8
+
+    def __init__(self, path, buckets=4096):
+        if fcntl is None:
+            raise ImproperlyConfigured("FileCounterStore requiere fcntl (POSIX)")
+        self.path = str(path)
+        self.buckets = buckets
+        self.bucket_size = self.ENTRY.size * self.BUCKET_ENTRIES
+        self._lock = threading.Lock()
+        self._overflow = LocMemCounterStore()
+        self._pid = None
+        self._open()
+
+    def _open(self):
+        # flock se comparte entre procesos que heredan el descriptor: cada
+        # proceso abre el suyo (p. ej. después del fork de los workers)
+        size = self.bucket_size * self.buckets
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def incr(self, key, window, duration):
+        """Incrementar el contador de `key` en `window` y devolver la cuenta"""
+        raw = key.encode()
+        digest = (zlib.crc32(raw) << 32 | zlib.adler32(raw)) or 1
+        needle = digest.to_bytes(8, "little")
+        start = (digest % self.buckets) * self.bucket_size
+        end = start + self.bucket_size
+        expires = (window + 1) * duration
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            data = self._map
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                position = data.find(needle, start, end)
+                while position != -1 and (position - start) % self.ENTRY.size:
+                    position = data.find(needle, position + 1, end)
+                if position != -1:
+                    entry = self.ENTRY.unpack_from(data, position)
+                    count = entry[2] + 1 if entry[1] == window else 1
+                else:
+                    position, count = self._free_entry(data, start, end, window * duration), 1
+                    if position is None:
+                        return self._overflow.incr(key, window, duration)
+                self.ENTRY.pack_into(data, position, digest, window, count, expires)
+                return count
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _free_entry(self, data, start, end, now):
+        """
+        Primera entrada vacía del grupo o, si no hay, la vencida que expiró
+        primero. None si todas siguen vigentes en `now`.
+        """
+        candidate, candidate_expires = None, None
+        for position in range(start, end, self.ENTRY.size):
+            digest, _, _, expires = self.ENTRY.unpack_from(data, position)
+            if digest == 0:
+                return position
+            if expires <= now and (candidate_expires is None or expires < candidate_expires):
+                candidate, candidate_expires = position, expires
+        return candidate
+
+    def clear(self):
+        with self._lock:
+            self._map[:] = bytes(len(self._map))
+            self._overflow.clear()
+
+
+_store = None
+
+
+def get_counter_store():
+    """Almacén de contadores configurado, creado una vez por proceso"""
+    global _store
+    if _store is None:
+        path = getattr(settings, "FITNESS_THROTTLE_STORE", None)
+        # Sin fcntl (Windows) no hay almacén compartido: contadores por proceso
+        if path and fcntl is not None:
+            _store = FileCounterStore(path)
+        else:
+            _store = LocMemCounterStore()
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_counter_store(setting, **kwargs):
+    global _store
+    if setting == "FITNESS_THROTTLE_STORE":
+        _store = None
+
+
+class FixedWindowRateThrottle(UserRateThrottle):
+    """
+    Throttle por usuario (o IP si es anónimo) con ventana fija.
+
+    Usa la misma clave de caché y el mismo formato de tasa ("30/min") que
+    UserRateThrottle, pero el estado es un contador por ventana en lugar del
+    historial de timestamps.
+    """
+
+    def get_rate(self):
+        # Leer las tasas en cada instancia para respetar cambios de settings
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        self.window = int(self.now // self.duration)
+        count = get_counter_store().incr(self.key, self.window, self.duration)
+        return count <= self.num_requests
+
+    def wait(self):
+        """Segundos hasta que empiece la próxima ventana"""
+        return (self.window + 1) * self.duration - self.now
+
+
+class StatsRateThrottle(FixedWindowRateThrottle):
+    scope = "stats"
+
+
+class VolumeStatsRateThrottle(FixedWindowRateThrottle):
+    scope = "volume_stats"
+
+
+class OneRMStatsRateThrottle(FixedWindowRateThrottle):
+    scope = "onerm_stats"
@@ -1,7 +1,12 @@
 from django.urls import path
 from .views import (
-    ExerciseDetailView, ExerciseListView,
-    WorkoutListView, WorkoutDetailView
+    ExerciseDetailView, ExerciseListView, ExerciseNextTargetView,
+    ExerciseHistoryView, ExerciseHistoryBatchView,
+    WorkoutListView, WorkoutDetailView, WorkoutCloneView, SyncView,
+    VolumeStatsView, TopSetsView, OneRepMaxStatsView, ConsistencyStatsView,
+    MuscleVolumeStatsView, BucketStatsView,
+    PlanListView, PlanDetailView, PlanCalendarView, LeaderboardView,
+    CoachDashboardView, ActivityCalendarView
 )
 
 urlpatterns = [
@@ -9,10 +14,42 @@ urlpatterns = [
     # exercises endpoints
     path("exercises/", ExerciseListView.as_view(), name="exercise-list"),
     path("exercises/<int:pk>/", ExerciseDetailView.as_view(), name="exercise-detail"),
+    path("exercises/<int:pk>/next-target/", ExerciseNextTargetView.as_view(), name="exercise-next-target"),
+    path("exercises/<int:pk>/history/", ExerciseHistoryView.as_view(), name="exercise-history"),
+    path("exercises/history/", ExerciseHistoryBatchView.as_view(), name="exercise-history-batch"),
     
     
     # workouts endpoints
     path("workouts/", WorkoutListView.as_view(), name="workout-list"),
     path("workouts/<int:pk>/", WorkoutDetailView.as_view(), name="workout-detail"),
+    path("workouts/<int:pk>/clone/", WorkoutCloneView.as_view(), name="workout-clone"),
+    
+    
+    # plans endpoints
+    path("plans/", PlanListView.as_view(), name="plan-list"),
+    path("plans/<int:pk>/", PlanDetailView.as_view(), name="plan-detail"),
+    path("plans/calendar/", PlanCalendarView.as_view(), name="plan-calendar"),
+    
+    
+    # sync endpoint
+    path("sync/", SyncView.as_view(), name="sync"),
+    
+    
+    # stats endpoints
+    path("stats/volume/", VolumeStatsView.as_view(), name="stats-volume"),
+    path("stats/top-sets/", TopSetsView.as_view(), name="stats-top-sets"),
+    path("stats/1rm/", OneRepMaxStatsView.as_view(), name="stats-1rm"),
+    path("stats/consistency/", ConsistencyStatsView.as_view(), name="stats-consistency"),
+    path("stats/muscles/", MuscleVolumeStatsView.as_view(), name="stats-muscles"),
+    path("stats/buckets/", BucketStatsView.as_view(), name="stats-buckets"),
+    path("stats/calendar/", ActivityCalendarView.as_view(), name="stats-calendar"),
+    
+    
+    # leaderboards endpoints
+    path("leaderboards/<str:metric>/", LeaderboardView.as_view(), name="leaderboard"),
+    
+    
+    # coach endpoints
+    path("coach/athletes/", CoachDashboardView.as_view(), name="coach-athletes"),
     
 ]
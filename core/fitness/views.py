@@ -1,23 +1,56 @@
+import hashlib
+
 from django.shortcuts import render
 from rest_framework import generics, filters, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.throttling import UserRateThrottle
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import partial
+from itertools import chain
+from operator import itemgetter, mul
+from django.conf import settings
+from django.http import Http404
 from django.utils import timezone
-from django.db.models import F
-from .models import Exercise, Workout, WorkoutExercise, WorkoutSet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.contrib.auth import get_user_model
+from django.db.models import Count, ExpressionWrapper, F, Max, Prefetch, Sum, Window
+from django.db.models.functions import RowNumber
+from rest_framework.pagination import PageNumberPagination
+from .activity import get_activity
+from .archive import restore
+from .buckets import GRANULARITIES, VOLUME_EXPRESSION, bucket_count, get_buckets
+from .catalog import MUSCLES, get_catalog
+from .fields import FixedPointField
+from .history import format_cursor, parse_cursor, session_history
+from .idempotency import idempotent
+from .changes import get_workout_version, record_workout_change, workout_tree
+from .leaderboards import e1rm_board, get_position, top_entries, week_start
+from .models import (
+    ArchivedExercise, ArchivedWorkout, Exercise, ExerciseProgress, LeaderboardEntry, PlanTemplate, Workout, WorkoutChange, WorkoutExercise, WorkoutSet,
+)
+from .plans import iter_occurrences
+from .progress import refresh_progress, suggest_next
+from .routers import use_shard
+from .search import WorkoutNotesSearchFilter
+from .sharding import UserShardMixin, shard_atomic, shards_for_users
+from .throttling import OneRMStatsRateThrottle, StatsRateThrottle, VolumeStatsRateThrottle
 from .serializers import (
     ExerciseSerializer, WorkoutSerializer, WorkoutCreateSerializer, 
     WorkoutDetailSerializer, WorkoutExerciseSerializer, WorkoutSetSerializer,
-    WorkoutUpdateSerializer
+    WorkoutUpdateSerializer, WorkoutSyncSerializer, WorkoutExerciseSyncSerializer,
+    WorkoutSetSyncSerializer, PlanTemplateSerializer, WorkoutCloneSerializer,
+    ArchivedWorkoutSerializer,
 )
 
 # Create your views here.
 
+User = get_user_model()
+
 
 class ExerciseFilter(django_filters.FilterSet):
     """Filtro personalizado para ejercicios"""
@@ -43,6 +76,44 @@ class WorkoutFilter(django_filters.FilterSet):
         fields = ['date']
 
 
+def with_workout_tree(queryset):
+    """
+    Precargar ejercicios y sets de cada workout.
+    
+    Mantiene constante el número de consultas al serializar listas o detalles,
+    sin importar cuántos workouts, ejercicios o sets haya. El nombre de cada
+    ejercicio sale de la foto del catálogo, sin join con Exercise.
+    """
+    return queryset.prefetch_related(
+        Prefetch(
+            'workout_exercises',
+            queryset=WorkoutExercise.objects.prefetch_related('sets'),
+        )
+    )
+
+
+def conditional_get(request, key, last_modified):
+    """
+    Resolver un GET condicional antes de serializar.
+    
+    Devuelve (respuesta 304 o None, headers a agregar a la respuesta completa).
+    El ETag incluye el Accept y los query params porque cambian el contenido.
+    """
+    raw = ':'.join([key, request.META.get('HTTP_ACCEPT', ''), request.GET.urlencode()])
+    etag = '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if timestamp is not None:
+        headers['Last-Modified'] = http_date(timestamp)
+    
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified[name] = value
+    return not_modified, headers
+
+
 class ExerciseListView(generics.ListAPIView):
     """
     Lista todos los ejercicios con opciones de filtrado y búsqueda.
@@ -73,41 +144,129 @@ class ExerciseListView(generics.ListAPIView):
 class ExerciseDetailView(generics.RetrieveAPIView):
     """
     Obtiene el detalle de un ejercicio específico por su ID.
+    
+    Se sirve desde la foto en memoria del catálogo.
     """
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
     permission_classes = [permissions.AllowAny]  # cualquiera puede ver ejercicios
+    
+    def retrieve(self, request, *args, **kwargs):
+        record = get_catalog().get(kwargs['pk'])
+        if record is None:
+            raise Http404
+        return Response(record.serialized())
+
+
+class ExerciseNextTargetView(UserShardMixin, APIView):
+    """
+    Próximo objetivo sugerido (peso, reps y sets) de un ejercicio para el
+    usuario autenticado, a partir del resumen de su última sesión (ver
+    fitness/progress.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, pk):
+        exercise = get_catalog().get(pk)
+        if exercise is None:
+            raise Http404
+        
+        progress = ExerciseProgress.objects.filter(user=request.user, exercise_id=pk).first()
+        if progress is None:
+            # Historial previo al resumen: calcularlo una vez
+            refresh_progress(request.user.pk, [pk])
+            progress = ExerciseProgress.objects.filter(user=request.user, exercise_id=pk).first()
+        if progress is None:
+            return Response({
+                'exercise': exercise.name,
+                'exercise_id': exercise.id,
+                'last_date': None,
+                'last_workout_id': None,
+                'suggested_weight': None,
+                'suggested_reps': None,
+                'suggested_sets': None,
+                'reason': 'no_history',
+            })
+        
+        suggestion = suggest_next(progress, exercise.equipment)
+        return Response({
+            'exercise': exercise.name,
+            'exercise_id': exercise.id,
+            'last_date': progress.last_date,
+            'last_workout_id': progress.last_workout_id,
+            'suggested_weight': format_decimal(suggestion['weight']),
+            'suggested_reps': suggestion['reps'],
+            'suggested_sets': suggestion['sets'],
+            'reason': suggestion['reason'],
+        })
 
 
-class WorkoutListView(generics.ListCreateAPIView):
+class WorkoutListView(UserShardMixin, generics.ListCreateAPIView):
     """
     Lista y crea workouts del usuario autenticado.
     
     GET: Lista workouts con filtros opcionales:
     - from_date: Fecha desde (YYYY-MM-DD)
     - to_date: Fecha hasta (YYYY-MM-DD)
+    - q: Búsqueda en las notas; sin ordering, por relevancia
+    
+    Sin `q` también lista los workouts archivados del rango, sin notas ni
+    ejercicios y con "archived": true; pedir su detalle los restaura.
     
     POST: Crea un nuevo workout
     """
     serializer_class = WorkoutSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, WorkoutNotesSearchFilter]
     filterset_class = WorkoutFilter
     ordering_fields = ['date', 'duration_min']
     ordering = ['-date']  # Más recientes primero
     
     def get_queryset(self):
         """Solo workouts del usuario autenticado"""
-        return Workout.objects.filter(user=self.request.user)
+        return with_workout_tree(Workout.objects.filter(user=self.request.user))
     
     def get_serializer_class(self):
         """Usar serializer específico para creación"""
         if self.request.method == 'POST':
             return WorkoutCreateSerializer
         return WorkoutSerializer
+    
+    def create(self, request, *args, **kwargs):
+        """Con Idempotency-Key, los reintentos repiten la primera respuesta"""
+        return idempotent(request, partial(super().create, request, *args, **kwargs))
+    
+    def list(self, request, *args, **kwargs):
+        """Responder 304 si la versión de los workouts del usuario no cambió"""
+        version, updated_at = get_workout_version(request.user.pk)
+        not_modified, headers = conditional_get(
+            request, f'workouts:{request.user.pk}:{version}', updated_at
+        )
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        if not request.query_params.get(WorkoutNotesSearchFilter.search_param, '').strip():
+            response.data = self.with_archived(response.data)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+
+    def with_archived(self, rows):
+        """Filas del listado más los workouts archivados con los mismos filtros y orden"""
+        archived = WorkoutFilter(
+            self.request.query_params,
+            queryset=ArchivedWorkout.objects.filter(user=self.request.user),
+        ).qs
+        rows = [*rows, *ArchivedWorkoutSerializer(archived, many=True).data]
+        # Orden estable por cada campo, del último al primero
+        ordering = filters.OrderingFilter().get_ordering(self.request, archived, self)
+        for field in reversed(ordering):
+            rows.sort(key=itemgetter(field.lstrip('-')), reverse=field.startswith('-'))
+        return rows
 
 
-class WorkoutDetailView(generics.RetrieveUpdateDestroyAPIView):
+class WorkoutDetailView(UserShardMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Obtiene, actualiza o elimina un workout específico.
     
@@ -119,7 +278,23 @@ class WorkoutDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         """Solo workouts del usuario autenticado"""
-        return Workout.objects.filter(user=self.request.user)
+        queryset = Workout.objects.filter(user=self.request.user)
+        if self.request.method == 'GET':
+            # El detalle serializa el árbol completo
+            queryset = with_workout_tree(queryset)
+        return queryset
+    
+    def get_object(self):
+        """Un workout archivado se restaura a las tablas al pedirlo"""
+        try:
+            workout = super().get_object()
+        except Http404:
+            if not restore(self.request.user.pk, [self.kwargs['pk']]):
+                raise
+            workout = super().get_object()
+        # El usuario vive en la base por defecto, no en el shard: sin join
+        workout.user = self.request.user
+        return workout
     
     def get_serializer_class(self):
         """Usar serializer específico para cada método"""
@@ -128,3 +303,1016 @@ class WorkoutDetailView(generics.RetrieveUpdateDestroyAPIView):
         elif self.request.method in ['PATCH', 'PUT']:
             return WorkoutUpdateSerializer  
         return WorkoutSerializer
+    
+    def update(self, request, *args, **kwargs):
+        """Con Idempotency-Key, los reintentos repiten la primera respuesta"""
+        return idempotent(request, partial(super().update, request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Responder 304 si el workout no cambió (una consulta por PK)"""
+        updated_at = (
+            Workout.objects.filter(pk=kwargs['pk'], user=request.user)
+            .values_list('updated_at', flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)  # 404 o archivado
+        not_modified, headers = conditional_get(
+            request, f'workout:{kwargs["pk"]}:{updated_at.isoformat()}', updated_at
+        )
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+    
+    def perform_destroy(self, instance):
+        with shard_atomic():
+            user_id, date = instance.user_id, instance.date
+            exercise_ids = set(
+                instance.workout_exercises.values_list('exercise_id', flat=True)
+            )
+            deleted = workout_tree([instance.pk])
+            instance.delete()
+            record_workout_change(
+                user_id, deleted=deleted, dates=[date], exercise_ids=exercise_ids
+            )
+
+
+class WorkoutCloneView(UserShardMixin, APIView):
+    """
+    Repite un workout del usuario autenticado.
+    
+    POST /api/workouts/<pk>/clone/ con {"date": opcional, por defecto hoy,
+    "include_sets": opcional, por defecto true}. Devuelve el workout nuevo
+    completo, como el detalle.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, pk):
+        return idempotent(request, partial(self.clone, request, pk))
+    
+    def clone(self, request, pk):
+        source = Workout.objects.filter(pk=pk, user=request.user).first()
+        if source is None and restore(request.user.pk, [pk]):
+            source = Workout.objects.get(pk=pk)
+        if source is None:
+            raise Http404
+        serializer = WorkoutCloneSerializer(data=request.data, context={'workout': source})
+        serializer.is_valid(raise_exception=True)
+        workout = serializer.save()
+        
+        workout = with_workout_tree(Workout.objects.filter(pk=workout.pk)).get()
+        workout.user = request.user
+        return Response(WorkoutDetailSerializer(workout).data, status=status.HTTP_201_CREATED)
+
+
+class SyncView(UserShardMixin, APIView):
+    """
+    Sincronización delta para clientes offline.
+    
+    GET /api/sync/?since=<token>&limit=<n>
+    
+    Devuelve las filas de Workout, WorkoutExercise y WorkoutSet creadas o
+    modificadas desde el token, los ids eliminados (tombstones) y los ids de
+    los workouts que pasaron al archivo. El costo es proporcional a la
+    cantidad de cambios, no al historial total.
+    
+    Un workout archivado sigue existiendo: el cliente puede conservar su
+    copia, y pedirlo por id (detalle) lo devuelve a las tablas, con lo que
+    vuelve a aparecer como upsert.
+    
+    Sin `since` (o con since=0) devuelve una foto completa de los datos del
+    usuario; el cliente guarda el `token` de la respuesta y lo envía en la
+    próxima llamada. Si `has_more` es true hay más cambios pendientes.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 500
+    max_limit = 1000
+    
+    SYNC_MODELS = {
+        WorkoutChange.WORKOUT: (Workout, WorkoutSyncSerializer, 'workouts'),
+        WorkoutChange.WORKOUT_EXERCISE: (
+            WorkoutExercise, WorkoutExerciseSyncSerializer, 'workout_exercises'
+        ),
+        WorkoutChange.WORKOUT_SET: (WorkoutSet, WorkoutSetSyncSerializer, 'workout_sets'),
+    }
+    
+    def get(self, request):
+        since = self._get_int('since', 0)
+        limit = min(self._get_int('limit', self.default_limit) or 1, self.max_limit)
+        changes = WorkoutChange.objects.filter(user=request.user)
+        
+        if since == 0:
+            return Response(self._snapshot(request.user, changes))
+        
+        entries = list(
+            changes.filter(id__gt=since)
+            .order_by('id')
+            .values_list('id', 'kind', 'object_id', 'operation')[:limit + 1]
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        
+        # Solo importa la última operación de cada fila dentro de la página
+        latest = {}
+        for _, kind, object_id, operation in entries:
+            latest[(kind, object_id)] = operation
+        
+        upserted = {kind: [] for kind in self.SYNC_MODELS}
+        deleted = {kind: [] for kind in self.SYNC_MODELS}
+        archived = {kind: [] for kind in self.SYNC_MODELS}
+        targets = {
+            WorkoutChange.UPSERT: upserted,
+            WorkoutChange.DELETE: deleted,
+            WorkoutChange.ARCHIVE: archived,
+        }
+        for (kind, object_id), operation in latest.items():
+            targets[operation][kind].append(object_id)
+        
+        data = {'token': entries[-1][0] if entries else since, 'has_more': has_more}
+        for kind, (model, serializer_class, key) in self.SYNC_MODELS.items():
+            rows = model.objects.filter(pk__in=upserted[kind]) if upserted[kind] else []
+            data[key] = serializer_class(rows, many=True).data
+        data['deleted'] = {
+            key: sorted(deleted[kind])
+            for kind, (_, _, key) in self.SYNC_MODELS.items()
+        }
+        data['archived'] = {'workouts': sorted(archived[WorkoutChange.WORKOUT])}
+        return Response(data)
+    
+    def _snapshot(self, user, changes):
+        """Foto completa con el token del último cambio registrado"""
+        token = changes.order_by('-id').values_list('id', flat=True).first() or 0
+        workouts = Workout.objects.filter(user=user)
+        return {
+            'token': token,
+            'has_more': False,
+            'workouts': WorkoutSyncSerializer(workouts, many=True).data,
+            'workout_exercises': WorkoutExerciseSyncSerializer(
+                WorkoutExercise.objects.filter(workout__user=user), many=True
+            ).data,
+            'workout_sets': WorkoutSetSyncSerializer(
+                WorkoutSet.objects.filter(workout_exercise__workout__user=user), many=True
+            ).data,
+            'deleted': {key: [] for _, _, key in self.SYNC_MODELS.values()},
+            'archived': {
+                'workouts': list(
+                    ArchivedWorkout.objects.filter(user=user).order_by('pk').values_list('pk', flat=True)
+                ),
+            },
+        }
+    
+    def _get_int(self, name, default):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: ['A valid integer is required']})
+        if value < 0:
+            raise ValidationError({name: ['Must be a positive integer']})
+        return value
+
+
+# Estadísticas (ver STATS_API_DOCS.md)
+
+# Volumen del mejor set de un ArchivedExercise, en la escala de VOLUME_EXPRESSION
+ARCHIVED_TOP_VOLUME = ExpressionWrapper(
+    F('top_reps') * F('top_weight'),
+    output_field=FixedPointField(max_digits=12, decimal_places=2),
+)
+
+def format_decimal(value):
+    """Formatear como string con 2 decimales, igual que los DecimalField de DRF"""
+    if value is None:
+        return None
+    return str(Decimal(str(value)).quantize(Decimal('0.01')))
+
+
+def estimated_1rm(weight, reps):
+    """1RM estimado con la fórmula de Epley: peso × (1 + reps/30)"""
+    return Decimal(str(weight)) * (1 + Decimal(reps) / 30)
+
+
+class StatsBaseView(UserShardMixin, APIView):
+    """
+    Base de los endpoints de estadísticas del usuario autenticado.
+    
+    Provee el parseo y validación de los parámetros comunes (rango de fechas y
+    ejercicio), el queryset de sets del usuario y el de los resúmenes por
+    ejercicio de sus workouts archivados (ver fitness/archive.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [StatsRateThrottle]
+    default_days = 30
+    max_days = None
+    max_year = 9998
+    
+    def parse_date(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            value = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValidationError({name: ['Invalid date format, use YYYY-MM-DD']})
+        # Los períodos (semana, mes, año) que empiezan después de 9999 no existen
+        if value.year > self.max_year:
+            raise ValidationError({name: [f'Year must be {self.max_year} or earlier']})
+        return value
+    
+    def get_date_range(self, default_from=True):
+        """Rango (date_from, date_to); date_from puede ser None si no tiene default"""
+        today = timezone.now().date()
+        date_to = self.parse_date('date_to') or today
+        date_from = self.parse_date('date_from')
+        if date_from is None and default_from:
+            date_from = date_to - timedelta(days=min(self.default_days, (date_to - date.min).days))
+        if date_from and date_from > date_to:
+            raise ValidationError({'error': 'date_from must be before date_to'})
+        if self.max_days and date_from and (date_to - date_from).days > self.max_days:
+            raise ValidationError({'error': f'Date range cannot exceed {self.max_days} days'})
+        return date_from, date_to
+    
+    def get_int_param(self, name, default=None, min_value=None, max_value=None):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: ['A valid integer is required']})
+        if (min_value is not None and value < min_value) or (
+            max_value is not None and value > max_value
+        ):
+            raise ValidationError({name: [f'Must be between {min_value} and {max_value}']})
+        return value
+    
+    def get_exercise(self, required=False):
+        exercise_id = self.get_int_param('exercise_id')
+        if exercise_id is None:
+            if required:
+                raise ValidationError({'exercise_id': ['This parameter is required']})
+            return None
+        # Registro de la foto del catálogo (id, name, ...), sin consultar Exercise
+        exercise = get_catalog().get(exercise_id)
+        if exercise is None:
+            raise Http404
+        return exercise
+    
+    def get_sets(self, date_from=None, date_to=None, exercise=None):
+        """Sets con peso del usuario autenticado, filtrados por fecha y ejercicio"""
+        queryset = WorkoutSet.objects.filter(
+            workout_exercise__workout__user=self.request.user,
+            weight_kg__isnull=False,
+        )
+        if date_from:
+            queryset = queryset.filter(workout_exercise__workout__date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(workout_exercise__workout__date__lte=date_to)
+        if exercise:
+            queryset = queryset.filter(workout_exercise__exercise_id=exercise.id)
+        return queryset
+    
+    def get_archived(self, date_from=None, date_to=None, exercise=None):
+        """Resúmenes de los ejercicios archivados con sets con peso, filtrados igual"""
+        queryset = ArchivedExercise.objects.filter(
+            user=self.request.user,
+            top_weight__isnull=False,
+        )
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+        if exercise:
+            queryset = queryset.filter(exercise_id=exercise.id)
+        return queryset
+
+
+class VolumeStatsView(StatsBaseView):
+    """
+    Volumen de entrenamiento (reps × peso) por día y ejercicio.
+    
+    Parámetros: date_from, date_to (máximo 2 años), exercise_id.
+    """
+    throttle_classes = [VolumeStatsRateThrottle]
+    max_days = 730
+    
+    def get(self, request):
+        date_from, date_to = self.get_date_range()
+        exercise = self.get_exercise()
+        sets = self.get_sets(date_from, date_to, exercise)
+        archived = self.get_archived(date_from, date_to, exercise)
+        
+        # Volumen por (día, ejercicio) de las tablas más el de los archivados
+        volumes = {}
+        for queryset in (
+            sets.values_list('workout_exercise__workout__date', 'workout_exercise__exercise_id')
+            .annotate(volume=Sum(VOLUME_EXPRESSION)),
+            archived.values_list('date', 'exercise_id').annotate(volume=Sum('volume')),
+        ):
+            for day, exercise_id, volume in queryset.order_by():
+                key = (day, exercise_id)
+                volumes[key] = volumes.get(key, 0) + Decimal(str(volume))
+        catalog = get_catalog()
+        daily = [
+            {
+                'date': day,
+                'exercise_id': exercise_id,
+                'volume': volume,
+                'exercise_name': catalog.name_of(exercise_id),
+            }
+            for (day, exercise_id), volume in volumes.items()
+        ]
+        daily.sort(key=lambda row: (row['exercise_name'] or '', row['exercise_id']))
+        daily.sort(key=lambda row: row['date'], reverse=True)
+        total = sum((Decimal(str(row['volume'])) for row in daily), Decimal('0'))
+        days = max((date_to - date_from).days, 1)
+        workout_count = (
+            sets.values('workout_exercise__workout').distinct().count()
+            + archived.values('workout').distinct().count()
+        )
+        
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'exercise': exercise.name if exercise else None,
+            'exercise_id': exercise.id if exercise else None,
+            'total_volume': format_decimal(total),
+            'average_daily_volume': format_decimal(total / days),
+            'workout_count': workout_count,
+            'daily_volumes': [
+                {
+                    'date': row['date'],
+                    'volume': format_decimal(row['volume']),
+                    'exercise_name': row['exercise_name'],
+                    'exercise_id': row['exercise_id'],
+                }
+                for row in daily
+            ],
+        })
+
+
+class TopSetsView(StatsBaseView):
+    """
+    Mejores sets (récords personales) ordenados por volumen.
+    
+    Parámetros: date_from, date_to, exercise_id, limit (1-100).
+    """
+    
+    def get(self, request):
+        date_from, date_to = self.get_date_range(default_from=False)
+        exercise = self.get_exercise()
+        limit = self.get_int_param('limit', default=10, min_value=1, max_value=100)
+        
+        rows = (
+            self.get_sets(date_from, date_to, exercise)
+            .annotate(volume=VOLUME_EXPRESSION)
+            .values(
+                'weight_kg', 'reps_completed', 'volume',
+                date=F('workout_exercise__workout__date'),
+                exercise_id=F('workout_exercise__exercise_id'),
+                workout_id=F('workout_exercise__workout_id'),
+            )
+            .order_by('-volume', '-date')[:limit]
+        )
+        # De cada workout archivado solo se conoce el mejor set por ejercicio
+        archived = (
+            self.get_archived(date_from, date_to, exercise)
+            .annotate(top_volume=ARCHIVED_TOP_VOLUME)
+            .values(
+                'top_volume', 'date', 'exercise_id', 'workout_id',
+                weight_kg=F('top_weight'), reps_completed=F('top_reps'),
+            )
+            .order_by('-top_volume', '-date')[:limit]
+        )
+        rows = sorted(
+            [*rows, *(dict(row, volume=row.pop('top_volume')) for row in archived)],
+            key=lambda row: (row['volume'], row['date']),
+            reverse=True,
+        )[:limit]
+        catalog = get_catalog()
+        
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'exercise': exercise.name if exercise else None,
+            'exercise_id': exercise.id if exercise else None,
+            'limit': limit,
+            'top_sets': [
+                {
+                    'date': row['date'],
+                    'exercise_name': catalog.name_of(row['exercise_id']),
+                    'exercise_id': row['exercise_id'],
+                    'weight': format_decimal(row['weight_kg']),
+                    'reps': row['reps_completed'],
+                    'volume': format_decimal(row['volume']),
+                    'workout_id': row['workout_id'],
+                    'estimated_1rm': format_decimal(
+                        estimated_1rm(row['weight_kg'], row['reps_completed'])
+                    ),
+                }
+                for row in rows
+            ],
+        })
+
+
+class OneRepMaxStatsView(StatsBaseView):
+    """
+    Progreso del 1RM estimado (Epley) de un ejercicio.
+    
+    Parámetros: exercise_id (requerido), date_from, date_to (máximo 1 año).
+    Devuelve el mejor set de cada día como punto de la serie.
+    """
+    throttle_classes = [OneRMStatsRateThrottle]
+    max_days = 365
+    
+    def get(self, request):
+        exercise = self.get_exercise(required=True)
+        date_from, date_to = self.get_date_range()
+        rows = (
+            self.get_sets(date_from, date_to, exercise)
+            .values(
+                'weight_kg', 'reps_completed',
+                date=F('workout_exercise__workout__date'),
+                workout_id=F('workout_exercise__workout_id'),
+            )
+            .order_by('date')
+        )
+        archived = self.get_archived(date_from, date_to, exercise).values(
+            'date', 'workout_id', weight_kg=F('best_weight'), reps_completed=F('best_reps'),
+        )
+        
+        # Mejor 1RM estimado por día
+        best = {}
+        for row in chain(rows, archived):
+            value = estimated_1rm(row['weight_kg'], row['reps_completed'])
+            if row['date'] not in best or value > best[row['date']][0]:
+                best[row['date']] = (value, row)
+        points = [best[day] for day in sorted(best)]
+        
+        current = points[-1][0] if points else None
+        first = points[0][0] if points else None
+        improvement = current - first if points else None
+        
+        return Response({
+            'exercise': exercise.name,
+            'exercise_id': exercise.id,
+            'date_from': date_from,
+            'date_to': date_to,
+            'current_estimated_1rm': format_decimal(current),
+            'max_estimated_1rm': format_decimal(max(p[0] for p in points)) if points else None,
+            'improvement': format_decimal(improvement),
+            'improvement_percentage': (
+                format_decimal(improvement / first * 100) if first else None
+            ),
+            'data_points': [
+                {
+                    'date': row['date'],
+                    'estimated_1rm': format_decimal(value),
+                    'weight': format_decimal(row['weight_kg']),
+                    'reps': row['reps_completed'],
+                    'workout_id': row['workout_id'],
+                }
+                for value, row in points
+            ],
+        })
+
+
+class MuscleVolumeStatsView(StatsBaseView):
+    """
+    Volumen semanal por grupo muscular.
+    
+    Parámetros: date_from, date_to (máximo 2 años). El volumen de cada
+    ejercicio se suma por día en la base de datos y se reparte entre músculos
+    con la matriz ejercicio × músculo del catálogo (primario 1.0, secundarios
+    FITNESS_SECONDARY_MUSCLE_WEIGHT). Las semanas empiezan el lunes.
+    """
+    throttle_classes = [VolumeStatsRateThrottle]
+    default_days = 84
+    max_days = 730
+    
+    def get(self, request):
+        date_from, date_to = self.get_date_range()
+        secondary_weight = float(getattr(settings, 'FITNESS_SECONDARY_MUSCLE_WEIGHT', 0.5))
+        matrix = get_catalog().muscle_matrix(secondary_weight)
+        
+        rows = (
+            self.get_sets(date_from, date_to)
+            .values_list('workout_exercise__workout__date', 'workout_exercise__exercise_id')
+            .annotate(volume=Sum(VOLUME_EXPRESSION))
+            .order_by()
+        )
+        archived = (
+            self.get_archived(date_from, date_to)
+            .values_list('date', 'exercise_id')
+            .annotate(volume=Sum('volume'))
+            .order_by()
+        )
+        # Volumen por semana y ejercicio: el reparto entre músculos se hace
+        # una vez por par, no por fila
+        exercise_volumes = {}
+        for day, exercise_id, volume in chain(rows, archived):
+            if volume and exercise_id in matrix:
+                volumes = exercise_volumes.setdefault(week_start(day), {})
+                volumes[exercise_id] = volumes.get(exercise_id, 0.0) + float(volume)
+        
+        # Cada semana es el producto de sus volúmenes por las filas de la
+        # matriz: una suma por columna (músculo)
+        weeks = {}
+        for week, volumes in exercise_volumes.items():
+            exercise_ids, values = zip(*volumes.items())
+            weeks[week] = [
+                sum(map(mul, column, values))
+                for column in zip(*(matrix[exercise_id] for exercise_id in exercise_ids))
+            ]
+        
+        totals = [sum(column) for column in zip(*weeks.values())] or [0.0] * len(MUSCLES)
+        
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'secondary_weight': format_decimal(secondary_weight),
+            'muscles': list(MUSCLES),
+            'total_volumes': {
+                muscle: format_decimal(value) for muscle, value in zip(MUSCLES, totals)
+            },
+            'weekly_volumes': [
+                {
+                    'week_start': week,
+                    'volumes': {
+                        muscle: format_decimal(value)
+                        for muscle, value in zip(MUSCLES, weeks[week])
+                    },
+                }
+                for week in sorted(weeks, reverse=True)
+            ],
+        })
+
+
+class BucketStatsView(StatsBaseView):
+    """
+    Volumen, sets, workouts y minutos agrupados por día, semana, mes o año.
+    
+    Parámetros: bucket (day, week, month, year; por defecto week), date_from,
+    date_to. Se devuelven completos todos los períodos que intersecan el
+    rango, como máximo max_buckets. Los períodos cerrados se leen de
+    StatsBucket (ver fitness/buckets.py).
+    """
+    default_days_by_bucket = {'day': 30, 'week': 84, 'month': 365, 'year': 1825}
+    max_buckets = 750
+    
+    def get(self, request):
+        bucket = request.query_params.get('bucket') or 'week'
+        if bucket not in GRANULARITIES:
+            raise ValidationError({'bucket': [f'Must be one of {", ".join(GRANULARITIES)}']})
+        self.default_days = self.default_days_by_bucket[bucket]
+        date_from, date_to = self.get_date_range()
+        
+        if bucket_count(date_from, date_to, bucket) > self.max_buckets:
+            raise ValidationError(
+                {'error': f'Range cannot contain more than {self.max_buckets} buckets'}
+            )
+        buckets = get_buckets(
+            request.user.pk, bucket, date_from, date_to, timezone.now().date()
+        )
+        
+        return Response({
+            'bucket': bucket,
+            'date_from': date_from,
+            'date_to': date_to,
+            'buckets': [
+                dict(row, volume=format_decimal(row['volume'])) for row in buckets
+            ],
+        })
+
+
+class ActivityCalendarView(StatsBaseView):
+    """
+    Calendario de actividad de un año (estilo "contribuciones").
+    
+    GET /api/stats/calendar/?year=<año> (por defecto el actual). Devuelve los
+    días con actividad, con la cantidad de workouts y un nivel de intensidad
+    de 1 a 4 según el volumen del día relativo al día de mayor volumen del
+    año. Se lee de ActivityYear, sin consultar los workouts (ver
+    fitness/activity.py).
+    """
+    LEVELS = 4
+    
+    def get(self, request):
+        year = self.get_int_param('year', default=timezone.now().year, min_value=1900, max_value=9999)
+        activity = get_activity(request.user.pk, [year])[year]
+        days = list(activity.days())
+        max_volume = max((volume for _, _, volume in days), default=0)
+        
+        return Response({
+            'year': year,
+            'total_workouts': sum(count for _, count, _ in days),
+            'active_days': sum(1 for _, count, _ in days if count),
+            'max_daily_volume': max_volume,
+            'days': [
+                {
+                    'date': day,
+                    'workouts': count,
+                    'volume': volume,
+                    'level': max(1, -(-volume * self.LEVELS // max_volume)) if max_volume else 1,
+                }
+                for day, count, volume in days
+            ],
+        })
+
+
+class ConsistencyStatsView(StatsBaseView):
+    """
+    Consistencia del entrenamiento en los últimos `days` días (1-365).
+    
+    La racha actual cuenta días consecutivos con entrenamiento terminando hoy
+    (o ayer, si hoy todavía no se entrenó).
+    """
+    
+    def get(self, request):
+        days = self.get_int_param('days', default=30, min_value=1, max_value=365)
+        today = timezone.now().date()
+        start = today - timedelta(days=days - 1)
+        
+        # Cantidades por día desde el calendario de actividad (sin leer Workout)
+        activity = get_activity(request.user.pk, {start.year, today.year})
+        per_day = {}
+        for i in range(days):
+            day = start + timedelta(days=i)
+            count = activity[day.year].count_on(day)
+            if count:
+                per_day[day] = count
+        total_workouts = sum(per_day.values())
+        active = [start + timedelta(days=i) in per_day for i in range(days)]
+        
+        return Response({
+            'time_window_days': days,
+            'total_workouts': total_workouts,
+            'active_days': len(per_day),
+            'consistency_percentage': format_decimal(Decimal(len(per_day)) / days * 100),
+            'average_workouts_per_week': format_decimal(Decimal(total_workouts) / days * 7),
+            'longest_streak_days': longest_streak(active),
+            'current_streak_days': current_streak(active),
+        })
+
+
+def longest_streak(active):
+    """Racha más larga de días activos consecutivos"""
+    longest = run = 0
+    for is_active in active:
+        run = run + 1 if is_active else 0
+        longest = max(longest, run)
+    return longest
+
+
+def current_streak(active):
+    """Racha que termina en el último día (o el anterior si el último está vacío)"""
+    days = list(active)
+    if days and not days[-1]:
+        days.pop()
+    streak = 0
+    for is_active in reversed(days):
+        if not is_active:
+            break
+        streak += 1
+    return streak
+
+
+# Planes de entrenamiento
+
+class PlanListView(generics.ListCreateAPIView):
+    """Lista y crea planes de entrenamiento del usuario autenticado"""
+    serializer_class = PlanTemplateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return (
+            PlanTemplate.objects.filter(user=self.request.user)
+            .prefetch_related('exercises')
+            .order_by('-start_date', 'id')
+        )
+
+
+class PlanDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Obtiene, actualiza (reemplazando sus ejercicios) o elimina un plan"""
+    serializer_class = PlanTemplateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return PlanTemplate.objects.filter(user=self.request.user).prefetch_related('exercises')
+
+
+class PlanCalendarView(StatsBaseView):
+    """
+    Sesiones programadas de los planes del usuario en un rango de fechas.
+    
+    GET /api/plans/calendar/?date_from=<fecha>&date_to=<fecha>
+    
+    Por defecto muestra las próximas 4 semanas desde hoy; el rango máximo es
+    de un año. Las sesiones se calculan a partir de los planes (ver
+    fitness/plans.py), no se guardan.
+    """
+    throttle_classes = []  # no es una estadística: sin límite propio
+    max_days = 366
+    
+    def get(self, request):
+        today = timezone.now().date()
+        date_from = self.parse_date('date_from') or today
+        date_to = self.parse_date('date_to') or date_from + timedelta(days=27)
+        if date_from > date_to:
+            raise ValidationError({'error': 'date_from must be before date_to'})
+        if (date_to - date_from).days > self.max_days:
+            raise ValidationError({'error': f'Date range cannot exceed {self.max_days} days'})
+        
+        templates = (
+            PlanTemplate.objects.filter(user=request.user, start_date__lte=date_to)
+            .exclude(end_date__lt=date_from)
+            .prefetch_related('exercises')
+        )
+        catalog = get_catalog()
+        
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'occurrences': [
+                {
+                    'date': occurrence.date,
+                    'plan_id': occurrence.template.pk,
+                    'plan_name': occurrence.template.name,
+                    'exercises': [
+                        {
+                            'exercise': item.exercise_id,
+                            'exercise_name': catalog.name_of(item.exercise_id),
+                            'order': item.order,
+                            'target_sets': item.target_sets,
+                            'target_reps': item.target_reps,
+                        }
+                        for item in occurrence.exercises
+                    ],
+                }
+                for occurrence in iter_occurrences(templates, date_from, date_to)
+            ],
+        })
+
+
+# Rankings semanales
+
+class LeaderboardView(StatsBaseView):
+    """
+    Ranking semanal entre usuarios.
+    
+    GET /api/leaderboards/<metric>/ con metric volume, workouts o e1rm.
+    Parámetros: week (cualquier fecha de la semana, por defecto hoy),
+    exercise_id (requerido para e1rm), offset y limit (1-100, por defecto 10).
+    Incluye la posición del usuario autenticado (ver fitness/leaderboards.py).
+    """
+    METRICS = (LeaderboardEntry.VOLUME, LeaderboardEntry.WORKOUTS, LeaderboardEntry.E1RM)
+    
+    def get(self, request, metric):
+        if metric not in self.METRICS:
+            raise Http404
+        week = week_start(self.parse_date('week') or timezone.now().date())
+        exercise = self.get_exercise(required=metric == LeaderboardEntry.E1RM)
+        board = e1rm_board(exercise.id) if metric == LeaderboardEntry.E1RM else metric
+        offset = self.get_int_param('offset', default=0, min_value=0)
+        limit = self.get_int_param('limit', default=10, min_value=1, max_value=100)
+        
+        entries = top_entries(board, week, offset, limit + 1)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        
+        # Posición con empates: 1 + cantidad de puntajes mayores
+        results = []
+        for i, entry in enumerate(entries):
+            if i and entry.score == entries[i - 1].score:
+                rank = results[-1]['rank']
+            elif i or not offset:
+                rank = offset + i + 1
+            else:
+                rank = get_position(board, week, entry.user_id)[0]
+            results.append({
+                'rank': rank,
+                'user_id': entry.user_id,
+                'username': entry.user.username,
+                'score': self.format_score(metric, entry.score),
+            })
+        
+        position = get_position(board, week, request.user.pk)
+        
+        return Response({
+            'metric': metric,
+            'exercise': exercise.name if exercise else None,
+            'exercise_id': exercise.id if exercise else None,
+            'week_start': week,
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if has_more else None,
+            'results': results,
+            'me': {
+                'rank': position[0],
+                'score': self.format_score(metric, position[1]),
+            } if position else None,
+        })
+    
+    def format_score(self, metric, score):
+        if metric == LeaderboardEntry.WORKOUTS:
+            return int(score)
+        return format_decimal(score)
+
+
+# Vista de entrenador
+
+class AthletePagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class CoachDashboardView(StatsBaseView, generics.GenericAPIView):
+    """
+    Resumen de los atletas del entrenador autenticado, paginado por atleta.
+    
+    GET /api/coach/athletes/?days=<1-90>&workouts=<1-20>&page=<n>
+    
+    Para cada atleta de la página: workouts, minutos, volumen y último
+    workout de los últimos `days` días (7 por defecto) y sus `workouts` (5 por
+    defecto) workouts más recientes. Cada dato se obtiene con una consulta
+    agrupada para todos los atletas de la página.
+    """
+    throttle_classes = []
+    pagination_class = AthletePagination
+    
+    def get_queryset(self):
+        return User.objects.filter(coach_links__coach=self.request.user).order_by('username', 'id')
+    
+    def summarize(self, ids, since, per_athlete):
+        """(resúmenes, volúmenes, workouts recientes) de atletas del shard actual"""
+        workouts = Workout.objects.filter(user_id__in=ids, date__gte=since)
+        summaries = {
+            row['user_id']: row
+            for row in workouts.values('user_id').annotate(
+                workout_count=Count('id'),
+                total_duration_min=Sum('duration_min'),
+                last_workout_date=Max('date'),
+            ).order_by()
+        }
+        volumes = dict(
+            WorkoutSet.objects.filter(
+                workout_exercise__workout__user_id__in=ids,
+                workout_exercise__workout__date__gte=since,
+            )
+            .values_list('workout_exercise__workout__user_id')
+            .annotate(volume=Sum(VOLUME_EXPRESSION))
+            .order_by()
+        )
+        recent = {}
+        for workout in (
+            workouts.annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F('user_id'),
+                    order_by=[F('date').desc(), F('id').desc()],
+                )
+            )
+            .filter(position__lte=per_athlete)
+            .order_by('user_id', 'position')
+        ):
+            recent.setdefault(workout.user_id, []).append(workout)
+        return summaries, volumes, recent
+    
+    def get(self, request):
+        days = self.get_int_param('days', default=7, min_value=1, max_value=90)
+        per_athlete = self.get_int_param('workouts', default=5, min_value=1, max_value=20)
+        since = timezone.now().date() - timedelta(days=days - 1)
+        
+        athletes = self.paginate_queryset(self.get_queryset())
+        ids = [athlete.pk for athlete in athletes]
+        
+        summaries, volumes, recent = {}, {}, {}
+        # Los atletas pueden estar en distintos shards: las mismas consultas
+        # agrupadas en cada uno
+        for alias, shard_ids in shards_for_users(ids).items():
+            with use_shard(alias):
+                for merged, partial_result in zip(
+                    (summaries, volumes, recent),
+                    self.summarize(shard_ids, since, per_athlete),
+                ):
+                    merged.update(partial_result)
+        
+        results = []
+        for athlete in athletes:
+            summary = summaries.get(athlete.pk, {})
+            results.append({
+                'athlete': {'id': athlete.pk, 'username': athlete.username, 'email': athlete.email},
+                'summary': {
+                    'days': days,
+                    'workout_count': summary.get('workout_count', 0),
+                    'total_duration_min': summary.get('total_duration_min') or 0,
+                    'total_volume': format_decimal(volumes.get(athlete.pk) or 0),
+                    'last_workout_date': summary.get('last_workout_date'),
+                },
+                'recent_workouts': WorkoutSyncSerializer(
+                    recent.get(athlete.pk, []), many=True
+                ).data,
+            })
+        return self.get_paginated_response(results)
+
+
+# Historial por ejercicio
+
+class ExerciseHistoryBaseView(StatsBaseView):
+    throttle_classes = []
+    
+    def format_session(self, session):
+        return {
+            'date': session['date'],
+            'workout_id': session['workout_id'],
+            'sets': [
+                {
+                    'set_number': set_number,
+                    'reps_completed': reps,
+                    'weight_kg': format_decimal(weight),
+                    'rpe': str(rpe) if rpe is not None else None,
+                }
+                for set_number, reps, weight, rpe in session['sets']
+            ],
+        }
+
+
+class ExerciseHistoryView(ExerciseHistoryBaseView):
+    """
+    Sesiones recientes de un ejercicio del usuario autenticado, con sus sets.
+    
+    GET /api/exercises/<pk>/history/?limit=<1-50>&cursor=<cursor>
+    
+    Devuelve hasta `limit` sesiones (10 por defecto), de la más reciente a la
+    más antigua. Si hay más, `next_cursor` se envía como `cursor` para pedir
+    la página siguiente (paginación por clave, ver fitness/history.py).
+    """
+    
+    def get(self, request, pk):
+        exercise = get_catalog().get(pk)
+        if exercise is None:
+            raise Http404
+        limit = self.get_int_param('limit', default=10, min_value=1, max_value=50)
+        cursor = request.query_params.get('cursor')
+        try:
+            before = parse_cursor(cursor) if cursor else None
+        except ValueError:
+            raise ValidationError({'cursor': ['Invalid cursor']})
+        
+        sessions = session_history(request.user.pk, [pk], limit + 1, before)[pk]
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
+        return Response({
+            'exercise_id': exercise.id,
+            'exercise': exercise.name,
+            'sessions': [self.format_session(session) for session in sessions],
+            'next_cursor': format_cursor(sessions[-1]) if has_more else None,
+        })
+
+
+class ExerciseHistoryBatchView(ExerciseHistoryBaseView):
+    """
+    Últimas sesiones de varios ejercicios en una sola consulta.
+    
+    GET /api/exercises/history/?exercise_ids=1,2,3&last=<1-10>
+    
+    Pensado para abrir una sesión de entrenamiento: devuelve las últimas
+    `last` sesiones (1 por defecto) de cada ejercicio, en el orden pedido.
+    """
+    max_exercises = 100
+    
+    def get(self, request):
+        last = self.get_int_param('last', default=1, min_value=1, max_value=10)
+        raw = request.query_params.get('exercise_ids', '')
+        try:
+            exercise_ids = list(dict.fromkeys(int(value) for value in raw.split(',') if value))
+        except ValueError:
+            raise ValidationError({'exercise_ids': ['Must be a comma-separated list of integers']})
+        if not exercise_ids:
+            raise ValidationError({'exercise_ids': ['This parameter is required']})
+        if len(exercise_ids) > self.max_exercises:
+            raise ValidationError(
+                {'exercise_ids': [f'At most {self.max_exercises} exercises per request']}
+            )
+        catalog = get_catalog()
+        unknown = [pk for pk in exercise_ids if catalog.get(pk) is None]
+        if unknown:
+            raise ValidationError({'exercise_ids': [f'Unknown exercises: {unknown}']})
+        
+        history = session_history(request.user.pk, exercise_ids, last)
+        return Response({
+            'results': [
+                {
+                    'exercise_id': pk,
+                    'exercise': catalog.name_of(pk),
+                    'sessions': [self.format_session(session) for session in history[pk]],
+                }
+                for pk in exercise_ids
+            ],
+        })